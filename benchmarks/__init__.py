@@ -0,0 +1,3 @@
+# StablePlanets Benchmark Suite (Run with asv, see asv.conf.json)
+# Inputs are Synthetic (see synthetic.py) & No Benchmark Needs Network Access.
+# Set STABLEPLANETS_BENCH_SCALE to Scale Every Benchmark Size (e.g. 0.1 for a Quick Pass).
@@ -0,0 +1,46 @@
+# Python Benchmarks Timing the Catalog Hot Paths of StablePlanets on a Local Fixture
+# Run with: asv run   (or asv dev for a quick single pass)
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import tempfile
+
+from .synthetic import get_Sizes, write_SyntheticCatalog
+
+# ------------------------------------- #
+#          Defining Benchmarks          #
+# ------------------------------------- #
+
+class CatalogSuite:
+    ''' Times cleaning & summarizing a synthetic CSV catalog (read in offline mode,
+        so the archive is never contacted), scaling with the number of systems.
+    '''
+    params = get_Sizes([100, 1000, 10000])
+    param_names = ['num_systems']
+    number = 1
+    timeout = 300
+
+    def setup(self, num_systems):
+        from stableplanets import io
+        self.temp_dir = tempfile.TemporaryDirectory()
+        path = write_SyntheticCatalog(os.path.join(self.temp_dir.name, "catalog.csv"), num_systems)
+        self.catalog = io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path,
+                                           cache_dir=os.path.join(self.temp_dir.name, "cache"))
+        self.table = self.catalog.Catalog
+
+    def teardown(self, num_systems):
+        self.temp_dir.cleanup()
+
+    def time_clean(self, num_systems):
+        self.catalog.Catalog = self.table
+        self.catalog.clean()
+
+    def time_get_ParameterRanges(self, num_systems):
+        ''' Includes the clean it triggers on an uncleaned catalog.'''
+        self.catalog.Catalog = self.table
+        self.catalog.wasCleaned = False
+        self.catalog.get_ParameterRanges()
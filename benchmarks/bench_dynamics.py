@@ -0,0 +1,73 @@
+# Python Benchmarks Timing the Cluster Dynamics Hot Paths of StablePlanets
+# Run with: asv run   (or asv dev for a quick single pass)
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+
+from amuse.datamodel import Particles
+from amuse.units import units
+
+from .synthetic import get_Sizes, new_ClusterSnapshot
+
+# ------------------------------------- #
+#          Defining Benchmarks          #
+# ------------------------------------- #
+
+class SnapshotSuite:
+    ''' Times the matching of planets & stars into systems on a cluster snapshot
+        (with 20% binaries & one planet per star), scaling with the number of stars.
+    '''
+    params = get_Sizes([100, 1000, 10000])
+    param_names = ['num_stars']
+    number = 1
+    repeat = (1, 5, 60.0)
+    timeout = 600
+
+    def setup(self, num_stars):
+        self.bodies = new_ClusterSnapshot(num_stars)
+
+    def time_get_planetary_systems_from_set(self, num_stars):
+        from stableplanets import stellar_systems
+        stellar_systems.get_planetary_systems_from_set(self.bodies)
+
+    def time_get_heirarchical_systems_from_set(self, num_stars):
+        from stableplanets import stellar_systems
+        stellar_systems.get_heirarchical_systems_from_set(self.bodies)
+
+class KingClusterSuite:
+    ''' Times building a King-model cluster, with & without primordial binaries.'''
+    params = (get_Sizes([100, 1000, 3000]), [False, True])
+    param_names = ['num_stars', 'do_binaries']
+    number = 1
+    repeat = (1, 3, 120.0)
+    timeout = 900
+
+    def time_king_cluster_v2(self, num_stars, do_binaries):
+        from stableplanets.legacy import create
+        create.king_cluster_v2(num_stars, do_binaries=do_binaries)
+
+class EulerRotationSuite:
+    ''' Times random rotations of particle sets, scaling with the number of particles.'''
+    params = get_Sizes([2, 100, 10000, 1000000])
+    param_names = ['num_particles']
+
+    def setup(self, num_particles):
+        rs = np.random.RandomState(0)
+        self.particles = Particles(num_particles)
+        self.particles.position = rs.normal(size=(num_particles, 3)) | units.AU
+        self.particles.velocity = rs.normal(size=(num_particles, 3)) | units.kms
+
+    def time_preform_EulerRotation(self, num_particles):
+        from stableplanets import util
+        util.preform_EulerRotation(self.particles)
+
+    def time_preform_BatchEulerRotation(self, num_particles):
+        ''' One independent rotation per pair of particles.'''
+        from stableplanets import util
+        if not hasattr(util, 'preform_BatchEulerRotation'):
+            raise NotImplementedError()
+        util.preform_BatchEulerRotation(self.particles, np.arange(num_particles)//2)
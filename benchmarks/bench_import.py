@@ -0,0 +1,38 @@
+# Python Benchmarks Tracking the Start-Up Cost of Importing StablePlanets
+# Run with: asv run   (or asv dev for a quick single pass)
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import sys
+import subprocess
+
+# ------------------------------------- #
+#          Defining Benchmarks          #
+# ------------------------------------- #
+
+MODULES = ['stableplanets.amd', 'stableplanets.solvers', 'stableplanets.orbits',
+           'stableplanets.workers', 'stableplanets.pipeline', 'stableplanets.util',
+           'stableplanets.stellar_systems', 'stableplanets.io']
+
+# Heavy Packages which Importing StablePlanets Should Never Pull In
+HEAVY_MODULES = ['matplotlib', 'pyvo', 'scipy.optimize', 'scipy.special', 'scipy.spatial',
+                 'amuse.lab', 'amuse.io', 'amuse.community']
+
+class ImportSuite:
+    ''' Times "import stableplanets.<module>" in a fresh interpreter.'''
+    params = MODULES
+    param_names = ['module']
+    timeout = 120
+
+    def timeraw_import(self, module):
+        return "import " + module
+
+    def track_heavy_imports(self, module):
+        ''' Counts the heavy packages loaded as a side effect of the import.'''
+        code = "import sys, {0}; print(sum(name in sys.modules for name in {1!r}))".format(module, HEAVY_MODULES)
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        return int(output.stdout.split()[0])
+    track_heavy_imports.unit = 'modules'
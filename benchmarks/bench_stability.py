@@ -0,0 +1,77 @@
+# Python Benchmarks Timing the AMD-Stability Hot Paths of StablePlanets
+# Run with: asv run   (or asv dev for a quick single pass)
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+
+from .synthetic import get_Sizes, new_PlanetarySystem
+
+# ------------------------------------- #
+#          Defining Benchmarks          #
+# ------------------------------------- #
+
+class PlanetarySystemSuite:
+    ''' Times the per-system stability calculations, scaling with the number of planets.'''
+    params = get_Sizes([2, 4, 8, 16, 32])
+    param_names = ['num_planets']
+
+    def setup(self, num_planets):
+        self.system = new_PlanetarySystem(num_planets)
+
+    def time_get_SystemBetaValues(self, num_planets):
+        self.system.get_SystemBetaValues()
+
+    def time_get_Laskar_CritC(self, num_planets):
+        ''' Every adjacent pair of the system, as get_AMDBeta would visit them.'''
+        for p_index in range(1, num_planets):
+            self.system.get_Laskar_CritC(p_index)
+
+class BatchBetaSuite:
+    ''' Times the catalog-wide batch engine, scaling with the number of systems.'''
+    params = get_Sizes([100, 1000, 10000, 100000])
+    param_names = ['num_systems']
+
+    def setup(self, num_systems):
+        from stableplanets import amd
+        rs = np.random.RandomState(0)
+        counts = rs.randint(2, 7, num_systems)
+        letter = np.concatenate([np.arange(count) for count in counts])
+        self.offsets = np.append(0, np.cumsum(counts)[:-1])
+        self.periods = 10**(rs.uniform(0, 1, len(letter)) + 0.5*letter)
+        self.masses = 10**rs.uniform(-2, 0.5, len(letter))*amd.MJUPITER_IN_MSUN
+        self.eccentricities = rs.uniform(0, 0.3, len(letter))
+        self.stellar_masses = rs.uniform(0.5, 1.5, num_systems)
+
+    def time_get_BatchBetaValues(self, num_systems):
+        from stableplanets import amd
+        amd.get_BatchBetaValues(self.periods, self.masses, self.eccentricities,
+                                self.stellar_masses, self.offsets)
+
+class CompactSystemSuite:
+    ''' Times the array-backed system's per-pair calculations & tracks the memory
+        of a compact set, scaling with the number of systems.
+    '''
+    params = get_Sizes([100, 1000, 10000, 100000])
+    param_names = ['num_systems']
+
+    def setup(self, num_systems):
+        from stableplanets import compact
+        self.system = compact.CompactPlanetarySystem.from_PlanetarySystem(new_PlanetarySystem(8))
+        systems = [compact.CompactPlanetarySystem.from_PlanetarySystem(new_PlanetarySystem(4, seed))
+                   for seed in range(10)]
+        self.systems = compact.CompactSystemSet.from_Systems(systems*(num_systems//10 + 1))
+
+    def time_get_Laskar_CritC(self, num_systems):
+        for p_index in range(1, len(self.system)):
+            self.system.get_Laskar_CritC(p_index)
+
+    def time_get_SystemBetaValues(self, num_systems):
+        self.systems.get_SystemBetaValues()
+
+    def track_nbytes(self, num_systems):
+        return self.systems.nbytes
+    track_nbytes.unit = "bytes"
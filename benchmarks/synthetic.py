@@ -0,0 +1,123 @@
+# Python Functions Generating the Synthetic Inputs of the StablePlanets Benchmarks
+# Nothing Here Needs Network Access or Community-Code Workers.
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import numpy as np
+
+# Import the Amuse Base Packages
+from amuse.datamodel import Particles
+from amuse.units import units
+from amuse.units import constants
+from amuse.ext.orbital_elements import generate_binaries
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# Multiplies Every Benchmark Size, e.g. STABLEPLANETS_BENCH_SCALE=0.1 for a Quick Pass
+SCALE = float(os.environ.get("STABLEPLANETS_BENCH_SCALE", 1.0))
+
+def get_Sizes(sizes):
+    ''' Scales a list of benchmark sizes by SCALE, keeping each at least 2.'''
+    return sorted(set(max(2, int(round(size*SCALE))) for size in sizes))
+
+def new_PlanetarySystem(num_planets, seed=0):
+    ''' Returns a stellar_systems.PlanetarySystem of num_planets planets on
+        log-uniformly spaced, mildly eccentric orbits around a solar-mass star.
+    '''
+    from stableplanets import stellar_systems
+    rs = np.random.RandomState(seed)
+    host_star = Particles(1)[0]
+    host_star.mass = 1 | units.MSun
+    planets = Particles(num_planets)
+    planets.mass = 10**rs.uniform(-2, 1, num_planets) | units.MJupiter
+    planets.semimajor_axis = np.geomspace(0.1, 30, num_planets) | units.AU
+    planets.eccentricity = rs.uniform(0, 0.2, num_planets)
+    mu = constants.G*(host_star.mass + planets.mass)
+    planets.period = 2*np.pi*(planets.semimajor_axis**3/mu).sqrt()
+    return stellar_systems.PlanetarySystem(host_star, planets, system_name="Synthetic-"+str(num_planets))
+
+def new_ClusterSnapshot(num_stars, planets_per_star=1, binary_fraction=0.2, seed=0):
+    ''' Returns a cluster snapshot as one AMUSE particle set: num_stars stars in a
+        uniform 1 parsec sphere, a fraction of them replaced by bound 50-500 AU
+        binaries, and planets_per_star planets on 1-30 AU orbits around each star.
+    '''
+    rs = np.random.RandomState(seed)
+    num_binaries = int(binary_fraction*num_stars)
+    num_singles = num_stars - num_binaries
+    centers = rs.normal(size=(num_stars, 3))
+    centers *= (rs.uniform(0, 1, num_stars)**(1./3.)/np.sqrt((centers**2).sum(axis=1)))[:, None]
+    stars = Particles(num_singles + 2*num_binaries)
+    stars.mass = 10**rs.uniform(-0.7, 0.5, len(stars)) | units.MSun
+    stars.position = np.zeros((len(stars), 3)) | units.parsec
+    stars.velocity = rs.normal(0, 1, (len(stars), 3)) | units.kms
+    stars[:num_singles].position = centers[:num_singles] | units.parsec
+    if num_binaries > 0:
+        primaries, secondaries = stars[num_singles::2], stars[num_singles+1::2]
+        p, s = generate_binaries(primaries.mass, secondaries.mass,
+                                 10**rs.uniform(np.log10(50), np.log10(500), num_binaries) | units.AU,
+                                 eccentricity=rs.uniform(0, 0.5, num_binaries), G=constants.G)
+        primaries.position = p.position + (centers[num_singles:] | units.parsec)
+        secondaries.position = s.position + (centers[num_singles:] | units.parsec)
+        primaries.velocity += p.velocity
+        secondaries.velocity = primaries.velocity - p.velocity + s.velocity
+    stars.radius = 2000 | units.AU
+    stars.type = "star"
+    # Planets on Circular-ish Orbits, in Random Planes, Around Each Star
+    host_index = np.repeat(np.arange(len(stars)), planets_per_star)
+    planets = Particles(len(host_index))
+    if len(planets) > 0:
+        planets.mass = 10**rs.uniform(-2, 0.5, len(planets)) | units.MJupiter
+        p, s = generate_binaries(stars.mass[host_index], planets.mass,
+                                 10**rs.uniform(0, np.log10(30), len(planets)) | units.AU,
+                                 eccentricity=rs.uniform(0, 0.1, len(planets)),
+                                 true_anomaly=rs.uniform(0, 360, len(planets)) | units.deg,
+                                 inclination=np.degrees(np.arccos(rs.uniform(-1, 1, len(planets)))) | units.deg,
+                                 longitude_of_the_ascending_node=rs.uniform(0, 360, len(planets)) | units.deg,
+                                 G=constants.G)
+        planets.position = stars.position[host_index] + s.position - p.position
+        planets.velocity = stars.velocity[host_index] + s.velocity - p.velocity
+        planets.radius = 0.01 | units.AU
+        planets.type = "planet"
+    bodies = Particles()
+    bodies.add_particles(stars)
+    bodies.add_particles(planets)
+    bodies.id = np.arange(len(bodies)) + 1
+    return bodies
+
+def write_SyntheticCatalog(path, num_systems, missing_fraction=0.05, seed=0):
+    ''' Writes a CSV catalog with the columns of the Archive query (io.CATALOG_COLUMNS),
+        one to six planets per system & missing_fraction of the values left blank.
+    '''
+    from astropy.table import Table, MaskedColumn
+    from stableplanets.io import CATALOG_COLUMNS
+    rs = np.random.RandomState(seed)
+    counts = rs.randint(1, 7, num_systems)
+    system = np.repeat(np.arange(num_systems), counts)
+    letter = np.concatenate([np.arange(count) for count in counts])
+    num_rows = len(system)
+    hostnames = np.char.add("Star-", system.astype(str))
+    columns = {'pl_name': np.char.add(np.char.add(hostnames, " "), np.array(list("bcdefg"))[letter]),
+               'hostname': hostnames, 'sy_snum': np.ones(num_rows, dtype=int), 'sy_pnum': counts[system],
+               'pl_orbper': 10**(rs.uniform(0, 1, num_rows) + 0.5*letter), 'pl_bmassj': 10**rs.uniform(-2, 1, num_rows),
+               'pl_bmassprov': np.full(num_rows, "Mass"), 'pl_orbeccen': rs.uniform(0, 0.3, num_rows),
+               'st_spectype': np.full(num_rows, "G2 V"), 'st_rad': rs.uniform(0.5, 2, num_systems)[system],
+               'st_mass': rs.uniform(0.5, 1.5, num_systems)[system], 'st_age': rs.uniform(0.5, 10, num_systems)[system],
+               'pl_radj': 10**rs.uniform(-1.2, 0.2, num_rows), 'st_teff': rs.uniform(4000, 7000, num_systems)[system],
+               'rv_flag': rs.randint(0, 2, num_rows), 'tran_flag': rs.randint(0, 2, num_rows)}
+    for name in ['pl_orbper', 'pl_bmassj', 'pl_orbeccen', 'st_rad', 'st_mass', 'st_age', 'pl_radj', 'st_teff']:
+        columns[name+'err1'] = 0.1*columns[name]
+        columns[name+'err2'] = -0.1*columns[name]
+    table = Table(masked=True)
+    for name in CATALOG_COLUMNS:
+        missing = np.zeros(num_rows, dtype=bool)
+        if name not in ('pl_name', 'hostname'):
+            missing = rs.uniform(0, 1, num_rows) < missing_fraction
+        table[name] = MaskedColumn(columns[name], mask=missing)
+    table.write(path, format='csv', overwrite=True)
+    return path
@@ -14,6 +14,6 @@ setup(
     long_description_content_type="text/markdown",
     package_dir = {'': 'src'},
     packages = find_packages('src'),
-    install_requires=['amuse', 'astropy', 'pyvo', 'numpy'],
-    python_requires='>=3.7'
+    install_requires=['amuse', 'astropy', 'pyvo', 'numpy>=1.22', 'scipy'],
+    python_requires='>=3.8'
 )
@@ -0,0 +1,232 @@
+# Python Functions containing the Batch AMD-Stability Engine for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import warnings
+import numpy as np
+from numpy.random import MT19937
+from numpy.random import RandomState, SeedSequence
+from stableplanets import solvers
+from stableplanets import instrument
+
+# ------------------------------------- #
+#           Defining Constants          #
+# ------------------------------------- #
+
+# Laskar & Petit (2017) Constant Used in the MMR-Overlap Criterion
+# Equal to (K_1(2/3) + 2*K_0(2/3))/pi, Precomputed to Avoid Importing scipy.special
+LASKAR_R = 0.8019857397424691
+
+# Jupiter's Mass in Solar Masses (Matches AMUSE's units.MJupiter)
+MJUPITER_IN_MSUN = 1.8987e27/1.98892e30
+
+# Stability Tests in the Order of their Integer Codes. Pairs too Massive for
+# equation_99 to have a Root (epsilon Above ~0.14) are Unclassified.
+STABILITY_TYPES = np.array(['Star', 'Hill', 'Collision', 'MMR', 'Unclassified'])
+STAR, HILL, COLLISION, MMR, UNCLASSIFIED = range(len(STABILITY_TYPES))
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+def get_SystemIndex(offsets, num_planets):
+    ''' Returns the index of the system each planet belongs to.
+        offsets: Index of the first planet of each system in the flat arrays.
+        num_planets: The total number of planets in the flat arrays.
+    '''
+    offsets = np.asarray(offsets, dtype=np.intp)
+    counts = np.diff(np.append(offsets, num_planets))
+    return np.repeat(np.arange(len(offsets)), counts)
+
+def get_BatchRelAMD(periods, masses, eccentricities, system_index):
+    ''' Returns C/Lam_i for every planet, summing over the planet's own system.
+        Equivalent to PlanetarySystem.get_RelAMD, but O(N) rather than O(N^2).
+    '''
+    lam = masses*np.cbrt(periods)
+    amd = lam*(1 - np.sqrt(1 - eccentricities**2.0))
+    system_amd = np.bincount(system_index, weights=amd)
+    return system_amd[system_index]/lam
+
+def get_BatchHillCritC(alpha, gamma, epsilon):
+    ''' Returns the Hill-Stability C_crit for arrays of adjacent planet pairs.
+        alpha: Semimajor axis ratio of the inner to the outer planet.
+        gamma: Mass ratio of the inner to the outer planet.
+        epsilon: Combined mass of the pair relative to the host star.
+    '''
+    c1 = alpha/(gamma+alpha)
+    c2 = gamma*3**(4./3.)*epsilon**(2./3.)
+    c3 = (1+gamma)
+    return 1 + gamma*np.sqrt(alpha) - c3**(3./2.)*np.sqrt(c1*(1+c2/c3**2.))
+
+def get_BatchLaskarCritC(alpha, gamma, epsilon, r=LASKAR_R):
+    ''' Returns the Laskar & Petit (2017) C_crit and the stability test used
+        (COLLISION or MMR) for arrays of adjacent planet pairs. Pairs where
+        equation_99 has no root get a NaN C_crit and are UNCLASSIFIED.
+    '''
+    alpha, gamma, epsilon = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (alpha, gamma, epsilon)])
+    crit_c = np.empty(alpha.shape)
+    stability_code = np.empty(alpha.shape, dtype=np.int8)
+    alpha_R = solvers.solve_equation_99(r, epsilon)
+    # Preform Collision Restricted Critical AMD Calc
+    collision = alpha < alpha_R
+    inner_ec = solvers.solve_equation_35(gamma[collision], alpha[collision])
+    outer_ec = 1 - alpha[collision] - alpha[collision]*inner_ec
+    crit_c[collision] = gamma[collision]*np.sqrt(alpha[collision])*(1-np.sqrt(1-inner_ec**2.0)) + (1-np.sqrt(1-outer_ec**2.0))
+    stability_code[collision] = COLLISION
+    # Preform MMR-Overlap Restricted Critical AMD Calc
+    mmr = ~collision
+    a, g, eps = alpha[mmr], gamma[mmr], epsilon[mmr]
+    alpha_circ = 4/(3**(6/7))*(r*eps)**(2/7)
+    # Only Evaluate g Below alpha_circ, so Coincident Orbits (alpha = 1) aren't Divided By
+    g_mmr = np.zeros(a.shape)
+    inside = a < alpha_circ
+    a_in, reps = a[inside], r*eps[inside]
+    g_mmr[inside] = (81.*(1-a_in)**5.)/(512.*reps) - (32*reps)/(9*(1-a_in)**2)
+    crit_c[mmr] = (g_mmr**2/2.0)*(g*np.sqrt(a))/(1+g*np.sqrt(a))
+    stability_code[mmr] = MMR
+    # Pairs Where equation_99 has No Root in [0, 1] Can't be Classified
+    unclassified = np.isnan(alpha_R)
+    crit_c[unclassified] = np.nan
+    stability_code[unclassified] = UNCLASSIFIED
+    return crit_c, stability_code
+
+@instrument.timed("amd.get_BatchBetaValues")
+def get_BatchBetaValues(periods, masses, eccentricities, stellar_masses, offsets, sort_keys=None):
+    ''' Calculates the AMD Stability Coefficient, Beta, for every planet of many
+        systems in a single vectorized pass. Matches PlanetarySystem.get_AMDBeta.
+        periods: Flat array of orbital periods (any unit).
+        masses: Flat array of planet masses (same unit as stellar_masses).
+        eccentricities: Flat array of orbital eccentricities.
+        stellar_masses: Host star mass of each system.
+        offsets: Index of the first planet of each system in the flat arrays.
+        sort_keys: Flat array the planets of each system are ordered by before
+                   pairing neighbours (Defaults to P**2*(M*+m), which follows
+                   the semimajor-axis order PlanetarySystem sorts by).
+
+        Returns the beta values and stability types ('Star', 'Hill', 'Collision',
+        'MMR' or 'Unclassified') in the same order as the provided planets.
+    '''
+    beta, stability_code = get_BatchBetaCodes(periods, masses, eccentricities, stellar_masses, offsets, sort_keys)
+    return beta, STABILITY_TYPES[stability_code]
+
+def get_BatchBetaCodes(periods, masses, eccentricities, stellar_masses, offsets, sort_keys=None):
+    ''' As get_BatchBetaValues, but returns the stability types as their int8
+        codes (indices into STABILITY_TYPES), which take a byte per planet.
+    '''
+    periods = np.asarray(periods, dtype=float)
+    masses = np.asarray(masses, dtype=float)
+    eccentricities = np.asarray(eccentricities, dtype=float)
+    stellar_masses = np.asarray(stellar_masses, dtype=float)
+    num_planets = len(periods)
+    system_index = get_SystemIndex(offsets, num_planets)
+    # Sort Each System by Semimajor Axis as PlanetarySystem Does. a**3 Goes as P**2*(M*+m),
+    # which Keeps Nearly Coincident Orbits of Unequal Mass in the Same Order.
+    if sort_keys is None:
+        sort_keys = periods**2*(stellar_masses[system_index] + masses)
+    order = np.lexsort((np.asarray(sort_keys, dtype=float), system_index))
+    period, mass, ecc, sys_index = periods[order], masses[order], eccentricities[order], system_index[order]
+    eta = get_BatchRelAMD(period, mass, ecc, sys_index)
+    # Pair Each Planet with its Inner Neighbour (The Innermost Pairs with the Star)
+    has_inner = np.zeros(num_planets, dtype=bool)
+    has_inner[1:] = sys_index[1:] == sys_index[:-1]
+    outer = np.flatnonzero(has_inner)
+    inner = outer - 1
+    alpha = (period[inner]/period[outer])**(2./3)
+    gamma = mass[inner]/mass[outer]
+    epsilon = (mass[inner]+mass[outer])/stellar_masses[sys_index[outer]]
+    # Innermost Planets Return C_crit = 1
+    beta = eta.copy()
+    stability_code = np.full(num_planets, STAR, dtype=np.int8)
+    # A Non-Positive Hill C_crit Means the Pair can't be Hill Stable, rather than a Negative Beta
+    HCc = get_BatchHillCritC(alpha, gamma, epsilon)
+    betaH = np.divide(eta[outer], HCc, out=np.full(HCc.shape, np.inf), where=HCc > 0.0)
+    beta[outer] = betaH
+    stability_code[outer] = HILL
+    # Only Pairs Failing the Hill Test Need the Laskar Critical AMD. A Zero
+    # Laskar C_crit Leaves No Room for Any AMD, so Beta is Infinite.
+    laskar = betaH >= 1.0
+    LCc, stability_code[outer[laskar]] = get_BatchLaskarCritC(alpha[laskar], gamma[laskar], epsilon[laskar])
+    beta[outer[laskar]] = np.divide(eta[outer[laskar]], LCc, out=np.full(LCc.shape, np.inf), where=LCc != 0.0)
+    # Return the Results in the Order the Planets were Provided
+    beta_out = np.empty(num_planets)
+    beta_out[order] = beta
+    code_out = np.empty(num_planets, dtype=np.int8)
+    code_out[order] = stability_code
+    return beta_out, code_out
+
+def draw_SplitNormal(random_state, values, err1, err2, num_draws):
+    ''' Draws realizations of values from a split normal distribution.
+        random_state: The numpy RandomState used for the draws.
+        values: The central values.
+        err1: The upper 1-sigma errors (catalog "err1" convention).
+        err2: The lower 1-sigma errors (catalog "err2" convention, <= 0).
+        num_draws: The number of realizations to draw for every value.
+    '''
+    values = np.asarray(values, dtype=float)
+    z = random_state.standard_normal((num_draws,) + values.shape)
+    return values + z*np.where(z >= 0, np.abs(err1), np.abs(err2))
+
+@instrument.timed("amd.sample_BatchBetaValues")
+def sample_BatchBetaValues(periods, masses, eccentricities, stellar_masses, offsets, num_draws=1000, **kwargs):
+    ''' Propagates asymmetric error bars into Beta by Monte Carlo, evaluating
+        all draws of a block of systems in one get_BatchBetaValues call.
+        periods, masses, eccentricities, stellar_masses, offsets: As in get_BatchBetaValues.
+        num_draws: The number of realizations drawn per system.
+        period_errs, mass_errs, ecc_errs, stellar_mass_errs: (err1, err2) pairs of
+            upper & lower errors for the matching parameter (Defaults to none).
+        quantiles: The beta quantiles to return (Defaults to 0.16, 0.5, 0.84).
+        max_batch: The max number of planet-draws held in memory at once.
+        seed: The random seed used for the draws (Draws repeat for the same seed & max_batch).
+
+        Returns the per-planet beta quantiles, shaped (num_planets, len(quantiles)),
+        and the per-planet probability of being AMD-stable, P(beta<1).
+    '''
+    period_errs = kwargs.get("period_errs", (0.0, 0.0))
+    mass_errs = kwargs.get("mass_errs", (0.0, 0.0))
+    ecc_errs = kwargs.get("ecc_errs", (0.0, 0.0))
+    stellar_mass_errs = kwargs.get("stellar_mass_errs", (0.0, 0.0))
+    quantiles = kwargs.get("quantiles", (0.16, 0.5, 0.84))
+    max_batch = kwargs.get("max_batch", 2**20)
+    seed = kwargs.get("seed", None)
+
+    rs = RandomState(MT19937(SeedSequence(seed)))
+    offsets = np.asarray(offsets, dtype=np.intp)
+    num_planets, num_systems = len(periods), len(offsets)
+    ends = np.append(offsets[1:], num_planets)
+    # Broadcast the Errors to the Shape of their Parameters
+    params = [periods, masses, eccentricities, stellar_masses]
+    errors = [period_errs, mass_errs, ecc_errs, stellar_mass_errs]
+    params = [np.asarray(p, dtype=float) for p in params]
+    errors = [[np.broadcast_to(np.asarray(err, dtype=float), p.shape) for err in errs] for p, errs in zip(params, errors)]
+    beta_quantiles = np.full((num_planets, len(quantiles)), np.nan)
+    prob_stable = np.full(num_planets, np.nan)
+    # Work Through Blocks of Whole Systems to Keep the Memory Bounded
+    sys_start = 0
+    while sys_start < num_systems:
+        block_sizes = np.cumsum(ends[sys_start:] - offsets[sys_start:])*num_draws
+        sys_end = sys_start + max(1, np.searchsorted(block_sizes, max_batch, side='right'))
+        p0, p1 = offsets[sys_start], ends[sys_end-1]
+        pl, sy = slice(p0, p1), slice(sys_start, sys_end)
+        draws = [draw_SplitNormal(rs, p[s], err[0][s], err[1][s], num_draws) \
+                 for p, err, s in zip(params, errors, [pl, pl, pl, sy])]
+        period, mass, ecc, stellar_mass = draws
+        # Keep the Draws Physical
+        period, mass, stellar_mass = [np.clip(x, np.finfo(float).tiny, None) for x in (period, mass, stellar_mass)]
+        ecc = np.clip(ecc, 0.0, 1.0 - np.finfo(float).epsneg)
+        # Every Draw of the Block is Treated as its Own System
+        draw_offsets = (np.arange(num_draws)[:, None]*(p1-p0) + (offsets[sy]-p0)[None, :]).ravel()
+        beta, _ = get_BatchBetaCodes(period.ravel(), mass.ravel(), ecc.ravel(),
+                                     stellar_mass.ravel(), draw_offsets)
+        beta = beta.reshape(num_draws, p1-p0)
+        if p1 > p0:
+            # Unclassifiable (NaN) Draws are Left Out of the Statistics
+            with warnings.catch_warnings(), np.errstate(invalid='ignore'):
+                warnings.simplefilter('ignore', RuntimeWarning)
+                beta_quantiles[pl] = np.nanquantile(beta, quantiles, axis=0, method='inverted_cdf').T
+                prob_stable[pl] = np.sum(beta < 1.0, axis=0)/np.sum(~np.isnan(beta), axis=0)
+        sys_start = sys_end
+    return beta_quantiles, prob_stable
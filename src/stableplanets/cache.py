@@ -0,0 +1,121 @@
+# Python Functions containing the On-Disk Catalog Cache for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import json
+import time
+import hashlib
+import tempfile
+import numpy as np
+from astropy.table import Table
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# Where Cached Tables are Kept & How Long (in Seconds) a Cached Query Stays Fresh
+CACHE_DIR = os.environ.get("STABLEPLANETS_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "stableplanets"))
+CACHE_TTL = float(os.environ.get("STABLEPLANETS_CACHE_TTL", 24*3600))
+
+def get_CacheKey(*parts):
+    ''' Returns a stable key for a cached table from the strings identifying it
+        (e.g. the service URL and the query, which includes the column list).
+        Runs of whitespace are collapsed, so reformatting a query keeps its key.
+    '''
+    text = "\n".join(" ".join(str(part).split()) for part in parts)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def get_CachePaths(key, cache_dir=None, version=None):
+    ''' Returns the paths of the data, mask & metadata files of a cached table.
+        version: The tag of one write of the table, recorded in its metadata, which
+                 keeps the data & mask of different writes apart.
+    '''
+    base = os.path.join(cache_dir or CACHE_DIR, key)
+    tag = "" if version is None else "."+version
+    return base+tag+".data.npy", base+tag+".mask.npy", base+".json"
+
+def write_CachedTable(table, key, cache_dir=None, **meta):
+    ''' Stores an Astropy Table as memory-mappable .npy files.
+        table: The table to store. Object columns are stored as strings.
+        key: The cache key (see get_CacheKey).
+        cache_dir: The cache directory (Defaults to CACHE_DIR).
+        Any other keyword arguments are saved alongside as metadata.
+    '''
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    table = Table(table, masked=True, copy=False)
+    for name in table.colnames:
+        if table[name].dtype.kind == 'O':
+            table[name] = table[name].astype(str)
+    data = table.as_array()
+    meta.update({'created': time.time(), 'colnames': table.colnames,
+                 'units': {name: str(table[name].unit) for name in table.colnames if table[name].unit is not None}})
+    # Each Write Gets its Own Data & Mask Files, Named in the Metadata, Which is
+    # Moved into Place Last, so Readers Only See the Files of One Complete Write
+    old_meta = get_CacheMeta(key, cache_dir)
+    meta['version'] = "%x.%s" % (time.time_ns(), os.urandom(4).hex())
+    paths = get_CachePaths(key, cache_dir, meta['version'])
+    contents = [np.ma.getdata(data), np.ma.getmaskarray(data)]
+    temp_paths = []
+    try:
+        for content, path in zip(contents, paths):
+            temp_paths.append(path)
+            with open(path, 'wb') as f:
+                np.save(f, content)
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".json")
+        temp_paths.append(temp_path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, paths[2])
+    except:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    # Remove the Files of the Write this Replaced (Open Memory-Maps Keep Working)
+    if old_meta is not None:
+        for path in get_CachePaths(key, cache_dir, old_meta.get('version'))[:2]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def get_CacheMeta(key, cache_dir=None):
+    ''' Returns the metadata of a cached table, or None if it isn't cached.'''
+    try:
+        with open(get_CachePaths(key, cache_dir)[2]) as f:
+            return json.load(f)
+    except:
+        return None
+
+def read_CachedTable(key, ttl=None, cache_dir=None):
+    ''' Loads a cached table, memory-mapping its columns (copy-on-write).
+        key: The cache key (see get_CacheKey).
+        ttl: The max age in seconds of a usable copy (Defaults to no limit).
+        cache_dir: The cache directory (Defaults to CACHE_DIR).
+        Returns the table, or None if it is missing, expired or unreadable.
+    '''
+    meta = get_CacheMeta(key, cache_dir)
+    if meta is None:
+        return None
+    if ttl is not None and time.time() - meta['created'] > ttl:
+        return None
+    data_path, mask_path, _ = get_CachePaths(key, cache_dir, meta.get('version'))
+    try:
+        data = np.load(data_path, mmap_mode='c')
+        mask = np.load(mask_path, mmap_mode='c')
+    except:
+        return None
+    if data.shape != mask.shape or list(data.dtype.names or []) != meta['colnames']:
+        return None
+    table = Table(np.ma.MaskedArray(data, mask=mask), copy=False)
+    for name, unit in meta.get('units', {}).items():
+        table[name].unit = unit
+    table.meta['cache_created'] = meta['created']
+    return table
@@ -0,0 +1,388 @@
+# Python Classes/Functions containing the Compact, Array-Backed Planetary Systems for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+from stableplanets import amd
+
+# Note: AMUSE is Only Imported when Converting to or from Particles.
+
+# ------------------------------------- #
+#           Defining Constants          #
+# ------------------------------------- #
+
+# The Canonical Units of the Plain Float64 Arrays (Names of AMUSE Units)
+CANONICAL_UNITS = {'stellar_mass': 'MSun', 'period': 'day', 'mass': 'MSun',
+                   'radius': 'AU', 'inclination': 'rad'}
+
+# Jupiter's Radius in AU (Matches AMUSE's units.RJupiter)
+RJUPITER_IN_AU = 71492.0/149597870.691
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+def get_ReorderedUncertainties(uncertainties, order):
+    ''' Reorders the planet ranges of a PlanetarySystem-style uncertainties
+        dictionary, leaving the star ranges (st_*) as they are.
+    '''
+    if uncertainties is None:
+        return None
+    reordered = {}
+    for name, (min_param, max_param) in uncertainties.items():
+        if not name.startswith('st_'):
+            min_param = np.asarray(min_param, dtype=float)[order]
+            max_param = np.asarray(max_param, dtype=float)[order]
+        reordered[name] = (min_param, max_param)
+    return reordered
+
+def get_PlanetArrays(host_star, planets):
+    ''' Returns the period, mass, eccentricity, radius & inclination of an AMUSE
+        particle set as float64 arrays in CANONICAL_UNITS. Periods are derived
+        from semimajor axes when missing; missing radii & inclinations are NaN.
+    '''
+    from amuse.units import units
+    from amuse.units import constants
+    from amuse.units.quantities import is_quantity
+    attributes = planets.get_attribute_names_defined_in_store()
+    if 'period' in attributes:
+        period = planets.period.value_in(units.day)
+    else:
+        mu = constants.G*(host_star.mass + planets.mass)
+        period = (2.0*np.pi*(planets.semimajor_axis**3/mu).sqrt()).value_in(units.day)
+    radius = np.full(len(planets), np.nan)
+    if 'radius' in attributes:
+        radius = planets.radius.value_in(units.AU)
+    inclination = np.full(len(planets), np.nan)
+    if 'inclination' in attributes:
+        # Unitless Inclinations are in Degrees, as in amuse.ext.orbital_elements
+        inclination = planets.inclination
+        inclination = inclination.value_in(units.rad) if is_quantity(inclination) else np.radians(inclination)
+    return (period, planets.mass.value_in(units.MSun), np.asarray(planets.eccentricity, dtype=float),
+            radius, inclination)
+
+class CompactPlanetarySystem():
+    ''' A PlanetarySystem held as plain float64 arrays in CANONICAL_UNITS, with
+        its planets sorted by semimajor axis. AMUSE is only touched by
+        from_Particles, from_PlanetarySystem, to_Particles & to_PlanetarySystem.
+        stellar_mass: The host star's mass (in MSun).
+        period, mass, eccentricity: The planets' periods (in day), masses (in MSun)
+                                    & eccentricities.
+        radius, inclination: The planets' radii (in AU) & inclinations (in rad),
+                             (Defaults to NaN).
+        system_name: The name of the system.
+        uncertainties: [min, max] ranges as in PlanetarySystem, in the order of the
+                       provided planets.
+        sort: Sort the planets by semimajor axis. Only pass False for arrays which
+              already are, so they are kept as views rather than copied.
+        sort_keys: The values the planets are sorted by (Defaults to P**2*(M*+m),
+                   which goes as the semimajor axis cubed).
+    '''
+    __slots__ = ('system_name', 'stellar_mass', 'period', 'mass', 'eccentricity', 'radius', 'inclination',
+                 'uncertainties', 'AMDBeta', 'stability_code', 'r')
+
+    def __init__(self, stellar_mass, period, mass, eccentricity, radius=None, inclination=None,
+                 system_name='', uncertainties=None, sort=True, sort_keys=None):
+        period = np.asarray(period, dtype=np.float64)
+        arrays = [period, mass, eccentricity,
+                  np.full(len(period), np.nan) if radius is None else radius,
+                  np.full(len(period), np.nan) if inclination is None else inclination]
+        arrays = [np.asarray(array, dtype=np.float64) for array in arrays]
+        if sort:
+            # Order the Planets by Semimajor Axis, as PlanetarySystem Does
+            if sort_keys is None:
+                sort_keys = period**2*(float(stellar_mass) + arrays[1])
+            order = np.argsort(np.asarray(sort_keys, dtype=np.float64), kind='stable')
+            arrays = [array[order] for array in arrays]
+            uncertainties = get_ReorderedUncertainties(uncertainties, order)
+        self.period, self.mass, self.eccentricity, self.radius, self.inclination = arrays
+        self.stellar_mass = float(stellar_mass)
+        self.system_name = system_name
+        self.uncertainties = uncertainties
+        self.AMDBeta = None
+        self.stability_code = None
+        self.r = amd.LASKAR_R
+
+    @classmethod
+    def from_Particles(cls, host_star, planets, system_name='', uncertainties=None):
+        ''' Converts an AMUSE host star & planet set (see get_PlanetArrays),
+            ordering the planets by their semimajor axes where they are given.
+        '''
+        from amuse.units import units
+        sort_keys = None
+        if 'semimajor_axis' in planets.get_attribute_names_defined_in_store():
+            sort_keys = planets.semimajor_axis.value_in(units.AU)
+        return cls(host_star.mass.value_in(units.MSun), *get_PlanetArrays(host_star, planets),
+                   system_name=system_name, uncertainties=uncertainties, sort_keys=sort_keys)
+
+    @classmethod
+    def from_PlanetarySystem(cls, system):
+        ''' Converts a stellar_systems.PlanetarySystem.'''
+        uncertainties = system.uncertainties
+        if uncertainties is not None:
+            # Match the Provided Ranges to the Sorted Planets
+            key_index = {key: i for i, key in enumerate(system.input_keys)}
+            uncertainties = get_ReorderedUncertainties(uncertainties, [key_index[key] for key in system.planets.key])
+        return cls.from_Particles(system.host_star, system.planets, system.system_name, uncertainties)
+
+    def to_Particles(self):
+        ''' Returns the system as an AMUSE host star & planet set, with semimajor
+            axes from Kepler's third law and any computed AMDBeta & stability_type.
+        '''
+        from amuse.datamodel import Particles
+        from amuse.units import units
+        from amuse.units import constants
+        host_star = Particles(1)[0]
+        host_star.mass = self.stellar_mass | units.MSun
+        planets = Particles(len(self))
+        planets.mass = self.mass | units.MSun
+        planets.period = self.period | units.day
+        planets.eccentricity = self.eccentricity
+        planets.radius = self.radius | units.AU
+        planets.inclination = self.inclination | units.rad
+        mu = constants.G*(host_star.mass + planets.mass)
+        planets.semimajor_axis = (mu*(planets.period/(2.0*np.pi))**2)**(1./3.)
+        if self.AMDBeta is not None:
+            planets.AMDBeta = self.AMDBeta
+            planets.stability_type = self.stability_type
+        return host_star, planets
+
+    def to_PlanetarySystem(self):
+        ''' Returns the system as a stellar_systems.PlanetarySystem.'''
+        from stableplanets import stellar_systems
+        host_star, planets = self.to_Particles()
+        return stellar_systems.PlanetarySystem(host_star, planets, system_name=self.system_name,
+                                               uncertainties=self.uncertainties)
+
+    def __len__(self):
+        return len(self.period)
+
+    @property
+    def number_of_planets(self):
+        return len(self.period)
+
+    @property
+    def stability_type(self):
+        if self.stability_code is None:
+            return None
+        return amd.STABILITY_TYPES[self.stability_code]
+
+    @property
+    def nbytes(self):
+        ''' The bytes held by the system's arrays.'''
+        arrays = [self.period, self.mass, self.eccentricity, self.radius, self.inclination,
+                  self.AMDBeta, self.stability_code]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def set_Result(self, p_index, beta=None, stability_code=None):
+        # Results are Only Allocated Once Something is Computed
+        if self.AMDBeta is None:
+            self.AMDBeta = np.full(len(self), np.nan)
+            self.stability_code = np.full(len(self), amd.STAR, dtype=np.int8)
+        if beta is not None:
+            self.AMDBeta[p_index] = beta
+        if stability_code is not None:
+            self.stability_code[p_index] = stability_code
+
+    def get_RelAMD(self, p_index):
+        """C/Lam_i for Planet p_index"""
+        lam = self.mass*np.cbrt(self.period)
+        return np.sum(lam*(1 - np.sqrt(1 - self.eccentricity**2.0)))/lam[p_index]
+
+    def get_SystemBetaValues(self):
+        """Calculate the AMD Stability Coefficient, Beta, values for the system."""
+        self.AMDBeta, self.stability_code = amd.get_BatchBetaCodes(self.period, self.mass, self.eccentricity,
+                                                                   [self.stellar_mass], [0],
+                                                                   sort_keys=np.arange(len(self)))
+        return self.AMDBeta
+
+    def get_SystemBetaDistribution(self, num_draws=1000, **kwargs):
+        """Sample the Beta values of the system from its uncertainties. Returns the
+           per-planet beta quantiles and P(beta<1) (see amd.sample_BatchBetaValues)."""
+        if self.uncertainties is None:
+            raise ValueError('Error: '+self.system_name+' was not Provided any Uncertainties.')
+        def get_errors(name, values):
+            if name not in self.uncertainties:
+                return (0.0, 0.0)
+            min_param, max_param = [np.asarray(limit, dtype=float) for limit in self.uncertainties[name]]
+            return (max_param - values, min_param - values)
+        masses = self.mass/amd.MJUPITER_IN_MSUN
+        mass_errs = get_errors('pl_bmassj', masses)
+        stellar_mass_errs = get_errors('st_mass', self.stellar_mass)
+        return amd.sample_BatchBetaValues(self.period, self.mass, self.eccentricity,
+                                          [self.stellar_mass], [0], num_draws=num_draws,
+                                          period_errs=get_errors('pl_orbper', self.period),
+                                          mass_errs=tuple(np.multiply(err, amd.MJUPITER_IN_MSUN) for err in mass_errs),
+                                          ecc_errs=get_errors('pl_orbeccen', self.eccentricity),
+                                          stellar_mass_errs=tuple(np.atleast_1d(err) for err in stellar_mass_errs),
+                                          **kwargs)
+
+    def get_AMDBeta(self, p_index):
+        """Get the beta value for the pair i-1 and i"""
+        eta = self.get_RelAMD(p_index)
+        HCc = self.get_Hill_CritC(p_index)
+        # A Non-Positive Hill C_crit Means the Pair can't be Hill Stable
+        if HCc > 0.0:
+            betaH = eta/HCc
+            if betaH < 1.0:
+                self.set_Result(p_index, beta=betaH)
+                return betaH
+        LCc = self.get_Laskar_CritC(p_index)
+        # A Zero Laskar C_crit Leaves No Room for Any AMD
+        betaL = eta/LCc if LCc != 0.0 else np.inf
+        self.set_Result(p_index, beta=betaL)
+        return betaL
+
+    def get_alpha(self, p_index):
+        if p_index == 0:
+            return 0.0
+        return (self.period[p_index-1]/self.period[p_index])**(2./3)
+
+    def get_epsilon(self, p_index):
+        if p_index == 0:
+            return self.mass[p_index]/self.stellar_mass
+        return (self.mass[p_index-1]+self.mass[p_index])/self.stellar_mass
+
+    def get_PairRatios(self, p_index):
+        # The alpha, gamma & epsilon of the pair i-1 and i
+        return (self.get_alpha(p_index), self.mass[p_index-1]/self.mass[p_index], self.get_epsilon(p_index))
+
+    def get_Laskar_CritC(self, p_index):
+        """Get C_crit for the pair i-1 and i"""
+        if p_index == 0:
+            # Inner planet returns C_crit = 1
+            self.set_Result(p_index, stability_code=amd.STAR)
+            return 1.
+        crit_c, stability_code = amd.get_BatchLaskarCritC(*[np.atleast_1d(x) for x in self.get_PairRatios(p_index)],
+                                                          r=self.r)
+        self.set_Result(p_index, stability_code=stability_code[0])
+        return float(crit_c[0])
+
+    def get_Hill_CritC(self, p_index):
+        if p_index == 0:
+            self.set_Result(p_index, stability_code=amd.STAR)
+            return 1.
+        self.set_Result(p_index, stability_code=amd.HILL)
+        return float(amd.get_BatchHillCritC(*self.get_PairRatios(p_index)))
+
+class CompactSystemSet():
+    ''' Many planetary systems held as flat float64 arrays in CANONICAL_UNITS, the
+        planets of each system stored contiguously & sorted by semimajor axis.
+        Indexing returns a CompactPlanetarySystem whose arrays are views into the
+        set, and the stability methods treat the whole set as one batch.
+        stellar_masses: The host star mass of each system (in MSun).
+        offsets: Index of the first planet of each system in the flat arrays.
+        period, mass, eccentricity, radius, inclination: Flat planet arrays, as in
+                                                         CompactPlanetarySystem.
+        system_names: The name of each system.
+        rows: The index each planet was provided at (e.g. its catalog row).
+        sort: Sort each system's planets by semimajor axis, as for CompactPlanetarySystem.
+    '''
+    __slots__ = ('system_names', 'stellar_mass', 'offsets', 'period', 'mass', 'eccentricity', 'radius',
+                 'inclination', 'rows', 'AMDBeta', 'stability_code')
+
+    def __init__(self, stellar_masses, offsets, period, mass, eccentricity, radius=None, inclination=None,
+                 system_names=None, rows=None, sort=True):
+        period = np.asarray(period, dtype=np.float64)
+        num_planets = len(period)
+        arrays = [period, mass, eccentricity,
+                  np.full(num_planets, np.nan) if radius is None else radius,
+                  np.full(num_planets, np.nan) if inclination is None else inclination,
+                  np.arange(num_planets) if rows is None else rows]
+        arrays = [np.asarray(array, dtype=np.float64) for array in arrays[:-1]] + [np.asarray(arrays[-1], dtype=np.intp)]
+        self.offsets = np.append(np.asarray(offsets, dtype=np.intp), num_planets)
+        self.stellar_mass = np.asarray(stellar_masses, dtype=np.float64)
+        if sort:
+            system_index = amd.get_SystemIndex(self.offsets[:-1], num_planets)
+            order = np.lexsort((period**2*(self.stellar_mass[system_index] + arrays[1]), system_index))
+            arrays = [array[order] for array in arrays]
+        self.period, self.mass, self.eccentricity, self.radius, self.inclination, self.rows = arrays
+        if system_names is None:
+            system_names = np.arange(len(self.stellar_mass)).astype(str)
+        self.system_names = np.asarray(system_names, dtype=str)
+        self.AMDBeta = None
+        self.stability_code = None
+
+    @classmethod
+    def from_Catalog(cls, catalog):
+        ''' Converts a hostname-grouped catalog (e.g. ExoplanetCatalog.Catalog).
+            Planet radii & inclinations are read when the catalog has them.
+        '''
+        indices = np.asarray(catalog.groups.indices)
+        def get_column(name, scale=1.0):
+            if name not in catalog.colnames:
+                return None
+            return np.ma.filled(np.ma.asarray(catalog[name], dtype=float), np.nan)*scale
+        return cls(get_column('st_mass')[indices[:-1]], indices[:-1],
+                   get_column('pl_orbper'), get_column('pl_bmassj', amd.MJUPITER_IN_MSUN),
+                   get_column('pl_orbeccen'), radius=get_column('pl_radj', RJUPITER_IN_AU),
+                   inclination=get_column('pl_orbincl', np.pi/180.),
+                   system_names=np.asarray(catalog['hostname'], dtype=str)[indices[:-1]])
+
+    @classmethod
+    def from_Systems(cls, systems):
+        ''' Gathers PlanetarySystems and/or CompactPlanetarySystems into one set.'''
+        systems = [system if isinstance(system, CompactPlanetarySystem) else
+                   CompactPlanetarySystem.from_PlanetarySystem(system) for system in systems]
+        counts = [len(system) for system in systems]
+        def gather(name):
+            return np.concatenate([getattr(system, name) for system in systems]) if systems else np.empty(0)
+        return cls([system.stellar_mass for system in systems], np.append(0, np.cumsum(counts)[:-1]).astype(np.intp),
+                   gather('period'), gather('mass'), gather('eccentricity'), radius=gather('radius'),
+                   inclination=gather('inclination'), system_names=[system.system_name for system in systems],
+                   sort=False)
+
+    def __len__(self):
+        return len(self.stellar_mass)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Error: System '+str(index)+' is not in the Set.')
+        p0, p1 = self.offsets[index], self.offsets[index+1]
+        system = CompactPlanetarySystem(self.stellar_mass[index], self.period[p0:p1], self.mass[p0:p1],
+                                        self.eccentricity[p0:p1], self.radius[p0:p1], self.inclination[p0:p1],
+                                        system_name=self.system_names[index], sort=False)
+        if self.AMDBeta is not None:
+            system.AMDBeta, system.stability_code = self.AMDBeta[p0:p1], self.stability_code[p0:p1]
+        return system
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def number_of_planets(self):
+        return len(self.period)
+
+    @property
+    def stability_type(self):
+        if self.stability_code is None:
+            return None
+        return amd.STABILITY_TYPES[self.stability_code]
+
+    @property
+    def nbytes(self):
+        ''' The bytes held by the set's arrays.'''
+        arrays = [self.system_names, self.stellar_mass, self.offsets, self.period, self.mass, self.eccentricity,
+                  self.radius, self.inclination, self.rows, self.AMDBeta, self.stability_code]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def get_SystemBetaValues(self):
+        """Calculate the Beta values of every planet of the set in one batch."""
+        self.AMDBeta, self.stability_code = amd.get_BatchBetaCodes(self.period, self.mass, self.eccentricity,
+                                                                   self.stellar_mass, self.offsets[:-1],
+                                                                   sort_keys=np.arange(self.number_of_planets))
+        return self.AMDBeta
+
+    def get_SystemBetaDistribution(self, num_draws=1000, **kwargs):
+        """Sample the Beta values of every planet of the set, with flat errors given
+           as in amd.sample_BatchBetaValues (e.g. period_errs=(err1, err2)) in the
+           set's planet order (see rows)."""
+        return amd.sample_BatchBetaValues(self.period, self.mass, self.eccentricity, self.stellar_mass,
+                                          self.offsets[:-1], num_draws=num_draws, **kwargs)
@@ -0,0 +1,116 @@
+# Python Functions containing the Logging & Run Instrumentation for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import time
+import logging
+import functools
+from collections import defaultdict
+from contextlib import contextmanager
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# Every Module Logs Under "stableplanets", which is Silent Until Configured
+# (e.g. via enable_Logging or logging.basicConfig).
+LOGGER_NAME = "stableplanets"
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+# Counters & Stage Timers are Only Updated While Metrics are Enabled
+ENABLED = os.environ.get("STABLEPLANETS_METRICS", "0").lower() not in ("", "0", "false", "no")
+COUNTERS = defaultdict(int)
+STAGES = defaultdict(lambda: [0, 0.0])
+
+def get_Logger(name):
+    ''' Returns the logger of a StablePlanets module, e.g. get_Logger(__name__).'''
+    if not name.startswith(LOGGER_NAME):
+        name = LOGGER_NAME + "." + name
+    return logging.getLogger(name)
+
+def enable_Logging(level=logging.INFO, fmt="%(asctime)s %(levelname)s %(name)s: %(message)s"):
+    ''' Sends StablePlanets' log records at or above level to stderr.'''
+    logger = logging.getLogger(LOGGER_NAME)
+    if not any(getattr(handler, 'stableplanets', False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt))
+        handler.stableplanets = True
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+def enable_Metrics(enabled=True):
+    ''' Turns the counters & stage timers on (or off).'''
+    global ENABLED
+    ENABLED = enabled
+
+def reset_Metrics():
+    COUNTERS.clear()
+    STAGES.clear()
+
+def count(name, n=1):
+    ''' Adds n to the named counter (e.g. "kepler_calls").'''
+    if ENABLED:
+        COUNTERS[name] += n
+
+@contextmanager
+def stage(name):
+    ''' Context manager adding the wall time of its with-block to the named stage.'''
+    if not ENABLED:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        totals = STAGES[name]
+        totals[0] += 1
+        totals[1] += time.perf_counter() - start_time
+
+def timed(name):
+    ''' Decorator timing every call of a function as the named stage.'''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def get_Metrics():
+    ''' Returns the counters & stage timings collected in this process as plain
+        dictionaries: {'counters': {name: count}, 'stages': {name: {'calls',
+        'total_time', 'mean_time'}}}, with times in seconds.
+    '''
+    return {'counters': dict(COUNTERS),
+            'stages': {name: {'calls': calls, 'total_time': total, 'mean_time': total/max(calls, 1)}
+                       for name, (calls, total) in STAGES.items()}}
+
+def merge_Metrics(metrics):
+    ''' Adds metrics exported by get_Metrics (e.g. from a worker process) to this process'.'''
+    for name, value in metrics.get('counters', {}).items():
+        COUNTERS[name] += value
+    for name, timing in metrics.get('stages', {}).items():
+        totals = STAGES[name]
+        totals[0] += timing['calls']
+        totals[1] += timing['total_time']
+
+def get_ProfileReport(metrics=None):
+    ''' Returns a text report of the stages (slowest first) & counters.'''
+    metrics = get_Metrics() if metrics is None else metrics
+    lines = ["{:<52s} {:>8s} {:>12s} {:>12s}".format("Stage", "Calls", "Total [s]", "Mean [s]")]
+    for name, timing in sorted(metrics['stages'].items(), key=lambda item: -item[1]['total_time']):
+        lines.append("{:<52s} {:>8d} {:>12.4f} {:>12.6f}".format(name, timing['calls'], timing['total_time'],
+                                                                timing['mean_time']))
+    lines.append("")
+    lines.append("{:<52s} {:>8s}".format("Counter", "Count"))
+    for name, value in sorted(metrics['counters'].items()):
+        lines.append("{:<52s} {:>8d}".format(name, value))
+    return "\n".join(lines)
@@ -1,13 +1,142 @@
-import pyvo as vo
 from astropy.table import Table
-import astropy.io.votable
-from astropy.io.votable import parse
+import os
 import numpy as np
+from stableplanets import amd
+from stableplanets import compact
+from stableplanets import massradius
+from stableplanets import cache
+from stableplanets import pipeline
+from stableplanets import results as results_store
+from stableplanets import instrument
+
+logger = instrument.get_Logger(__name__)
+
+# The NASA Exoplanet Archive's TAP Service & the Query Pulling its Composite Table
+ARCHIVE_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP"
+CATALOG_COLUMNS = ['pl_name', 'hostname', 'sy_snum', 'sy_pnum', 'pl_orbper', 'pl_orbpererr1', 'pl_orbpererr2',
+                   'pl_bmassj', 'pl_bmassjerr1', 'pl_bmassjerr2', 'pl_bmassprov', 'pl_orbeccen',
+                   'pl_orbeccenerr1', 'pl_orbeccenerr2', 'st_spectype', 'st_rad', 'st_raderr1', 'st_raderr2',
+                   'st_mass', 'st_masserr1', 'st_masserr2', 'st_age', 'st_ageerr1', 'st_ageerr2',
+                   'pl_radj', 'pl_radjerr1', 'pl_radjerr2', 'st_teff', 'st_tefferr1', 'st_tefferr2',
+                   'rv_flag', 'tran_flag']
+CATALOG_QUERY = "SELECT " + ",".join(CATALOG_COLUMNS) + " FROM pscomppars"
+# The Type of each Column, so Chunks of a Streamed Catalog Always Agree
+CATALOG_DTYPES = {name: float for name in CATALOG_COLUMNS}
+CATALOG_DTYPES.update({name: str for name in ['pl_name', 'hostname', 'pl_bmassprov', 'st_spectype']})
+CATALOG_DTYPES.update({name: int for name in ['sy_snum', 'sy_pnum', 'rv_flag', 'tran_flag']})
+
+# These default columns that are being checked are those needed for BEM
+# to accurately estimate the planetary mass of an object. This is key for
+# secular integration later to take into account tidal forces.
+CLEAN_COLUMNS = ['pl_orbper', 'pl_bmassj', 'pl_orbeccen', 'st_mass', 'st_rad', 'st_age', 'st_teff']
+CLEAN_COLUMNS += [column+suffix for column in CLEAN_COLUMNS for suffix in ['err1', 'err2']]
+
+# The Integer Column Catalogs are Grouped By, Holding the Index of each Row's System
+SYSTEM_INDEX = 'system_index'
+
+def get_CleanMask(table, columns_to_check=CLEAN_COLUMNS):
+    """
+    Returns a boolean mask of the rows with no missing values in any of the
+    columns_to_check (columns without a mask have no missing values).
+    """
+    keep = np.ones(len(table), dtype=bool)
+    for column in columns_to_check:
+        keep &= ~np.ma.getmaskarray(table[column])
+    return keep
+
+@instrument.timed("io.impute_MassRadius")
+def impute_MassRadius(table):
+    """
+    Fills the missing planet masses (pl_bmassj) & radii (pl_radj), with their
+    error bars, from the Chen & Kipping (2017) mass-radius relation (see the
+    massradius module), evaluated on whole columns at once. Masses are only
+    estimated for planets with a measured radius and vice versa, and are left
+    missing for radii in the Jovian regime, which no single mass fits. Boolean
+    pl_bmassj_imputed & pl_radj_imputed columns flag the estimated values.
+    Returns the table, which is modified in place.
+    """
+    from astropy.table import MaskedColumn
+    def get_Values(column):
+        return np.ma.getdata(table[column]).astype(float), np.ma.getmaskarray(table[column])
+    def set_Values(column, rows, values):
+        if not hasattr(table[column], 'mask'):
+            table[column] = MaskedColumn(table[column])
+        table[column][rows] = values
+    mass, no_mass = get_Values('pl_bmassj')
+    radius, no_radius = get_Values('pl_radj')
+    # Symmetric Errors from the Mean of the Upper & Lower Error Bars, where Given
+    mass_err = 0.5*np.abs(get_Values('pl_bmassjerr1')[0] - get_Values('pl_bmassjerr2')[0])
+    mass_err[np.ma.getmaskarray(table['pl_bmassjerr1']) | np.ma.getmaskarray(table['pl_bmassjerr2'])] = 0.0
+    radius_err = 0.5*np.abs(get_Values('pl_radjerr1')[0] - get_Values('pl_radjerr2')[0])
+    radius_err[np.ma.getmaskarray(table['pl_radjerr1']) | np.ma.getmaskarray(table['pl_radjerr2'])] = 0.0
+    # Masses from Radii
+    fill_mass = no_mass & ~no_radius & (radius > 0)
+    if fill_mass.any():
+        mass_fit, lower, upper = massradius.calc_MassFromRadius(radius[fill_mass]*massradius.RJUPITER_IN_REARTH,
+                                                                radius_err[fill_mass]*massradius.RJUPITER_IN_REARTH)
+        fitted = np.isfinite(mass_fit)
+        fill_mass[fill_mass] = fitted
+        mass_fit, lower, upper = mass_fit[fitted], lower[fitted], upper[fitted]
+        set_Values('pl_bmassj', fill_mass, mass_fit/massradius.MJUPITER_IN_MEARTH)
+        set_Values('pl_bmassjerr1', fill_mass, (upper - mass_fit)/massradius.MJUPITER_IN_MEARTH)
+        set_Values('pl_bmassjerr2', fill_mass, (lower - mass_fit)/massradius.MJUPITER_IN_MEARTH)
+    # Radii from Masses
+    fill_radius = no_radius & ~no_mass & (mass > 0)
+    if fill_radius.any():
+        radius_fit, log_err = massradius.calc_RadiusFromMass(mass[fill_radius]*massradius.MJUPITER_IN_MEARTH,
+                                                             mass_err[fill_radius]*massradius.MJUPITER_IN_MEARTH)
+        set_Values('pl_radj', fill_radius, radius_fit/massradius.RJUPITER_IN_REARTH)
+        set_Values('pl_radjerr1', fill_radius, radius_fit*(10**log_err - 1)/massradius.RJUPITER_IN_REARTH)
+        set_Values('pl_radjerr2', fill_radius, radius_fit*(10**-log_err - 1)/massradius.RJUPITER_IN_REARTH)
+    table['pl_bmassj_imputed'] = fill_mass
+    table['pl_radj_imputed'] = fill_radius
+    return table
+
+def group_BySystem(table, key="hostname"):
+    """
+    Groups a table by key with a single sort of its key strings, storing the
+    index of each row's group in the integer SYSTEM_INDEX column, which the
+    table is then grouped by. Filtered copies regroup on that column (see
+    filter_GroupedTable) rather than sorting the key strings again.
+    """
+    if np.any(np.ma.getmaskarray(table[key])):
+        raise ValueError("Missing values in key column {!r} are not allowed".format(key))
+    _, system_index = np.unique(np.asarray(table[key], dtype=str), return_inverse=True)
+    table = Table(table, copy=False)
+    table[SYSTEM_INDEX] = system_index.ravel()
+    return table.group_by(SYSTEM_INDEX)
+
+def filter_GroupedTable(table, keep, key="hostname"):
+    """
+    Returns the rows of a table grouped by key where keep is True. Filtering
+    keeps every group contiguous, so the result is regrouped on its integer
+    SYSTEM_INDEX column, whose stable sort of already ordered integers is far
+    cheaper than sorting the key strings again. Emptied groups are dropped.
+    Tables without the column are grouped once (see group_BySystem).
+    """
+    keep = np.asarray(keep, dtype=bool)
+    if SYSTEM_INDEX not in table.colnames:
+        return group_BySystem(table[keep], key)
+    return table[keep].group_by(SYSTEM_INDEX)
 
 class ExoplanetCatalog:
-    def __init__(self, OfflineMode = False, path_to_csv = None):
+    def __init__(self, OfflineMode = False, path_to_csv = None, **kwargs):
+        """
+        OfflineMode: Never contact the Exoplanet Archive (see InitializeCatalog).
+        path_to_csv: A CSV catalog to load in OfflineMode.
+        cache_dir: Where queried & parsed catalogs are cached (Defaults to cache.CACHE_DIR).
+        cache_ttl: Seconds before a cached query is re-run (Defaults to cache.CACHE_TTL).
+        refresh: Skip the cached copy and query the archive again.
+        service: The TAP service queried (Defaults to the Exoplanet Archive's).
+                 Any object whose search(query) returns results with a
+                 to_table() method may stand in for it, e.g. when testing.
+        """
         self.OfflineMode = OfflineMode
         self.path_to_csv = path_to_csv
+        self.cache_dir = kwargs.get("cache_dir", cache.CACHE_DIR)
+        self.cache_ttl = kwargs.get("cache_ttl", cache.CACHE_TTL)
+        self.refresh = kwargs.get("refresh", False)
+        self.service = kwargs.get("service", None)
         self.Catalog = self.InitializeCatalog()
         self.wasCleaned = False
 
@@ -17,81 +146,151 @@ class ExoplanetCatalog:
              - Queried Pull from the Composite Table provided by the
                NASA Exoplanet Archive (suplementing any missing values
                with a pull from the exoplanet.eu catalog).
-             - [OfflineMode=True] allows for the user to use a static
-               catalog provided by StablePlanets release -OR- provide
-               their own CSV compliant catalog given setting [path_to_csv].
+             - [OfflineMode=True] allows for the user to use the last
+               catalog pulled from the archive -OR- provide their own
+               CSV compliant catalog given setting [path_to_csv].
+        Queried and parsed catalogs are cached on disk (see the cache module).
         """
         if self.OfflineMode:
             # In Offline Mode, we want users to be able to still load the tool. By default, provide
-            # a copy of the exoplanet archive kept in the package. If the user wants, allow them to
+            # the last copy of the exoplanet archive pulled. If the user wants, allow them to
             # specify a csv file via giving the direct path to said file.
-            from astropy.io import ascii
             if self.path_to_csv != None:
                 # Read in the user provided CSV
-                table_data = [] # ascii.read(path_to_csv)
+                table_data = self.read_CSV(self.path_to_csv)
+                self.source_key = cache.get_CacheKey(os.path.abspath(self.path_to_csv))
             else:
-                # Read in the package provided CSV
-                table_data = [] # load test catalog
+                # Read in the cached copy of the archive, however old it is
+                self.source_key = self.get_QueryKey()
+                table_data = cache.read_CachedTable(self.source_key, cache_dir=self.cache_dir)
+                if table_data is None:
+                    raise FileNotFoundError("No cached catalog found in "+str(self.cache_dir)+". "
+                                            "Run once online or provide path_to_csv.")
         else:
             # In Online Mode (default), we will query the latest catalog from the Exoplanet Archive.
-            service = vo.dal.TAPService("https://exoplanetarchive.ipac.caltech.edu/TAP")
-            search_query = "SELECT pl_name,hostname,sy_snum,sy_pnum,pl_orbper,pl_orbpererr1,pl_orbpererr2,pl_bmassj, \
-                            pl_bmassjerr1,pl_bmassjerr2,pl_bmassprov,pl_orbeccen,pl_orbeccenerr1,pl_orbeccenerr2, \
-                            st_spectype,st_rad,st_raderr1,st_raderr2,st_mass,st_masserr1, \
-                            st_masserr2,st_age,st_ageerr1,st_ageerr2,pl_radj,pl_radjerr1,pl_radjerr2, \
-                            st_teff,st_tefferr1,st_tefferr2,rv_flag,tran_flag \
-                            FROM pscomppars "
-            results = service.search(search_query)
-            table_data = vo.dal.TAPResults.to_table(results)
-        # Now, try to group the table by hostname. If the CSV doesn't have that column, raise an exception and exit.
+            self.source_key = self.get_QueryKey()
+            table_data = self.query_Archive()
+        # Now, group the table by hostname. If the CSV doesn't have that column, raise an exception.
+        if "hostname" not in table_data.colnames:
+            raise ValueError("Supplied Astropy Table does not have a column labeled hostname. "
+                             "Please edit your CSV and try again.")
+        grouped_table = group_BySystem(table_data)
+        logger.info("There are %d planetary systems found in the supplied data.", len(grouped_table.groups.keys))
+        return grouped_table
+
+    #---------------------------------------------------------------------------
+
+    def get_QueryKey(self):
+        """
+        Returns the cache key of the archive query (its service & column list).
+        """
+        url = getattr(self.service, "baseurl", ARCHIVE_URL) if self.service is not None else ARCHIVE_URL
+        return cache.get_CacheKey(url, CATALOG_QUERY)
+
+    @instrument.timed("ExoplanetCatalog.query_Archive")
+    def query_Archive(self):
+        """
+        This function returns the archive's composite table, re-using the cached
+        copy while it is younger than cache_ttl. Should the archive be unreachable,
+        an expired cached copy is used instead.
+        """
+        key = self.get_QueryKey()
+        table_data = None
+        if not self.refresh:
+            table_data = cache.read_CachedTable(key, ttl=self.cache_ttl, cache_dir=self.cache_dir)
+        if table_data is not None:
+            return table_data
         try:
-            global grouped_table
-            grouped_table = table_data.group_by("hostname")
-            print("ALERT: There are", len(grouped_table.groups.keys), "planetary systems found in the supplied data.")
+            service = self.service
+            if service is None:
+                # PyVO is only needed here, so it is imported on demand.
+                import pyvo as vo
+                service = vo.dal.TAPService(ARCHIVE_URL)
+            table_data = Table(service.search(CATALOG_QUERY).to_table(), masked=True, copy=False)
         except:
-            print("ERROR: Supplied Astropy Table does not have a column labeled hostname.")
-            print("       Please edit your CSV and try again.")
+            table_data = cache.read_CachedTable(key, cache_dir=self.cache_dir)
+            if table_data is None:
+                raise
+            logger.warning("The Exoplanet Archive could not be reached, using the cached catalog instead.")
+            return table_data
+        try:
+            cache.write_CachedTable(table_data, key, self.cache_dir, query=CATALOG_QUERY)
+        except:
+            logger.warning("Could not write the catalog cache to %s", self.cache_dir)
+        return table_data
 
-        return grouped_table
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.read_CSV")
+    def read_CSV(self, path_to_csv):
+        """
+        This function reads a CSV catalog, caching the parsed table so that
+        later loads skip the parsing until the file is modified.
+        """
+        from astropy.io import ascii
+        stat = os.stat(path_to_csv)
+        key = cache.get_CacheKey(os.path.abspath(path_to_csv), stat.st_mtime_ns, stat.st_size)
+        table_data = cache.read_CachedTable(key, cache_dir=self.cache_dir)
+        if table_data is None:
+            # Archive Downloads Start with '#' Comments. Mask Every Column, as the Cache Does.
+            table_data = Table(ascii.read(path_to_csv, format='csv', comment='#'), masked=True, copy=False)
+            try:
+                cache.write_CachedTable(table_data, key, self.cache_dir, path=os.path.abspath(path_to_csv))
+            except:
+                logger.warning("Could not write the catalog cache to %s", self.cache_dir)
+        return table_data
 
     #---------------------------------------------------------------------------
 
+    @instrument.timed("ExoplanetCatalog.clean")
     def clean(self, **kwargs):
         """
         This function 'cleans' an Astropy_Catalog created via InitializeCatalog()
         by searching for and then removing any rows where there are missing values
         in any of the key columns.
+        columns_to_check: The key columns (Defaults to CLEAN_COLUMNS).
+        impute: First estimate missing planet masses & radii from the mass-radius
+                relation, keeping those planets (see impute_MassRadius).
         """
-        # These default columns that are being checked are those needed for BEM
-        # to accurately estimate the planetary mass of an object. This is key for
-        # secular integration later to take into account tidal forces.
-        default_cols = ['pl_orbper', 'pl_bmassj', 'pl_orbeccen', \
-                        'st_mass', 'st_rad', 'st_age', 'st_teff']
-        error_cols = []
-        for default_col in default_cols:
-            error_cols.extend([default_col+"err1", default_col+"err2"])
-        default_cols.extend(error_cols)
-        columns_to_check = kwargs.get("columns_to_check", default_cols)
-        # See here for why this works:
-        # https://stackoverflow.com/questions/50256012/drop-rows-with-masked-elements-in-astropy-table
-        print("Removing rows with missing values ...")
-        import operator
-        from functools import reduce
-        self.Catalog = self.Catalog[reduce(operator.and_, [~self.Catalog[col].mask for col in columns_to_check])]
-        self.Catalog = self.Catalog.group_by("hostname")
-        print("Removal complete!")
+        columns_to_check = kwargs.get("columns_to_check", CLEAN_COLUMNS)
+        if kwargs.get("impute", False):
+            logger.info("Imputing missing masses & radii ...")
+            impute_MassRadius(self.Catalog)
+            logger.info("%d masses and %d radii were imputed.", np.count_nonzero(self.Catalog['pl_bmassj_imputed']),
+                        np.count_nonzero(self.Catalog['pl_radj_imputed']))
+        logger.info("Removing rows with missing values ...")
+        self.Catalog = filter_GroupedTable(self.Catalog, get_CleanMask(self.Catalog, columns_to_check))
+        logger.info("Removal complete!")
         self.wasCleaned = True
-        print("ALERT: There are", len(self.Catalog.groups.keys), "planetary systems found in the supplied data.")
+        logger.info("There are %d planetary systems found in the supplied data.", len(self.Catalog.groups.keys))
 
     #---------------------------------------------------------------------------
 
+    def filter(self, keep):
+        """
+        Returns the catalog rows where keep is True as a hostname-grouped
+        Astropy Table, regrouped on the catalog's integer system index instead
+        of sorting the hostnames again (see filter_GroupedTable). keep may also
+        be a function taking the catalog and returning the mask. The result can
+        be passed directly to the pipeline module, or filtered further.
+        """
+        if callable(keep):
+            keep = keep(self.Catalog)
+        return filter_GroupedTable(self.Catalog, keep)
+
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.get_ParameterRanges")
     def get_ParameterRanges(self):
         if not self.wasCleaned:
             self.clean()
         from collections import defaultdict
         self.Parameter_Dict = defaultdict(lambda: defaultdict(dict))
-        for system_name, system in zip(self.Catalog.groups.keys.as_array(), self.Catalog.groups):
-            system_name = system_name[0] # Odd Formatting Due to How Group Keys Work
+        # Slices of the Shared Group Index are Views, so No Copies are Made
+        offsets = self.Catalog.groups.indices
+        for p0, p1 in zip(offsets[:-1], offsets[1:]):
+            system = self.Catalog[p0:p1]
+            system_name = system['hostname'][0]
             system_params = self.Parameter_Dict[system_name]
             for planet in system:
                 missing_value = False
@@ -121,3 +320,252 @@ class ExoplanetCatalog:
                 max_param = planet[base_param_name]+planet[base_param_name+'err1']
                 min_param = planet[base_param_name]+planet[base_param_name+'err2']
                 star_params.update({base_param_name : [min_param, max_param]})
+
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.get_ParameterTable")
+    def get_ParameterTable(self):
+        """
+        A columnar alternative to get_ParameterRanges, computed with whole-column
+        arithmetic. Returns an Astropy Table with one row per planet (in catalog
+        order) holding each parameter's value and its <param>_min & <param>_max
+        range (NaN where missing), the labels & flags, and each planet's
+        system_index. Star parameters are repeated on every planet of a system;
+        table.meta['offsets'] holds the first row of each system (plus the total),
+        so star parameters of system i are found at row meta['offsets'][i].
+        """
+        if not self.wasCleaned:
+            self.clean()
+        catalog = self.Catalog
+        offsets = np.asarray(catalog.groups.indices)
+        table = Table()
+        for name in ['hostname', 'pl_name', 'pl_bmassprov', 'tran_flag', 'rv_flag', 'st_spectype']:
+            table[name] = catalog[name]
+        table['system_index'] = amd.get_SystemIndex(offsets[:-1], len(catalog))
+        # Planets Missing Radii or Inclinations are Left as NaN, to be Estimated Later
+        for base_param_name in ['pl_orbper', 'pl_bmassj', 'pl_orbeccen', 'pl_radj', 'pl_orbincl',
+                                'st_mass', 'st_rad', 'st_age', 'st_teff']:
+            if base_param_name+'err2' not in catalog.colnames:
+                value, err1, err2 = np.full((3, len(catalog)), np.nan)
+            else:
+                value, err1, err2 = [np.ma.filled(np.ma.asarray(catalog[base_param_name+suffix], dtype=float), np.nan)
+                                     for suffix in ['', 'err1', 'err2']]
+            table[base_param_name] = value
+            table[base_param_name+'_min'] = value + err2
+            table[base_param_name+'_max'] = value + err1
+        table.meta['offsets'] = offsets
+        self.Parameter_Table = table
+        return table
+
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.get_BetaDistributions")
+    def get_BetaDistributions(self, num_draws=1000, **kwargs):
+        """
+        This function propagates the catalog's asymmetric error bars on
+        pl_orbper, pl_bmassj, pl_orbeccen and st_mass into the AMD Stability
+        Coefficient, Beta, by drawing num_draws realizations of every system.
+        Draws are evaluated in bounded blocks (see amd.sample_BatchBetaValues,
+        which also documents the accepted keyword arguments).
+        Returns an Astropy Table of the per-planet beta quantiles and P(beta<1).
+        """
+        if not self.wasCleaned:
+            self.clean()
+        quantiles = kwargs.setdefault("quantiles", (0.16, 0.5, 0.84))
+        params = self.get_ParameterTable()
+        offsets = params.meta['offsets'][:-1]
+        column = lambda name, scale=1.0: np.asarray(params[name])*scale
+        errors = lambda name, scale=1.0: (column(name+'_max', scale) - column(name, scale),
+                                          column(name+'_min', scale) - column(name, scale))
+        beta_quantiles, prob_stable = amd.sample_BatchBetaValues(
+            column('pl_orbper'), column('pl_bmassj', amd.MJUPITER_IN_MSUN),
+            column('pl_orbeccen'), column('st_mass')[offsets], offsets, num_draws=num_draws,
+            period_errs=errors('pl_orbper'), mass_errs=errors('pl_bmassj', amd.MJUPITER_IN_MSUN),
+            ecc_errs=errors('pl_orbeccen'), stellar_mass_errs=tuple(err[offsets] for err in errors('st_mass')),
+            **kwargs)
+        results = Table([params['hostname'], params['pl_name']])
+        for i, quantile in enumerate(quantiles):
+            results['beta_q{:g}'.format(100*quantile)] = beta_quantiles[:, i]
+        results['prob_stable'] = prob_stable
+        return results
+
+    #---------------------------------------------------------------------------
+
+    def get_CompactSystems(self):
+        """
+        Returns the cleaned catalog's systems as one compact.CompactSystemSet:
+        flat float64 arrays of every planet's period, mass, eccentricity, radius
+        and inclination, which hold a whole catalog in a few megabytes and can
+        be indexed for any single system without building AMUSE particles.
+        """
+        if not self.wasCleaned:
+            self.clean()
+        return compact.CompactSystemSet.from_Catalog(self.Catalog)
+
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.get_StabilityResults")
+    def get_StabilityResults(self, num_workers=None, chunk_size=250, time_systems=False):
+        """
+        This function classifies the AMD stability of every system in the catalog,
+        splitting the systems into chunks of chunk_size which are processed on a
+        pool of num_workers processes (see pipeline.run_StabilityPipeline).
+        Setting time_systems times each system separately, at some extra cost.
+        Returns an Astropy Table of every planet's beta, stability type and the
+        wall time spent on its system.
+        """
+        if not self.wasCleaned:
+            self.clean()
+        self.Stability_Results = pipeline.run_StabilityPipeline(self.Catalog, num_workers=num_workers,
+                                                                chunk_size=chunk_size, time_systems=time_systems)
+        return self.Stability_Results
+
+    #---------------------------------------------------------------------------
+
+    @instrument.timed("ExoplanetCatalog.refresh_StabilityResults")
+    def refresh_StabilityResults(self, num_workers=None, chunk_size=250, time_systems=False, **kwargs):
+        """
+        This function updates the stability results of the previous run on this
+        catalog's source (its query or CSV path), re-classifying only the systems
+        which were added or modified since. Systems are compared through a content
+        hash of each of their planets' rows, keyed by hostname & pl_name.
+        snapshot_key: The cache key the previous results are kept under.
+        The remaining arguments are as in get_StabilityResults. The hostnames of
+        the added, removed & modified systems are kept in self.Catalog_Changes.
+        Returns the results of every system, in catalog order.
+        """
+        if not self.wasCleaned:
+            self.clean()
+        snapshot_key = kwargs.get("snapshot_key", cache.get_CacheKey(self.source_key, "stability snapshot"))
+        catalog = self.Catalog
+        offsets = np.asarray(catalog.groups.indices)
+        hostnames = np.asarray(catalog['hostname'], dtype=str)
+        # The System Index Only Tracks Catalog Order, so it's Left Out of the Hashes
+        hashed_columns = sorted(name for name in catalog.colnames if name != SYSTEM_INDEX)
+        signatures = pipeline.get_SystemSignatures(pipeline.get_RowHashes(catalog, hashed_columns), offsets)
+        # Compare Against the Systems of the Previous Snapshot
+        snapshot = cache.read_CachedTable(snapshot_key, cache_dir=self.cache_dir)
+        if snapshot is None:
+            snapshot = Table(names=pipeline.RESULT_COLUMNS+['system_signature'],
+                             dtype=[str, str, float, str, float, np.uint64])
+        old_hostnames, first_rows = np.unique(np.asarray(snapshot['hostname'], dtype=str), return_index=True)
+        added, removed, modified = pipeline.diff_Systems(old_hostnames, np.asarray(snapshot['system_signature'])[first_rows],
+                                                         hostnames[offsets[:-1]], signatures)
+        self.Catalog_Changes = {'added': added, 'removed': removed, 'modified': modified}
+        logger.info("%d systems added, %d removed and %d modified.", len(added), len(removed), len(modified))
+        # Only Re-Classify the Added & Modified Systems
+        changed = np.isin(hostnames, np.concatenate([added, modified]))
+        new_results = pipeline.run_StabilityPipeline(filter_GroupedTable(catalog, changed), num_workers=num_workers,
+                                                     chunk_size=chunk_size, time_systems=time_systems)
+        results = Table([catalog['hostname'], catalog['pl_name']], names=pipeline.RESULT_COLUMNS[:2])
+        keys = pipeline.get_PlanetKeys(results['hostname'], results['pl_name'])
+        results['beta'] = np.zeros(len(results))
+        results['stability_type'] = np.zeros(len(results), dtype=amd.STABILITY_TYPES.dtype)
+        results['system_time'] = np.zeros(len(results))
+        for source, rows in [(new_results, changed), (snapshot, ~changed)]:
+            if np.any(rows):
+                source_keys = pipeline.get_PlanetKeys(source['hostname'], source['pl_name'])
+                order = np.argsort(source_keys)
+                index = order[np.searchsorted(source_keys, keys[rows], sorter=order)]
+                for name in pipeline.RESULT_COLUMNS[2:]:
+                    results[name][rows] = np.asarray(source[name])[index]
+        # Keep this Run as the Snapshot for the Next Refresh
+        results['system_signature'] = np.repeat(signatures, np.diff(offsets))
+        try:
+            cache.write_CachedTable(results, snapshot_key, self.cache_dir)
+        except:
+            logger.warning("Could not write the stability snapshot to %s", self.cache_dir)
+        results.remove_column('system_signature')
+        results.meta.update(new_results.meta)
+        results.meta['num_recomputed'] = len(added) + len(modified)
+        self.Stability_Results = results
+        return results
+
+    #---------------------------------------------------------------------------
+
+    def save_StabilityResults(self, path):
+        """
+        This function writes the latest stability results to a memory-mapped,
+        hostname-indexed store at path, which results.ResultsStore(path) opens
+        without re-running anything.
+        """
+        if not hasattr(self, "Stability_Results"):
+            self.get_StabilityResults()
+        results_store.write_ResultsStore(path, self.Stability_Results)
+
+#-------------------------------------------------------------------------------
+
+def set_CatalogDtypes(table):
+    """
+    Casts the catalog columns of a table to their types in CATALOG_DTYPES, so a
+    column read as another type (e.g. an integer column when every value in a
+    chunk is blank, or whole-numbered floats) matches the rest of the catalog.
+    Returns the table, which is modified in place.
+    """
+    from astropy.table import MaskedColumn
+    for name, dtype in CATALOG_DTYPES.items():
+        if name not in table.colnames or table[name].dtype.kind == np.dtype(dtype).kind:
+            continue
+        mask = np.ma.getmaskarray(table[name])
+        values = np.zeros(len(table), dtype=dtype)
+        values[~mask] = np.ma.getdata(table[name])[~mask].astype(dtype)
+        table[name] = MaskedColumn(values, mask=mask, unit=table[name].unit)
+    return table
+
+def iter_CSVCatalog(path_to_csv, chunk_bytes=2**26, **kwargs):
+    """
+    Streams a CSV catalog which is too large to hold in memory, reading about
+    chunk_bytes of the file at a time. Each chunk is cleaned (see get_CleanMask)
+    and yielded as a hostname-grouped Astropy Table of whole systems, so peak
+    memory scales with chunk_bytes rather than with the catalog. Column types
+    are pinned to CATALOG_DTYPES, rather than inferred anew in each chunk.
+    Rows of one system must be adjacent in the file (e.g. sorted by hostname);
+    a system split across chunk boundaries is carried over to the next chunk.
+    columns_to_check, impute: As in ExoplanetCatalog.clean.
+    max_system_rows: The most rows one system may carry over, beyond which a
+                     ValueError is raised (Defaults to 100000).
+    """
+    from astropy.io import ascii
+    from astropy.table import vstack
+    columns_to_check = kwargs.get("columns_to_check", CLEAN_COLUMNS)
+    impute = kwargs.get("impute", False)
+    max_system_rows = kwargs.get("max_system_rows", 100000)
+    chunks = ascii.read(path_to_csv, format='csv', comment='#', guess=False,
+                        fast_reader={'chunk_size': chunk_bytes, 'chunk_generator': True})
+    def get_Systems(pieces):
+        table = vstack(pieces, metadata_conflicts='silent') if len(pieces) > 1 else pieces[0]
+        if impute:
+            table = impute_MassRadius(table)
+        return group_BySystem(table[get_CleanMask(table, columns_to_check)])
+    # The Pieces of the Last System Read, Which May Continue in the Next Chunk
+    carry, carry_host, carry_rows = [], None, 0
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        chunk = set_CatalogDtypes(chunk)
+        hostnames = np.asarray(chunk['hostname'], dtype=str)
+        differs = np.flatnonzero(hostnames != hostnames[-1])
+        tail = differs[-1] + 1 if len(differs) > 0 else 0
+        if tail == 0 and hostnames[-1] == carry_host:
+            # The Whole Chunk Continues the Carried System
+            carry.append(chunk)
+            carry_rows += len(chunk)
+            if carry_rows > max_system_rows:
+                raise ValueError("System {} spans over {} rows of {}; are the rows of each system "
+                                 "adjacent?".format(carry_host, max_system_rows, path_to_csv))
+            continue
+        if tail > 0 or carry:
+            yield get_Systems(carry + [chunk[:tail]])
+        carry, carry_host, carry_rows = [chunk[tail:]], hostnames[-1], len(chunk) - tail
+    if carry:
+        yield get_Systems(carry)
+
+def iter_CSVStabilityResults(path_to_csv, num_workers=None, chunk_size=250, **kwargs):
+    """
+    Classifies the AMD stability of a CSV catalog streamed by iter_CSVCatalog
+    (which takes the keyword arguments), yielding the results chunk by chunk
+    in the order they finish. Each result's meta['first_row'] is its first
+    row among the cleaned rows of the whole catalog.
+    """
+    return pipeline.iter_StabilityResults(iter_CSVCatalog(path_to_csv, **kwargs), num_workers=num_workers,
+                                          chunk_size=chunk_size, time_systems=kwargs.get("time_systems", False))
@@ -7,34 +7,38 @@
 # Importing Necessary System Packages
 import math
 import numpy as np
-import matplotlib as plt
 import numpy.random as rp
 import random
+import warnings
 
 # Import the Amuse Base Packages
 from amuse import datamodel
+from amuse.datamodel import Particles
 from amuse.units import nbody_system
 from amuse.units import units
 from amuse.units import constants
 from amuse.datamodel import particle_attributes
-from amuse.io import *
-from amuse.lab import *
 
 # Import the Amuse Stellar Packages
 from amuse.ic.kingmodel import new_king_model
 from amuse.ic.kroupa import new_kroupa_mass_distribution
-from amuse.ext.orbital_elements import new_binary_from_orbital_elements
+from amuse.ext.orbital_elements import new_binary_from_orbital_elements, generate_binaries
 
 from numpy.random import MT19937
 from numpy.random import RandomState, SeedSequence
 
-from tycho import util
+from stableplanets import util
+from stableplanets import orbits
+from stableplanets import instrument
+
+logger = instrument.get_Logger(__name__)
 
 # ------------------------------------- #
 #           Defining Functions          #
 # ------------------------------------- #
 
 
+@instrument.timed("create.king_cluster_v2")
 def king_cluster_v2(num_stars, **kwargs):
     ''' Creates an open cluster according to the King Model & Kroupa IMF
         num_stars: The total number of stellar systems.
@@ -84,8 +88,8 @@ def king_cluster_v2(num_stars, **kwargs):
 # Assigning Type of System ('star' or 'primordial binary')
     stars_SI.type = "star"
     if do_binaries:
-        for com_index in ids_to_become_binaries:
-            stars_SI[com_index].type = "primordial binary"
+        com_indices = np.array(ids_to_become_binaries, dtype=int)
+        stars_SI[com_indices].type = "primordial binary"
 
 # Shifts Cluster's CoM to the Origin Before Scaling to Virial Equilibrium
     stars_SI.move_to_center()
@@ -105,22 +109,10 @@ def king_cluster_v2(num_stars, **kwargs):
 
 # If Requested, Split Binary Systems into Seperate Particles
     if do_binaries:
-        # Define the Binary Set
-        binaries = Particles()
-        singles_in_binaries = Particles()
-        com_to_remove = Particles()
-
-        # Create a Kepler Worker to Ensure the Binaries are Approaching
-        BinaryConverter = nbody_system.nbody_to_si(2*np.mean(stars_SI.mass),
-                                                       2*np.mean(stars_SI.radius))
-        kep = Kepler(unit_converter = BinaryConverter, redirection = 'none')
-        # Split the Binary into its Companions & Store in Seperate Sets
-        for com_index in ids_to_become_binaries:
-            stars_SI[com_index].id = com_index
-            binary_particle, singles_in_binary = binary_system_v2(stars_SI[com_index], stars_SI, kepler_worker=kep)
-            binaries.add_particle(binary_particle)
-            singles_in_binaries.add_particle(singles_in_binary)
-            com_to_remove.add_particle(stars_SI[com_index])
+        # Split every Binary into its Companions at Once
+        com_to_remove = stars_SI[com_indices]
+        com_to_remove.id = com_indices
+        binaries, singles_in_binaries = binary_systems_v2(com_to_remove, stars_SI)
 
         # If Desired, Remove the CoM and Replace it with the Single Companions.
         # Note: Default is to do this until we get multiples.py and encounters.py
@@ -134,155 +126,210 @@ def king_cluster_v2(num_stars, **kwargs):
 
 # Final Radius Setting (Ensuring that the Interaction Distance is not Small)
     min_stellar_radius = 1000 | units.AU
-    for star in stars_SI:
-        if star.radius < min_stellar_radius:
-            star.radius = min_stellar_radius
+    stars_SI[stars_SI.radius < min_stellar_radius].radius = min_stellar_radius
 
 # Return the Desired Particle Sets and Required Converter
     if do_binaries:
-        kep.stop()
         return stars_SI, converter, binaries, singles_in_binaries
     else:
         return stars_SI, converter
 
 def find_possible_binaries_v2(com_mass_array, **kwargs):
+    ''' Tests every stellar system for being a primordial binary at once, using a
+        binary fraction of fb = 0.2*log10(M/MSun) + 0.5, and adds a companion
+        mass drawn from the Kroupa IMF to the mass of each new binary.
+        com_mass_array: The masses of the stellar systems (updated in place).
+        binary_recursions: The number of times a star is tested to be a binary.
+
+        Returns the updated masses and the indices of the new binaries.
+    '''
     binary_recursions = kwargs.get("binary_recursions", 1)
     min_stellar_mass = kwargs.get("min_mass", 100 | units.MJupiter)
     max_stellar_mass = kwargs.get("max_mass", 10 | units.MSun)
 
+    is_binary = np.zeros(len(com_mass_array), dtype=bool)
     ids_to_become_binaries = []
-    recursion_counter = 0
-    while recursion_counter < binary_recursions:
-        recursion_counter += 1
-        current_com_id = 0
-        for com_mass in com_mass_array:
-            assigned_probability = rp.uniform(0, 1)
-            #print(assigned_probability)
-            if not current_com_id in ids_to_become_binaries:
-                fb = 0.2 * np.log10(com_mass.value_in(units.MSun)) + 0.5
-                if assigned_probability <= fb:
-                # If the Assigned Probability is LTE the Binary Likihood ...
-                # Add the Index to the Array for Later CoM Removal
-                    ids_to_become_binaries.append(current_com_id)
-                # Draw a Distrubution of Kroupa Masses
-                    possible_extra_mass = util.new_truncated_kroupa(100)
-                # Randomly Select one of the Above Masses
-                    selected_index = int(np.floor(100*rp.uniform(0, 1)))
-                    selected_extra_mass = possible_extra_mass[selected_index]
-                    #print(selected_extra_mass)
-                # Add the Selected Mass to the Current CoM Mass
-                    com_mass_array[current_com_id] += selected_extra_mass
-            current_com_id += 1
+    for recursion in range(binary_recursions):
+        assigned_probability = rp.uniform(0, 1, len(com_mass_array))
+        fb = 0.2 * np.log10(com_mass_array.value_in(units.MSun)) + 0.5
+    # If the Assigned Probability is LTE the Binary Likihood (and it isn't Already a Binary) ...
+        new_ids = np.flatnonzero((assigned_probability <= fb) & ~is_binary)
+        if len(new_ids) == 0:
+            continue
+    # Record the Indices for Later CoM Removal
+        is_binary[new_ids] = True
+        ids_to_become_binaries.extend(new_ids.tolist())
+    # Add a Companion Mass Drawn from the Kroupa IMF to Each New Binary's CoM Mass
+        com_mass_array[new_ids] += util.new_truncated_kroupa(len(new_ids))
     return com_mass_array, ids_to_become_binaries
 
-def binary_system_v2(star_to_become_binary, set_of_stars, **kwargs):
+def draw_BinaryParameters(com_masses, **kwargs):
+    ''' Draws the companion masses, eccentricities & periods of many binaries at
+        once, from the distributions described in binary_systems_v2.
+        com_masses: The total mass of each binary.
+        Pmax_perturber: Each binary's max period (in days) allowed by perturbers for
+                        a circular orbit, shrinking by (1+e)^-1.5 for eccentric ones.
+        random_state: The numpy RandomState drawn from (Defaults to np.random).
+
+        Returns the primary & secondary masses, eccentricities, periods & semimajor axes.
+    '''
 # Check Keyword Arguments
     doFlatEcc = kwargs.get("FlatEcc",True) # Apply Uniform Eccentricity Distribution
     doBasic = kwargs.get("Basic", False) # Apply a Basic Binary Distribution
     doFlatQ = kwargs.get("FlatQ",True) # Apply a Uniform Mass-Ratio Distribution
     doRag_P = kwargs.get("RagP",True) # Apply Raghavan et al. (2010) Period Distribution
     doSana_P = kwargs.get("SanaP", False) # Apply Sana et al. (2012) Period Distribution
-    Pcirc = kwargs.get("Pcirc", 6 | units.day ) # Circularization Period
-    Pmin = kwargs.get("Pmin", 10.**-1. | units.day ) # Min Orbital Period Allowed
-    Pmax = kwargs.get("Pmax", 10.**7. | units.day ) # Max Orbital Period Allowed
-    kepler_worker = kwargs.get("kepler_worker", None)
-
-# Define Original Star's Information
-    rCM = star_to_become_binary.position
-    vCM = star_to_become_binary.velocity
-# Define Initial Binary Particle Set
-    singles_in_binary = Particles(2)
-    star1 = singles_in_binary[0]
-    star2 = singles_in_binary[1]
-    star1.type = 'star'
-    star2.type = 'star'
-    star1.mass = 0. | units.MSun
-    star2.mass = 0. | units.MSun
+    Pcirc = kwargs.get("Pcirc", 6 | units.day ).value_in(units.day) # Circularization Period
+    Pmin = kwargs.get("Pmin", 10.**-1. | units.day ).value_in(units.day) # Min Orbital Period Allowed
+    Pmax = kwargs.get("Pmax", 10.**7. | units.day ).value_in(units.day) # Max Orbital Period Allowed
+    Pmax_perturber = kwargs.get("Pmax_perturber", None)
+    random_state = kwargs.get("random_state", np.random)
+
+    M = com_masses.value_in(units.MSun)
+    num_binaries = len(M)
+    G = constants.G.value_in(units.AU**3/(units.MSun*units.day**2))
+    m1, m2 = np.zeros(num_binaries), np.zeros(num_binaries)
+    e = np.zeros(num_binaries)
+    period, semimajor_axis = None, None
 
 # If Desired, Apply a Basic Binary Distribution
     if (doBasic):
-        semimajor_axis = 500. | units.AU
-        e = 0.
-        star1.mass = 0.5*star_to_become_binary.mass
-        star2.mass = 0.5*star_to_become_binary.mass
+        semimajor_axis = np.full(num_binaries, 500.)
+        m1, m2 = 0.5*M, 0.5*M
 
 # If Desired, Apply the Uniform Mass-Ratio Distribution (Goodwin, 2012)
     if (doFlatQ):
-        min_stellar_mass = 100. | units.MJupiter # Greater Mass Than "AB Doradus C"
-        while star2.mass <= min_stellar_mass:
-            q = np.random.random_sample()
-            star1.mass = star_to_become_binary.mass / (1. + q)
-            star2.mass =  q * star1.mass
+        min_stellar_mass = (100. | units.MJupiter).value_in(units.MSun) # Greater Mass Than "AB Doradus C"
+        redraw = m2 <= min_stellar_mass
+        while np.any(redraw):
+            q = random_state.random_sample(np.count_nonzero(redraw))
+            m1[redraw] = M[redraw] / (1. + q)
+            m2[redraw] = q * m1[redraw]
+            redraw = m2 <= min_stellar_mass
 
 # If Desired, Apply Uniform Eccentricity Distribution
     if (doFlatEcc):
-        e = rp.uniform(0.0,1.0)
+        e = random_state.uniform(0.0, 1.0, num_binaries)
 
 # Set the Maximum Period Allowed by Perturbers
-    Pmax_by_perturber = set_max_period_from_perturber(star_to_become_binary, set_of_stars, eccentricity= e)
-    if Pmax_by_perturber < Pmax:
-        Pmax = Pmax_by_perturber
+    Pmax = np.full(num_binaries, Pmax)
+    if Pmax_perturber is not None:
+        Pmax = np.minimum(Pmax, np.asarray(Pmax_perturber)/(1+e)**1.5)
 
 # If Desired, Apply Raghavan et al. (2010) Period Distribution
     if (doRag_P):
+        if np.any(Pmax < Pmin):
+            raise ValueError("Binaries with Pmax < Pmin can't be drawn from the Raghavan et al. (2010) distribution.")
         sigma = 2.28
         mu = 5.03
         period = 2.*Pmax
-        while (period > Pmax or period < Pmin):
-            #logP = sigma * np.random.randn() + mu
-            logP = np.random.normal(loc=mu, scale=sigma)
-            period = 10.**logP | units.day
-            semimajor_axis = ((period**2.)/(4.*np.pi**2.)*constants.G*(star1.mass+star2.mass))**(1./3.)
+        redraw = (period > Pmax) | (period < Pmin)
+        while np.any(redraw):
+            period[redraw] = 10.**random_state.normal(loc=mu, scale=sigma, size=np.count_nonzero(redraw))
+            redraw = (period > Pmax) | (period < Pmin)
 
 # If Desired & Applicable, Apply Sana et al. (2012) Period Distribution
-    if (doSana_P and star1.mass > 15 | units.MSun):
-        maxLogP = np.log10(Pmax.value_in(units.day))
-        minLogP = np.log10(Pmin.value_in(units.day))
-        pMod = -0.55 + 1.
-        x1 = np.random.random()
-        logP = ((maxLogP**pMod-minLogP**pMod)*x1 + minLogP**pMod)**(1./pMod)
-        period = 10.**logP | units.day
-        semimajor_axis = ((period**2.)/(4.*np.pi**2.)*constants.G*(star1.mass+star2.mass))**(1./3.)
+    if (doSana_P):
+        sana = m1 > 15
+        if period is None and np.any(sana):
+            period = np.full(num_binaries, np.nan)
+        if np.any(sana):
+            # Keep to the log10(P/day) Range Sana et al. (2012) Fit, so the
+            # Power of log10(P) Below is Always Real
+            maxLogP = np.minimum(np.log10(Pmax[sana]), 5.5)
+            minLogP = max(np.log10(Pmin), 0.15)
+            if np.any(maxLogP < minLogP):
+                raise ValueError("Binaries with Pmax < max(Pmin, 10^0.15 days) can't be drawn from the Sana et al. (2012) distribution.")
+            pMod = -0.55 + 1.
+            x1 = random_state.random_sample(np.count_nonzero(sana))
+            logP = ((maxLogP**pMod-minLogP**pMod)*x1 + minLogP**pMod)**(1./pMod)
+            period[sana] = 10.**logP
+
+# Convert Between Periods & Semimajor Axes
+    if period is None or np.any(np.isnan(period)):
+        if semimajor_axis is None:
+            raise ValueError("No period distribution applies to some of these binaries.")
+        basic_period = np.sqrt(4.*np.pi**2.*semimajor_axis**3./(G*(m1+m2)))
+        period = basic_period if period is None else np.where(np.isnan(period), basic_period, period)
+    semimajor_axis = ((period**2.)/(4.*np.pi**2.)*G*(m1+m2))**(1./3.)
 
 # Always circularize low period Binaries
-    if (period < Pcirc):
-        e = 0.0
-
-# Get the Companion's Positions from Kepler Relative to the Origin
-    newBinary = new_binary_from_orbital_elements(star1.mass, star2.mass, semimajor_axis,
-                                                 eccentricity = e, G = constants.G)
-
-# Rotate the Binary System & Move to the CoM's Position
-    util.preform_EulerRotation(newBinary)
-    star1.position = rCM + newBinary[0].position
-    star1.velocity = vCM + newBinary[0].velocity
-    star2.position = rCM + newBinary[1].position
-    star2.velocity = vCM + newBinary[1].velocity
+    e = np.where(period < Pcirc, 0.0, e)
+    return m1 | units.MSun, m2 | units.MSun, e, period | units.day, semimajor_axis | units.AU
+
+@instrument.timed("create.binary_systems_v2")
+def binary_systems_v2(stars_to_become_binaries, set_of_stars, **kwargs):
+    ''' Turns many stars into binaries at once, replacing each star by two
+        companions orbiting the star's position & velocity.
+        stars_to_become_binaries: The AMUSE particle (sub)set of stars to convert.
+        set_of_stars: The AMUSE particle set of all stars (for finding perturbers).
+        FlatEcc: Apply a uniform eccentricity distribution.
+        Basic: Apply a basic binary distribution (equal masses at 500 AU).
+        FlatQ: Apply a uniform mass-ratio distribution (Goodwin, 2012).
+        RagP: Apply the Raghavan et al. (2010) period distribution.
+        SanaP: Apply the Sana et al. (2012) period distribution (primaries over 15 MSun).
+        Pcirc: Binaries with shorter periods are circularized.
+        Pmin, Pmax: The range of orbital periods allowed.
+
+        Returns the binary system particles & the particle set of their companions
+        (ordered primary, secondary for each binary in turn).
+    '''
+    coms = stars_to_become_binaries
+    num_binaries = len(coms)
+    binary_index = np.repeat(np.arange(num_binaries), 2)
+
+# Set the Maximum Period Allowed by Perturbers, for Circular Orbits
+    Pmax_perturber = get_MaxPeriodsFromPerturbers(coms, set_of_stars)[0].value_in(units.day)
+
+# Draw Every Binary's Masses & Orbit
+    m1, m2, e, period, semimajor_axis = draw_BinaryParameters(coms.mass, Pmax_perturber=Pmax_perturber, **kwargs)
+
+# Get the Companions' Positions Relative to their CoM (at Pericenter)
+    primaries, secondaries = generate_binaries(m1, m2, semimajor_axis, eccentricity=e, G=constants.G)
+    singles_in_binaries = Particles(2*num_binaries)
+    singles_in_binaries.type = 'star'
+    star1, star2 = singles_in_binaries[0::2], singles_in_binaries[1::2]
+    for star, companion in [(star1, primaries), (star2, secondaries)]:
+        star.mass = companion.mass
+        star.position = companion.position
+        star.velocity = companion.velocity
+
+# Rotate every Binary System Independently & Move to its CoM's Position
+    util.preform_BatchEulerRotation(singles_in_binaries, binary_index, num_binaries)
+    singles_in_binaries.position += coms.position[binary_index]
+    singles_in_binaries.velocity += coms.velocity[binary_index]
 
 # Apply a Fitting Dynamical Radius
-    singles_in_binary.radius = semimajor_axis*(1+e)
+    singles_in_binaries.radius = (semimajor_axis*(1+e))[binary_index]
 
-# Ensure Binary Components are Approaching Each Other
+# Ensure Binary Components are Approaching Each Other, All at Once
+    util.ensure_approaching_binary(star1, star2)
 
-    if kepler_worker == None:
-        BinaryConverter = nbody_system.nbody_to_si(2*np.mean(singles_in_binary.mass),
-                                                       2*np.mean(singles_in_binary.radius))
-        kep = Kepler(unit_converter = BinaryConverter, redirection = 'none')
-    else:
-        kep = kepler_worker
-    star1, star2 = util.ensure_approaching_binary(star1, star2, kepler_worker=kep)
+# Create the Binary System Particles (For Stellar Evolution Code)
+    coms.radius = 5*semimajor_axis
+    binaries = coms.copy()
+    binaries.child1 = list(star1)
+    binaries.child2 = list(star2)
+    binaries.semimajor_axis = semimajor_axis
+    binaries.eccentricity = e
+
+# Return the Binary System Particles & the Particle Set of Individual Companions
+    return binaries, singles_in_binaries
 
-# Create the Binary System Particle (For Stellar Evolution Code)
-    star_to_become_binary.radius = 5*semimajor_axis
-    binary_particle = star_to_become_binary.copy()
-    binary_particle.child1 = star1
-    binary_particle.child2 = star2
-    binary_particle.semimajor_axis = semimajor_axis
-    binary_particle.eccentricity = e
-    binary_particle.id = star_to_become_binary.id
+def binary_system_v2(star_to_become_binary, set_of_stars, **kwargs):
+    ''' Turns a single star into a binary (see binary_systems_v2, which describes
+        the keyword arguments).
+        Returns the binary system particle & the particle set of its companions.
+    '''
+    binaries, singles_in_binary = binary_systems_v2(star_to_become_binary.as_set(), set_of_stars, **kwargs)
+    return binaries[0], singles_in_binary
 
-# Return the Binary System Particle & the Particle Set of Individual Companions
-    return binary_particle, singles_in_binary
+# The Template Planets: (ID Offset, Mass, Eccentricity, Period Ratio to the System's
+# Jovian, or None for Planets Placed at the Jovian's Location Itself)
+PLANET_TEMPLATES = {"Earth": (30000, 0.003 | units.MJupiter, 0.016, np.sqrt(1.000**3/5.454**3)),
+                    "Jupiter": (50000, 1 | units.MJupiter, 0.048, None),
+                    "TestP": (50000, 20 | units.MJupiter, 0.3, None),
+                    "Neptune": (80000, 0.054 | units.MJupiter, 0.009, np.sqrt(30.110**3/5.454**3))}
 
 def planetary_systems_v2(stars, num_systems, **kwargs):
     ''' Creates several mock planetary systems around random stars in the provided set.
@@ -290,83 +337,141 @@ def planetary_systems_v2(stars, num_systems, **kwargs):
         num_systems: The number of planetary systems requested.
         filename_planets: Filename for the Initial Planetary System HDF5 Archive.
         Earth, Jupiter, Neptune: Booleans asking if they should be included.
+        kepler_worker: Deprecated & ignored, as the planets are placed in closed form.
+
+        Planets start on the approaching half of their orbits by mirroring their
+        random true anomaly f to -|f|, which keeps each planet's separation, a & e.
+        (Previously ensure_approaching_binary moved receding planets to r = a instead.)
     '''
     makeEarth = kwargs.get("Earth", False)
     makeJupiter = kwargs.get("Jupiter", True)
     makeNeptune = kwargs.get("Neptune", False)
     makeTestPlanet = kwargs.get("TestP", False)
-    kepler_worker = kwargs.get("kepler_worker", None)
-
-    if kepler_worker == None:
-        SmallScaleConverter = nbody_system.nbody_to_si(2*np.mean(stars.mass),
-                                                       2*np.mean(stars.radius))
-        kep = Kepler(unit_converter = SmallScaleConverter, redirection = 'none')
-    else:
-        kep = kepler_worker
+    warn_KeplerWorker("planetary_systems_v2", kwargs.get("kepler_worker", None))
 
 # Selects the Stars to Become Planetary Systems
     num_stars = len(stars)
     if num_systems > num_stars:
         num_systems = num_stars
     select_stars_indices = random.sample(range(0, num_stars), num_systems)
-
-# Sets Important Parameters
-    ID_Earth = 30000
-    ID_Jupiter = 50000
-    ID_Neptune = 80000
-    systems = datamodel.Particles()
-# Begins to Build Planetary Systems According to Provided Information
-    for system in range(num_systems):
-        planets = datamodel.Particles()
-        j = select_stars_indices[system]
-        host_star = stars[j]
-        mu = constants.G*host_star.mass
-        if makeEarth:
-            period_ratio = np.sqrt((1.000 | units.AU)**3/(5.454 | units.AU)**3)
-            mass_E = 0.003 | units.MJupiter
-            init_a = util.calc_RelativePlanetPlacement(host_star, mass_E, period_ratio)
-            init_e = 0.016
-            Earth = planet_v2(ID_Earth+host_star.id, host_star, mass_E, init_a, init_e)
-            Earth.stellar_type = 1
-            planets.add_particle(Earth)
-        if makeJupiter:
-            init_a = util.calc_JovianPlacement(host_star)
-            init_e = 0.048
-            mass_J = 1 | units.MJupiter
-            Jupiter = planet_v2(ID_Jupiter+host_star.id, host_star, mass_J, init_a, init_e)
-            Jupiter.stellar_type = 1
-            planets.add_particle(Jupiter)
-        if makeTestPlanet:
-            init_a = util.calc_JovianPlacement(host_star)
-            init_e = 0.3
-            mass_J = 20 | units.MJupiter
-            TestP = planet_v2(ID_Jupiter+host_star.id, host_star, mass_J, init_a, init_e)
-            TestP.stellar_type = 1
-            planets.add_particle(TestP)
-        if makeNeptune:
-            period_ratio = np.sqrt((30.110 | units.AU)**3/(5.454 | units.AU)**3)
-            mass_N = 0.054 | units.MJupiter
-            init_a = util.calc_RelativePlanetPlacement(host_star, mass_N, period_ratio)
-            init_e = 0.009
-            Neptune = planet_v2(ID_Neptune+host_star.id, host_star, mass_N, init_a, init_e)
-            Neptune.stellar_type = 1
-            planets.add_particle(Neptune)
-    # Moves Planetary System to the Origin and Applies a Random Euler Rotation
-        for p in planets:
-            p.position = p.position - host_star.position
-            p.velocity = p.velocity - host_star.velocity
-        util.preform_EulerRotation(planets)
-        for p in planets:
-            p.position = p.position + host_star.position
-            p.velocity = p.velocity + host_star.velocity
-    # Ensures The Planets are Approaching
-        for p in planets:
-            host_star, p = util.ensure_approaching_binary(host_star, p, kepler_worker=kep)
-        if kepler_worker == None:
-            kep.stop()
-    # Adds the System to the Provided AMUSE Particle Set
-        systems.add_particles(planets)
-    return systems
+    hosts = stars[np.array(select_stars_indices, dtype=int)]
+
+# Builds Every Planetary System in One Batched Pass
+    templates = [name for name, wanted in [("Earth", makeEarth), ("Jupiter", makeJupiter),
+                                           ("TestP", makeTestPlanet), ("Neptune", makeNeptune)] if wanted]
+    return new_planetary_systems(hosts, templates)
+
+def warn_KeplerWorker(caller, kepler_worker, stacklevel=3):
+    ''' Warns that a provided kepler_worker is no longer used by caller.'''
+    if kepler_worker is not None:
+        warnings.warn("%s no longer uses a Kepler worker; the kepler_worker argument "
+                      "is ignored." % caller, DeprecationWarning, stacklevel=stacklevel)
+
+@instrument.timed("create.new_planetary_systems")
+def new_planetary_systems(hosts, templates, **kwargs):
+    ''' Places the same template planets around every one of the provided hosts.
+        hosts: The AMUSE Particle Set of host stars (which are moved & kicked
+               so that each system's CoM keeps its host's original phase-space position).
+        templates: Names of the PLANET_TEMPLATES to include, in each system's order.
+        kepler_worker: Deprecated & ignored, as the planets are placed in closed form.
+        Any other keyword arguments are passed on to new_planets_from_elements.
+    '''
+    # Skips the instrument.timed Wrapper when Pointing at the Caller
+    warn_KeplerWorker("new_planetary_systems", kwargs.pop("kepler_worker", None), stacklevel=4)
+    num_hosts, num_templates = len(hosts), len(templates)
+    host_index = np.repeat(np.arange(num_hosts), num_templates)
+    template_index = np.tile(np.arange(num_templates), num_hosts)
+# Places each Template Relative to its System's Jovian, Scaled by the Host's Mass
+    a_jovian = util.calc_JovianPlacement(hosts).value_in(units.AU)
+    id_offsets = np.zeros(num_templates, dtype=int)
+    masses = np.zeros(num_templates)
+    eccentricities = np.zeros(num_templates)
+    a_scales = np.ones(num_templates)
+    for i, name in enumerate(templates):
+        id_offset, mass, ecc, period_ratio = PLANET_TEMPLATES[name]
+        id_offsets[i] = id_offset
+        masses[i] = mass.value_in(units.MJupiter)
+        eccentricities[i] = ecc
+        if period_ratio is not None:
+            a_scales[i] = period_ratio**(2./3.)
+    ids = id_offsets[template_index] + np.asarray(hosts.id, dtype=int)[host_index]
+    planets = new_planets_from_elements(hosts, host_index, masses[template_index] | units.MJupiter,
+                                        a_jovian[host_index]*a_scales[template_index] | units.AU,
+                                        eccentricities[template_index], ids=ids, **kwargs)
+    planets.stellar_type = 1
+    return planets
+
+def new_planets_from_elements(hosts, host_index, masses, semimajor_axes, eccentricities, **kwargs):
+    ''' Creates many planets around many hosts in a single orbital-elements to
+        Cartesian pass, with no calls to a Kepler worker.
+        hosts: The AMUSE Particle Set of host stars.
+        host_index: The index in hosts of each planet's host.
+        masses, semimajor_axes, eccentricities: The orbit of each planet (quantities
+                                                & arrays of matching length).
+        true_anomalies: The true anomaly of each planet in radians (Defaults to random).
+        random_orientation: Boolean to rotate each system in a random fashion (Defaults to True).
+        approaching: Boolean to start each planet on the approaching half of its
+                     orbit by mirroring its true anomaly f to -|f|, which keeps its
+                     separation rather than moving it to r = a (Defaults to True).
+        move_hosts: Boolean to move & kick each host so its system's CoM keeps the
+                    host's original phase-space position (Defaults to True).
+        ids: The id of each planet (Defaults to 0, 1, 2, ...).
+        random_state: The numpy RandomState drawn from (Defaults to np.random).
+    '''
+    true_anomalies = kwargs.get("true_anomalies", None)
+    random_orientation = kwargs.get("random_orientation", True)
+    approaching = kwargs.get("approaching", True)
+    move_hosts = kwargs.get("move_hosts", True)
+    ids = kwargs.get("ids", None)
+    random_state = kwargs.get("random_state", None)
+    if random_state is None:
+        random_state = np.random
+
+    host_index = np.asarray(host_index, dtype=int)
+    num_planets, num_hosts = len(host_index), len(hosts)
+    eccentricities = np.broadcast_to(np.asarray(eccentricities, dtype=float), (num_planets,))
+    host_masses = hosts.mass[host_index]
+# Generate a Random Position on the Orbit (True Anomaly)
+# This ensures that all the planets don't start out along the same joining line.
+    if true_anomalies is None:
+        true_anomalies = random_state.uniform(0.0, 2*np.pi, num_planets)
+    true_anomalies = np.broadcast_to(np.asarray(true_anomalies, dtype=float), (num_planets,))
+# Mirror Receding Planets onto the Approaching Half of their Orbits (Same Separation)
+    if approaching:
+        true_anomalies = -np.abs(np.arctan2(np.sin(true_anomalies), np.cos(true_anomalies)))
+    rel_pos, rel_vel = orbits.get_CartesianFromElements(host_masses + masses, semimajor_axes,
+                                                        eccentricities, true_anomalies)
+# Rotate each System as a Whole, so its Planets Stay Coplanar
+    if random_orientation and num_planets > 0:
+        rotations = util.get_ArvoRotationMatrices(num_hosts, random_state)[host_index]
+        rel_pos = np.matmul(rotations, rel_pos.value_in(units.m)[..., None])[..., 0] | units.m
+        rel_vel = np.matmul(rotations, rel_vel.value_in(units.m/units.s)[..., None])[..., 0] | units.m/units.s
+# Shift the Hosts so each System's CoM Stays Where its Host Was
+    host_position = hosts.position
+    host_velocity = hosts.velocity
+    if move_hosts and num_planets > 0:
+        system_mass = hosts.mass.value_in(units.MSun) + np.bincount(host_index, masses.value_in(units.MSun),
+                                                                     minlength=num_hosts)
+        weights = (masses.value_in(units.MSun)/system_mass[host_index])[:, None]
+        shift_pos = np.zeros((num_hosts, 3))
+        shift_vel = np.zeros((num_hosts, 3))
+        np.add.at(shift_pos, host_index, weights*rel_pos.value_in(units.m))
+        np.add.at(shift_vel, host_index, weights*rel_vel.value_in(units.m/units.s))
+        host_position = host_position - (shift_pos | units.m)
+        host_velocity = host_velocity - (shift_vel | units.m/units.s)
+        hosts.position = host_position
+        hosts.velocity = host_velocity
+# Sets Planet Values to Provided Conditions
+    planets = Particles(num_planets)
+    planets.id = np.arange(num_planets) if ids is None else ids
+    planets.type = "planet"
+    planets.host_star = hosts.id[host_index]
+    planets.mass = masses
+# Sets the Dynamical Radius to the Hill Sphere Approx.
+    planets.radius = util.calc_HillRadius(semimajor_axes, eccentricities, masses, host_masses)
+    planets.position = host_position[host_index] + rel_pos
+    planets.velocity = host_velocity[host_index] + rel_vel
+    return planets
 
 def planet_v2(ID, host_star, planet_mass, init_a, init_e, random_orientation=False):
     ''' Creates a planet as an AMUSE Particle with provided characteristics.
@@ -406,28 +511,92 @@ def planet_v2(ID, host_star, planet_mass, init_a, init_e, random_orientation=Fal
 # Returns the Created AMUSE Particle
     return p
 
-def set_max_period_from_perturber(center_of_mass, particle_set, **kwargs):
+@instrument.timed("create.get_MaxPeriodsFromPerturbers")
+def get_MaxPeriodsFromPerturbers(centers_of_mass, particle_set, **kwargs):
+    ''' Finds the dominant tidal perturber (max m/d^3) of many centers of mass at
+        once with a KD-tree of particle_set, returning each one's maximum period.
+        centers_of_mass: AMUSE particle (sub)set of the systems (e.g. binaries).
+        particle_set: AMUSE particle set of the possible perturbers. Centers found
+                      in it (by key) are not counted as their own perturber.
+        perturbation_limit: The allowed tidal perturbation (Defaults to 0.02).
+        eccentricity: The eccentricity of each system's orbit (scalar or array).
+        num_neighbours: The number of nearest stars first searched per center.
+        num_heavy: The number of heaviest stars checked against every center.
+
+        Returns the maximum periods and the indices in particle_set of the perturbers.
+    '''
+    from scipy.spatial import cKDTree
     perturb_limit = kwargs.get("perturbation_limit", 0.02)
-    e = kwargs.get("eccentricity", 0.0)
-    verbose = kwargs.get("verbose", False)
-
-    # Calculate Nearest Neighbors
-    other_stars = particle_set - center_of_mass
-    dist_vect = other_stars.position - center_of_mass.position
-    distances = dist_vect.lengths()
+    e = np.asarray(kwargs.get("eccentricity", 0.0), dtype=float)
+    num_neighbours = kwargs.get("num_neighbours", 16)
+    num_heavy = kwargs.get("num_heavy", 32)
+
+    positions = particle_set.position.value_in(units.AU)
+    masses = particle_set.mass.value_in(units.MSun)
+    centers = centers_of_mass.position.value_in(units.AU)
+    num_stars, num_centers = len(positions), len(centers)
+    # Each Center's Own Index in particle_set (-1 if it isn't a Member)
+    keys, center_keys = particle_set.key, centers_of_mass.key
+    order = np.argsort(keys)
+    found = np.clip(np.searchsorted(keys, center_keys, sorter=order), 0, max(num_stars-1, 0))
+    self_index = np.where(keys[order[found]] == center_keys, order[found], -1) if num_stars else np.full(num_centers, -1)
+
+    best_pert = np.zeros(num_centers)
+    perturber = np.full(num_centers, -1)
+    # The Few Heaviest Stars are Checked Against Every Center Directly, so they
+    # Don't Loosen the Bound Used to Prune the Tree Search of the Rest
+    heavy = np.argsort(masses)[::-1][:num_heavy]
+    for j in heavy:
+        with np.errstate(divide='ignore'):
+            pert = masses[j]/np.sum((centers - positions[j])**2, axis=1)**1.5
+        pert[self_index == j] = 0.0
+        better = pert > best_pert
+        best_pert[better], perturber[better] = pert[better], j
+    light = np.setdiff1d(np.arange(num_stars), heavy)
+    # Search the k Nearest Light Stars of Every Unresolved Center, Doubling k Each
+    # Pass. Stars Beyond the k-th Neighbour Exert at Most max(m)/d_k^3, so a Center
+    # is Resolved Once its Best Perturbation Reaches that Bound (or k Covers All).
+    unresolved = np.arange(num_centers)
+    k = num_neighbours + 1
+    if len(light) > 0:
+        tree = cKDTree(positions[light])
+        max_mass = masses[light].max()
+    while len(unresolved) > 0 and len(light) > 0:
+        k = min(k, len(light))
+        distances, neighbours = tree.query(centers[unresolved], k=np.arange(1, k+1))
+        neighbours = light[neighbours]
+        with np.errstate(divide='ignore'):
+            pert = masses[neighbours]/distances**3
+        pert[neighbours == self_index[unresolved, None]] = 0.0
+        rows = np.arange(len(unresolved))
+        best = np.argmax(pert, axis=1)
+        better = pert[rows, best] > best_pert[unresolved]
+        best_pert[unresolved[better]] = pert[rows, best][better]
+        perturber[unresolved[better]] = neighbours[rows, best][better]
+        if k == len(light):
+            break
+        with np.errstate(divide='ignore'):
+            unresolved = unresolved[max_mass/distances[:, -1]**3 > best_pert[unresolved]]
+        k *= 2
+
+    # Calculate Maximum Periods, P_max^2 = 4 pi^2 d^3 limit / (G (1+e)^3 m)
+    G = constants.G.value_in(units.AU**3/(units.MSun*units.day**2))
+    with np.errstate(divide='ignore'):
+        P_max = 2*np.pi*np.sqrt(perturb_limit/(G*(1+e)**3*best_pert))
+    return P_max | units.day, perturber
 
-    # Calculate Perterbation of Nearest Neighbors on System
-    pert = other_stars.mass / distances**3
-    primary_pert_index = np.where(pert == max(pert))[0]
-    primary_perturber = other_stars[primary_pert_index][0]
-    perturb_distance = distances[primary_pert_index][0]
-    perturb_mass = primary_perturber.mass
-
-    # Calculate Maximum Period
-    P_max_Squared = (4*np.power(np.pi, 2)*(perturb_distance**3)*perturb_limit)/(units.constants.G*((1+e)**3)*perturb_mass)
-    P_max = np.sqrt(P_max_Squared)[0]
+def set_max_period_from_perturber(center_of_mass, particle_set, **kwargs):
+    ''' Returns the maximum period of a system set by its dominant tidal perturber
+        (see get_MaxPeriodsFromPerturbers, which handles many systems at once).
+    '''
+    verbose = kwargs.get("verbose", False)
+    P_max, perturber = get_MaxPeriodsFromPerturbers(center_of_mass.as_set(), particle_set, **kwargs)
+    P_max, primary_pert_index = P_max[0], perturber[0]
 
     if verbose:
-        print("Limiting Maximum Period to", P_max, "in accordance to the largest perturber at index", primary_pert_index)
-        print("Distance to Perturber:", perturb_distance, "  |  Mass of Perturber:", perturb_mass)
+        primary_perturber = particle_set[primary_pert_index]
+        perturb_distance = (primary_perturber.position - center_of_mass.position).length()
+        logger.info("Limiting Maximum Period to %s in accordance to the largest perturber at index %s",
+                    P_max, primary_pert_index)
+        logger.info("Distance to Perturber: %s  |  Mass of Perturber: %s", perturb_distance, primary_perturber.mass)
     return P_max
@@ -0,0 +1,109 @@
+# Python Functions containing the Vectorized Mass-Radius Relation for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+
+# ------------------------------------- #
+#           Defining Constants          #
+# ------------------------------------- #
+
+# Earth Masses & Radii per Jupiter Mass, Jupiter Radius & Solar Mass
+MJUPITER_IN_MEARTH = 317.828
+RJUPITER_IN_REARTH = 11.209
+MSUN_IN_MEARTH = 332946.0
+
+# Chen & Kipping (2017) Broken Power Law: The Terran, Neptunian, Jovian & Stellar
+# Regimes, as (Upper Mass Bound in MEarth, Power-Law Index, Intrinsic Scatter in dex).
+# Only the First Segment's Normalization (in REarth) is Fitted; the Rest Follow by Continuity.
+CHEN_KIPPING = {'constant': 1.008,
+                'segments': ((2.04, 0.2790, 0.0403),
+                             (0.414*MJUPITER_IN_MEARTH, 0.589, 0.146),
+                             (0.0800*MSUN_IN_MEARTH, -0.044, 0.0737),
+                             (np.inf, 0.881, 0.0352))}
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# Each Process Derives a Model's Segment Constants Once
+MODELS = {}
+
+def get_MassRadiusModel(params=CHEN_KIPPING):
+    ''' Returns the derived arrays of a broken power-law mass-radius relation.
+        params: The fitted parameters (Defaults to CHEN_KIPPING).
+
+        Returns a dictionary of each segment's upper mass bound, index, scatter,
+        normalization (log10 REarth) and the radius (log10 REarth) at its bounds.
+    '''
+    key = (params['constant'], params['segments'])
+    if key not in MODELS:
+        mass_bounds, indices, scatter = [np.array(column, dtype=float) for column in zip(*params['segments'])]
+        log_bounds = np.log10(mass_bounds)
+        # Continuity at each Transition Sets the Next Segment's Normalization
+        log_constants = np.empty(len(indices))
+        log_constants[0] = np.log10(params['constant'])
+        for k in range(1, len(indices)):
+            log_constants[k] = log_constants[k-1] + (indices[k-1] - indices[k])*log_bounds[k-1]
+        MODELS[key] = {'log_mass_bounds': log_bounds, 'indices': indices, 'scatter': scatter,
+                       'log_constants': log_constants,
+                       'log_radius_bounds': log_constants + indices*log_bounds}
+    return MODELS[key]
+
+def calc_RadiusFromMass(masses, mass_errs=None, params=CHEN_KIPPING):
+    ''' Predicts planetary radii from masses for whole arrays at once.
+        masses: Array of masses (in MEarth).
+        mass_errs: Optional array of symmetric mass errors (in MEarth).
+        params: The fitted parameters (Defaults to CHEN_KIPPING).
+
+        Returns the radii (in REarth) and their errors (in dex), the latter combining
+        the propagated mass error & the relation's intrinsic scatter in quadrature.
+    '''
+    model = get_MassRadiusModel(params)
+    log_mass = np.log10(np.asarray(masses, dtype=float))
+    k = np.minimum(np.searchsorted(model['log_mass_bounds'], log_mass), len(model['indices'])-1)
+    log_radius = model['log_constants'][k] + model['indices'][k]*log_mass
+    log_err = model['scatter'][k]
+    if mass_errs is not None:
+        log_mass_err = np.asarray(mass_errs, dtype=float)/np.asarray(masses, dtype=float)/np.log(10)
+        log_err = np.sqrt((model['indices'][k]*log_mass_err)**2 + log_err**2)
+    return 10**log_radius, log_err
+
+def calc_MassFromRadius(radii, radius_errs=None, params=CHEN_KIPPING):
+    ''' Predicts planetary masses from radii for whole arrays at once.
+        radii: Array of radii (in REarth).
+        radius_errs: Optional array of symmetric radius errors (in REarth).
+        params: The fitted parameters (Defaults to CHEN_KIPPING).
+
+        The relation is only inverted over the Terran & Neptunian segments. The
+        Jovian segment is nearly flat, so radii it reaches (about 11.3 REarth and
+        up) fit anything from a Neptune to a brown dwarf, and are given NaN
+        masses & bounds. Any other mass range whose radii reach the Jovian
+        segment is extended up to the stellar boundary.
+
+        Returns the masses and their lower & upper bounds (in MEarth).
+    '''
+    model = get_MassRadiusModel(params)
+    log_radius_bounds = model['log_radius_bounds']
+    def invert(log_radius):
+        k = np.minimum(np.searchsorted(log_radius_bounds[:2], log_radius), 1)
+        log_mass = (log_radius - model['log_constants'][k])/model['indices'][k]
+        return np.minimum(log_mass, model['log_mass_bounds'][1]), k
+    log_radius = np.log10(np.asarray(radii, dtype=float))
+    log_mass, k = invert(log_radius)
+    log_err = model['scatter'][k]
+    if radius_errs is not None:
+        log_radius_err = np.asarray(radius_errs, dtype=float)/np.asarray(radii, dtype=float)/np.log(10)
+        log_err = np.sqrt(log_radius_err**2 + log_err**2)
+    log_lower = invert(log_radius - log_err)[0]
+    log_upper = invert(log_radius + log_err)[0]
+    # Radii Shared with the Flat Jovian Segment Allow Any Mass up to the Stellar Boundary
+    log_upper = np.where(log_radius + log_err >= log_radius_bounds[2], model['log_mass_bounds'][2], log_upper)
+    # No Single Mass Fits the Radii of the Jovian Segment
+    jovian = log_radius >= log_radius_bounds[2]
+    log_mass, log_lower, log_upper = [np.where(jovian, np.nan, value) for value in (log_mass, log_lower, log_upper)]
+    return 10**log_mass, 10**log_lower, 10**log_upper
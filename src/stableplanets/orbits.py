@@ -0,0 +1,216 @@
+# Python Functions containing In-Process Two-Body Orbit Calculations for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+from stableplanets import instrument
+
+# Import the Amuse Base Packages
+from amuse.units import units
+from amuse.units import constants
+from amuse.units import quantities
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+def calc_OrbitalElements(mu, rel_pos, rel_vel):
+    ''' Converts relative state vectors into orbital elements for many pairs at once.
+        mu: Array of gravitational parameters, G*(m1+m2).
+        rel_pos: Array of relative positions, shaped (N, 3).
+        rel_vel: Array of relative velocities, shaped (N, 3).
+        All inputs must share one consistent (unitless) system of units.
+
+        Returns the semimajor axis, eccentricity, period, true anomaly and mean
+        anomaly (in radians) of every pair. As in the Kepler worker, the semimajor
+        axis of an unbound orbit is positive and its period is infinite.
+    '''
+    mu = np.asarray(mu, dtype=float)
+    rel_pos = np.atleast_2d(np.asarray(rel_pos, dtype=float))
+    rel_vel = np.atleast_2d(np.asarray(rel_vel, dtype=float))
+    r = np.sqrt(np.sum(rel_pos**2, axis=-1))
+    v2 = np.sum(rel_vel**2, axis=-1)
+    rv = np.sum(rel_pos*rel_vel, axis=-1)
+    # Orbital Energy & Eccentricity Vector
+    energy = 0.5*v2 - mu/r
+    ecc_vec = ((v2 - mu/r)[:, None]*rel_pos - rv[:, None]*rel_vel)/mu[..., None]
+    e = np.sqrt(np.sum(ecc_vec**2, axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = 0.5*mu/np.abs(energy)
+        period = np.where(energy < 0, 2.0*np.pi*np.sqrt(a**3/mu), np.inf)
+    # True Anomaly, Signed by Whether the Pair is Receding or Approaching
+    h = np.cross(rel_pos, rel_vel)
+    h_norm = np.sqrt(np.sum(h**2, axis=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sin_f = np.sum(h*np.cross(ecc_vec, rel_pos), axis=-1)/h_norm
+    sin_f = np.where(h_norm > 0, sin_f, 0.0)
+    true_anomaly = np.arctan2(sin_f, np.sum(ecc_vec*rel_pos, axis=-1))
+    # Mean Anomaly from the Eccentric (or Hyperbolic) Anomaly
+    cos_f, sin_f = np.cos(true_anomaly), np.sin(true_anomaly)
+    with np.errstate(invalid='ignore'):
+        E = np.arctan2(np.sqrt(np.clip(1 - e**2, 0, None))*sin_f, e + cos_f)
+        F = np.arcsinh(np.sqrt(np.clip(e**2 - 1, 0, None))*sin_f/(1 + e*cos_f))
+    mean_anomaly = np.where(e < 1.0, E - e*np.sin(E), e*np.sinh(F) - F)
+    return a, e, period, true_anomaly, mean_anomaly
+
+def calc_CartesianFromElements(mu, a, e, true_anomaly):
+    ''' Converts orbital elements into relative state vectors for many pairs at once.
+        mu: Array of gravitational parameters, G*(m1+m2).
+        a: Array of semimajor axes (bound orbits only).
+        e: Array of eccentricities.
+        true_anomaly: Array of true anomalies (in radians).
+        All inputs must share one consistent (unitless) system of units.
+
+        Returns the relative positions & velocities, shaped (N, 3), in each
+        orbit's perifocal frame (x towards pericenter, z along the angular momentum).
+    '''
+    mu, a, e, f = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (mu, a, e, true_anomaly)])
+    p = a*(1 - e**2)
+    r = p/(1 + e*np.cos(f))
+    v = np.sqrt(mu/p)
+    rel_pos = np.stack([r*np.cos(f), r*np.sin(f), np.zeros_like(r)], axis=-1)
+    rel_vel = np.stack([-v*np.sin(f), v*(e + np.cos(f)), np.zeros_like(v)], axis=-1)
+    return rel_pos, rel_vel
+
+def calc_ApproachingState(mu, rel_pos, rel_vel):
+    ''' Moves many bound pairs along their orbits to where they are approaching
+        each other at a separation of one semimajor axis (eccentric anomaly -pi/2,
+        so cos(f) = -e and sin(f) = -sqrt(1-e^2)), without any propagation.
+        mu: Array of gravitational parameters, G*(m1+m2).
+        rel_pos: Array of relative positions, shaped (N, 3).
+        rel_vel: Array of relative velocities, shaped (N, 3).
+        All inputs must share one consistent (unitless) system of units.
+
+        Returns the new relative positions & velocities. Unbound pairs, which
+        never return to that separation, are returned unchanged.
+    '''
+    mu = np.atleast_1d(np.asarray(mu, dtype=float))
+    rel_pos = np.atleast_2d(np.asarray(rel_pos, dtype=float))
+    rel_vel = np.atleast_2d(np.asarray(rel_vel, dtype=float))
+    r = np.sqrt(np.sum(rel_pos**2, axis=-1))
+    v2 = np.sum(rel_vel**2, axis=-1)
+    rv = np.sum(rel_pos*rel_vel, axis=-1)
+    energy = 0.5*v2 - mu/r
+    bound = energy < 0
+    # Perifocal Frame: P Towards Pericenter (Along the Separation if Circular), Q = h x P
+    ecc_vec = ((v2 - mu/r)[:, None]*rel_pos - rv[:, None]*rel_vel)/mu[:, None]
+    e = np.sqrt(np.sum(ecc_vec**2, axis=-1))
+    h = np.cross(rel_pos, rel_vel)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        P = np.where((e > 1e-12)[:, None], ecc_vec/e[:, None], rel_pos/r[:, None])
+        Q = np.cross(h/np.sqrt(np.sum(h**2, axis=-1))[:, None], P)
+        a = np.where(bound, -0.5*mu/energy, 0.0)
+    e = np.clip(e, 0.0, 1.0)
+    # At r = a the Speed is sqrt(mu/a), Directed Along P
+    new_pos = a[:, None]*(-e[:, None]*P - np.sqrt(1 - e**2)[:, None]*Q)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        new_vel = np.sqrt(mu/a)[:, None]*P
+    new_pos = np.where(bound[:, None], new_pos, rel_pos)
+    new_vel = np.where(bound[:, None], new_vel, rel_vel)
+    return new_pos, new_vel
+
+def get_OrbitalElements(total_mass, rel_pos, rel_vel, G=constants.G):
+    ''' AMUSE-Quantity wrapper for calc_OrbitalElements.
+        total_mass: Combined mass of each pair.
+        rel_pos: Relative position vectors of each pair.
+        rel_vel: Relative velocity vectors of each pair.
+        G: The gravitational constant to use.
+    '''
+    mu = (G*total_mass).value_in(units.m**3/units.s**2)
+    a, e, period, ta, ma = calc_OrbitalElements(np.atleast_1d(mu), rel_pos.value_in(units.m),
+                                                rel_vel.value_in(units.m/units.s))
+    return a | units.m, e, period | units.s, ta, ma
+
+def get_CartesianFromElements(total_mass, a, e, true_anomaly, G=constants.G):
+    ''' AMUSE-Quantity wrapper for calc_CartesianFromElements.
+        total_mass: Combined mass of each pair.
+        a: Semimajor axis of each pair.
+        e: Eccentricity of each pair.
+        true_anomaly: True anomaly of each pair (in radians, or an angle quantity).
+        G: The gravitational constant to use.
+    '''
+    mu = (G*total_mass).value_in(units.m**3/units.s**2)
+    if quantities.is_quantity(true_anomaly):
+        true_anomaly = true_anomaly.value_in(units.rad)
+    rel_pos, rel_vel = calc_CartesianFromElements(mu, a.value_in(units.m), e, true_anomaly)
+    return rel_pos | units.m, rel_vel | units.m/units.s
+
+class NumpyKepler():
+    ''' In-process, drop-in stand-in for the Kepler community worker covering the
+        calls made by StablePlanets. No separate process is started, so it can be
+        created freely. Functions given one of these as their kepler_worker will
+        also convert whole particle sets at once.
+    '''
+    def __init__(self, unit_converter=None, G=constants.G, **kwargs):
+        self.unit_converter = unit_converter
+        self.G = G
+        self.reset()
+
+    def initialize_code(self):
+        pass
+
+    def reset(self):
+        self.elements = None
+
+    def stop(self):
+        self.reset()
+
+    def initialize_from_dyn(self, mass, x, y, z, vx, vy, vz):
+        rel_pos = [x.value_in(units.m), y.value_in(units.m), z.value_in(units.m)] | units.m
+        rel_vel = [vx.value_in(units.m/units.s), vy.value_in(units.m/units.s),
+                   vz.value_in(units.m/units.s)] | units.m/units.s
+        self.elements = [element[0] for element in get_OrbitalElements(mass, rel_pos.reshape((1, 3)),
+                                                                       rel_vel.reshape((1, 3)), G=self.G)]
+
+    def initialize_from_particles(self, particles):
+        rel_pos = particles[1].position - particles[0].position
+        rel_vel = particles[1].velocity - particles[0].velocity
+        self.initialize_from_dyn(particles.total_mass(), rel_pos[0], rel_pos[1], rel_pos[2],
+                                 rel_vel[0], rel_vel[1], rel_vel[2])
+
+    def get_elements(self):
+        return self.elements[0], self.elements[1]
+
+    def get_period(self):
+        return self.elements[2]
+
+    def get_angles(self):
+        return self.elements[3], self.elements[4]
+
+    def get_periastron(self):
+        return self.elements[0]*abs(1.0 - self.elements[1])
+
+    def get_apastron(self):
+        return self.elements[0]*(1.0 + self.elements[1])
+
+def get_PairElements(primaries, secondaries, primary_index, secondary_index, kepler_worker=None):
+    ''' Returns the orbital elements (a, e, period, true & mean anomaly) of the
+        pairs primaries[primary_index] & secondaries[secondary_index].
+        primaries, secondaries: AMUSE particle sets.
+        primary_index, secondary_index: Equal-length index arrays into the sets.
+        kepler_worker: Optional Kepler worker to use for each pair. By default
+                       (or with a NumpyKepler) every pair is converted at once.
+    '''
+    if kepler_worker is None or isinstance(kepler_worker, NumpyKepler):
+        G = constants.G if kepler_worker is None else kepler_worker.G
+        instrument.count("pairs_in_process", len(primary_index))
+        return get_OrbitalElements(primaries.mass[primary_index] + secondaries.mass[secondary_index],
+                                   primaries.position[primary_index] - secondaries.position[secondary_index],
+                                   primaries.velocity[primary_index] - secondaries.velocity[secondary_index], G=G)
+    elements = []
+    instrument.count("kepler_calls", len(primary_index))
+    for i, j in zip(primary_index, secondary_index):
+        primary, secondary = primaries[i], secondaries[j]
+        kep_pos = primary.position - secondary.position
+        kep_vel = primary.velocity - secondary.velocity
+        kepler_worker.initialize_from_dyn(primary.mass + secondary.mass, kep_pos[0], kep_pos[1], kep_pos[2],
+                                          kep_vel[0], kep_vel[1], kep_vel[2])
+        elements.append(tuple(kepler_worker.get_elements()) + (kepler_worker.get_period(),) + tuple(kepler_worker.get_angles()))
+    if len(elements) == 0:
+        return [] | units.m, np.array([]), [] | units.s, np.array([]), np.array([])
+    a, e, period, ta, ma = zip(*elements)
+    return quantities.as_vector_quantity(a), np.array(e), quantities.as_vector_quantity(period), np.array(ta), np.array(ma)
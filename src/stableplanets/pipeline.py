@@ -0,0 +1,195 @@
+# Python Functions containing the Catalog-Wide Stability Classification Pipeline
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import time
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from astropy.table import Table, vstack
+
+from stableplanets import amd
+from stableplanets import instrument
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+RESULT_COLUMNS = ['hostname', 'pl_name', 'beta', 'stability_type', 'system_time']
+
+def get_RowHashes(table, columns=None):
+    ''' Returns a 64-bit content hash of every row of a table.
+        table: The Astropy Table to hash.
+        columns: The columns to hash (Defaults to all of them, sorted by name).
+        Masked entries hash alike, whatever value they hide.
+    '''
+    columns = sorted(table.colnames) if columns is None else columns
+    rows = zip(*[table[name].tolist() for name in columns])
+    return np.array([int.from_bytes(hashlib.blake2b(repr(row).encode('utf-8'), digest_size=8).digest(), 'little') \
+                     for row in rows], dtype=np.uint64)
+
+def get_SystemSignatures(row_hashes, offsets):
+    ''' Combines the row hashes of each system into one signature, which
+        changes when any of its planets is added, removed or modified.
+        offsets: Index of the first row of each system, plus the total.
+    '''
+    if len(offsets) < 2:
+        return np.array([], dtype=np.uint64)
+    return np.add.reduceat(np.asarray(row_hashes, dtype=np.uint64), offsets[:-1])
+
+def diff_Systems(old_hostnames, old_signatures, new_hostnames, new_signatures):
+    ''' Compares two snapshots of a catalog, system by system.
+        old_hostnames, new_hostnames: The (unique) hostname of each system.
+        old_signatures, new_signatures: Matching signatures from get_SystemSignatures.
+        Returns the hostnames of the added, removed & modified systems.
+    '''
+    old_hostnames, new_hostnames = np.asarray(old_hostnames, dtype=str), np.asarray(new_hostnames, dtype=str)
+    common, old_index, new_index = np.intersect1d(old_hostnames, new_hostnames, return_indices=True)
+    added = np.setdiff1d(new_hostnames, old_hostnames)
+    removed = np.setdiff1d(old_hostnames, new_hostnames)
+    modified = common[np.asarray(old_signatures)[old_index] != np.asarray(new_signatures)[new_index]]
+    return added, removed, modified
+
+def get_PlanetKeys(hostnames, pl_names):
+    ''' Returns a unique string key for each (hostname, pl_name) pair.'''
+    return np.char.add(np.char.add(np.asarray(hostnames, dtype=str), '\n'), np.asarray(pl_names, dtype=str))
+
+def get_CatalogChunks(catalog, chunk_size=250):
+    ''' Partitions a hostname-grouped catalog into chunks of whole systems.
+        catalog: Astropy Table grouped by hostname (e.g. ExoplanetCatalog.Catalog).
+        chunk_size: The number of systems in each chunk.
+
+        Yields plain-array dictionaries which are cheap to send to other processes.
+    '''
+    indices = np.asarray(catalog.groups.indices)
+    periods = np.asarray(catalog['pl_orbper'], dtype=float)
+    masses = np.asarray(catalog['pl_bmassj'], dtype=float)*amd.MJUPITER_IN_MSUN
+    eccentricities = np.asarray(catalog['pl_orbeccen'], dtype=float)
+    stellar_masses = np.asarray(catalog['st_mass'], dtype=float)
+    hostnames = np.asarray(catalog['hostname'], dtype=str)
+    pl_names = np.asarray(catalog['pl_name'], dtype=str)
+    for start in range(0, len(indices)-1, chunk_size):
+        bounds = indices[start:start+chunk_size+1]
+        p0, p1 = bounds[0], bounds[-1]
+        yield {'first_row': p0,
+               'offsets': bounds - p0,
+               'periods': periods[p0:p1],
+               'masses': masses[p0:p1],
+               'eccentricities': eccentricities[p0:p1],
+               'stellar_masses': stellar_masses[bounds[:-1]],
+               'hostnames': hostnames[p0:p1],
+               'pl_names': pl_names[p0:p1]}
+
+def get_StreamChunks(catalogs, chunk_size=250):
+    ''' Chains the chunks of a stream of hostname-grouped catalogs, numbering
+        their rows as if the catalogs were one. No system may span two catalogs.
+    '''
+    first_row = 0
+    for catalog in catalogs:
+        for chunk in get_CatalogChunks(catalog, chunk_size):
+            chunk['first_row'] += first_row
+            yield chunk
+        first_row += len(catalog)
+
+@instrument.timed("pipeline.classify_Chunk")
+def classify_Chunk(chunk, time_systems=False):
+    ''' Classifies every system of a chunk in one batched pass.
+        chunk: A chunk created by get_CatalogChunks.
+        time_systems: Classify & time each system separately. Otherwise, the
+                      chunk's wall time is shared out by each system's planet count.
+        Returns the chunk's results as an Astropy Table.
+    '''
+    offsets = chunk['offsets']
+    if time_systems:
+        beta = np.empty(offsets[-1])
+        stability_type = np.empty(offsets[-1], dtype=amd.STABILITY_TYPES.dtype)
+        system_time = np.empty(offsets[-1])
+        for i, (p0, p1) in enumerate(zip(offsets[:-1], offsets[1:])):
+            start_time = time.perf_counter()
+            beta[p0:p1], stability_type[p0:p1] = amd.get_BatchBetaValues(chunk['periods'][p0:p1],
+                                                                         chunk['masses'][p0:p1],
+                                                                         chunk['eccentricities'][p0:p1],
+                                                                         chunk['stellar_masses'][i:i+1], [0])
+            system_time[p0:p1] = time.perf_counter() - start_time
+    else:
+        start_time = time.perf_counter()
+        beta, stability_type = amd.get_BatchBetaValues(chunk['periods'], chunk['masses'], chunk['eccentricities'],
+                                                       chunk['stellar_masses'], offsets[:-1])
+        counts = np.diff(offsets)
+        system_time = np.repeat((time.perf_counter() - start_time)*counts/max(offsets[-1], 1), counts)
+    return Table([chunk['hostnames'], chunk['pl_names'], beta, stability_type, system_time],
+                 names=RESULT_COLUMNS, meta={'first_row': chunk['first_row']})
+
+def classify_InstrumentedChunk(chunk, time_systems=False):
+    ''' Runs classify_Chunk in a worker process with metrics enabled, returning
+        the worker's metrics for the chunk in the result's meta['metrics'].
+    '''
+    instrument.enable_Metrics(True)
+    instrument.reset_Metrics()
+    result = classify_Chunk(chunk, time_systems)
+    result.meta['metrics'] = instrument.get_Metrics()
+    return result
+
+def get_ChunkResult(future):
+    # Fold a Worker's Metrics into this Process'
+    result = future.result()
+    if 'metrics' in result.meta:
+        instrument.merge_Metrics(result.meta.pop('metrics'))
+    return result
+
+def iter_StabilityResults(catalog, num_workers=None, chunk_size=250, time_systems=False):
+    ''' Streams the stability results of a hostname-grouped catalog chunk by chunk,
+        in the order the chunks finish.
+        catalog: Astropy Table grouped by hostname (e.g. ExoplanetCatalog.Catalog),
+                 or an iterable of them (see get_StreamChunks), which is
+                 consumed only as fast as the workers keep up.
+        num_workers: The number of worker processes (Defaults to all cores).
+                     Using 1 runs every chunk in this process.
+        chunk_size: The number of systems sent to a worker at a time.
+        time_systems: Time every system separately (see classify_Chunk).
+    '''
+    if isinstance(catalog, Table):
+        chunks = get_CatalogChunks(catalog, chunk_size)
+    else:
+        chunks = get_StreamChunks(catalog, chunk_size)
+    if num_workers == 1:
+        for chunk in chunks:
+            yield classify_Chunk(chunk, time_systems)
+        return
+    num_workers = num_workers or os.cpu_count()
+    classify = classify_InstrumentedChunk if instrument.ENABLED else classify_Chunk
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        # Keep a Bounded Number of Chunks in Flight
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2*num_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield get_ChunkResult(future)
+            pending.add(executor.submit(classify, chunk, time_systems))
+        for future in as_completed(pending):
+            yield get_ChunkResult(future)
+
+@instrument.timed("pipeline.run_StabilityPipeline")
+def run_StabilityPipeline(catalog, num_workers=None, chunk_size=250, time_systems=False):
+    ''' Classifies the AMD stability of every system in a hostname-grouped catalog
+        on a pool of worker processes (see iter_StabilityResults).
+
+        Returns one Astropy Table, in catalog order, of each planet's beta,
+        stability type and the wall time spent on its system.
+    '''
+    start_time = time.perf_counter()
+    results = list(iter_StabilityResults(catalog, num_workers, chunk_size, time_systems))
+    if len(results) == 0:
+        return Table(names=RESULT_COLUMNS, dtype=[str, str, float, str, float])
+    # Chunks Finish Out of Order, so Restore the Catalog's Order
+    results = vstack(sorted(results, key=lambda chunk: chunk.meta['first_row']), metadata_conflicts='silent')
+    results.meta = {}
+    results.meta['wall_time'] = time.perf_counter() - start_time
+    results.meta['num_workers'] = num_workers or os.cpu_count()
+    return results
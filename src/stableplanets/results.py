@@ -0,0 +1,140 @@
+# Python Classes/Functions containing the Memory-Mapped Results Store for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import json
+import time
+import shutil
+import tempfile
+import numpy as np
+from astropy.table import Table
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+def write_ResultsStore(path, table, key_columns=('hostname', 'pl_name')):
+    ''' Writes a table of per-planet results as a directory of .npy columns.
+        path: The store's directory. An existing store there is replaced.
+        table: An Astropy Table (or dict of equal-length arrays) of results,
+               e.g. from ExoplanetCatalog.get_StabilityResults. Rows are
+               grouped by hostname (keeping their order within each system).
+        key_columns: The system & planet label columns indexed by the store.
+    '''
+    table = Table(table, copy=False)
+    system_column, planet_column = key_columns
+    hostnames = np.asarray(table[system_column], dtype=str)
+    # Group the Rows of each System Together, unless They Already Are
+    run_starts = np.flatnonzero(np.append(True, hostnames[1:] != hostnames[:-1]))
+    if len(np.unique(hostnames[run_starts])) != len(run_starts):
+        table = table[np.argsort(hostnames, kind='stable')]
+        hostnames = np.asarray(table[system_column], dtype=str)
+        run_starts = np.flatnonzero(np.append(True, hostnames[1:] != hostnames[:-1]))
+    offsets = np.append(run_starts, len(table))
+    meta = {'created': time.time(), 'num_rows': len(table), 'key_columns': list(key_columns),
+            'columns': table.colnames, 'units': {}, 'meta': {}}
+    for name, value in table.meta.items():
+        try:
+            meta['meta'][name] = json.loads(json.dumps(value))
+        except:
+            pass
+    # Build the New Store Beside the Old One & Swap it in Once Complete
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    temp_path = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(path)+".tmp-")
+    try:
+        for i, name in enumerate(table.colnames):
+            column = table[name]
+            if column.unit is not None:
+                meta['units'][name] = str(column.unit)
+            data = np.asarray(column)
+            if data.dtype.kind == 'O':
+                data = data.astype(str)
+            np.save(os.path.join(temp_path, "column_{}.npy".format(i)), data)
+        np.save(os.path.join(temp_path, "systems.npy"), hostnames[offsets[:-1]])
+        np.save(os.path.join(temp_path, "offsets.npy"), offsets)
+        with open(os.path.join(temp_path, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+        if os.path.exists(path):
+            old_path = tempfile.mkdtemp(dir=parent, prefix=os.path.basename(path)+".old-")
+            os.rmdir(old_path)
+            os.rename(path, old_path)
+            os.rename(temp_path, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            os.rename(temp_path, path)
+    except:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+class ResultsStore():
+    ''' Read-only view of a store written by write_ResultsStore. Columns are
+        memory-mapped, so opening a store reads only its small index, and
+        columns & systems are handed out as zero-copy slices of the files.
+        path: The store's directory.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta['columns']
+        self.units = self.meta['units']
+        self.systems = np.load(os.path.join(path, "systems.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.system_index = {hostname: i for i, hostname in enumerate(self.systems.tolist())}
+        self.planet_index = None
+        self.cached_columns = {}
+
+    def __len__(self):
+        return self.meta['num_rows']
+
+    def __contains__(self, hostname):
+        return hostname in self.system_index
+
+    def __getitem__(self, name):
+        ''' Returns the named column as a read-only memory map.'''
+        if name not in self.cached_columns:
+            i = self.columns.index(name)
+            self.cached_columns[name] = np.load(os.path.join(self.path, "column_{}.npy".format(i)), mmap_mode='r')
+        return self.cached_columns[name]
+
+    def get_SystemSlice(self, hostname):
+        ''' Returns the rows of a system as a slice, in O(1).'''
+        i = self.system_index[hostname]
+        return slice(self.offsets[i], self.offsets[i+1])
+
+    def get_System(self, hostname, columns=None):
+        ''' Returns the results of a system as an Astropy Table of zero-copy views.
+            columns: The columns to include (Defaults to all of them).
+        '''
+        return self.to_table(columns, self.get_SystemSlice(hostname))
+
+    def get_Planet(self, hostname, pl_name):
+        ''' Returns the results of a planet as a dictionary of column values.'''
+        if self.planet_index is None:
+            # Built on First Use, as Only Planet Lookups Need it
+            planet_column = self.meta['key_columns'][1]
+            self.planet_index = {}
+            systems = self.systems.tolist()
+            for i, planet_names in enumerate(np.split(np.asarray(self[planet_column]), self.offsets[1:-1])):
+                for j, planet_name in enumerate(planet_names.tolist()):
+                    self.planet_index[(systems[i], planet_name)] = self.offsets[i] + j
+        row = self.planet_index[(hostname, pl_name)]
+        return {name: self[name][row] for name in self.columns}
+
+    def to_table(self, columns=None, rows=slice(None)):
+        ''' Returns the store (or the given slice of rows) as an Astropy Table
+            whose columns are views of the memory-mapped files.
+        '''
+        columns = self.columns if columns is None else columns
+        table = Table([self[name][rows] for name in columns], names=columns, copy=False,
+                      meta=dict(self.meta['meta']))
+        for name in columns:
+            if name in self.units:
+                table[name].unit = self.units[name]
+        return table
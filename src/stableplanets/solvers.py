@@ -0,0 +1,101 @@
+# Python Functions containing the Vectorized Root Solvers for the Critical AMD
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import numpy as np
+from stableplanets import instrument
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+def equation_35(inner_e, gamma, alpha):
+    return alpha*inner_e + gamma*inner_e/np.sqrt(alpha*(1.-inner_e**2) + gamma**2*inner_e**2) - 1. + alpha
+
+def equation_35_prime(inner_e, gamma, alpha):
+    return alpha + gamma*alpha/(alpha*(1.-inner_e**2) + gamma**2*inner_e**2)**(3./2.)
+
+def equation_99(one_minus_alpha, r, epsilon):
+    return 729*one_minus_alpha**7. - 4608.*r*epsilon*one_minus_alpha**3 - 16384.*(r*epsilon)**2
+
+def equation_99_prime(one_minus_alpha, r, epsilon):
+    return 5103*one_minus_alpha**6. - 13824.*r*epsilon*one_minus_alpha**2
+
+def bracketed_newton(func, fprime, lo, hi, args=(), xtol=2e-12, rtol=4*np.finfo(float).eps, maxiter=100):
+    ''' Finds the roots of func within the brackets [lo, hi] for whole arrays at once.
+        func: Vectorized function f(x, *args) whose roots are desired.
+        fprime: Vectorized derivative of func with respect to x.
+        lo, hi: Arrays bracketing the roots (func must change sign across them).
+        args: Extra arrays passed to func and fprime, broadcast against lo & hi.
+        xtol, rtol: Absolute & relative tolerances, as in scipy.optimize.brentq.
+
+        Newton steps are used while they stay inside the bracket, and bisection
+        otherwise. Every returned root is certified by a sign change of func
+        within xtol + rtol*|x|, which is the guaranteed error bound. Brackets
+        without a sign change return NaN.
+    '''
+    arrays = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (lo, hi) + tuple(args)])
+    shape = arrays[0].shape
+    lo, hi = [x.ravel().copy() for x in arrays[:2]]
+    args = [x.ravel() for x in arrays[2:]]
+    f_lo = func(lo, *args)
+    f_hi = func(hi, *args)
+    roots = np.full(lo.shape, np.nan)
+    # Handle Roots Sitting on the Brackets & Brackets Without a Sign Change
+    roots[f_lo == 0] = lo[f_lo == 0]
+    roots[f_hi == 0] = hi[f_hi == 0]
+    active = np.flatnonzero((np.sign(f_lo)*np.sign(f_hi)) < 0)
+    lo, hi, f_lo = lo[active], hi[active], f_lo[active]
+    args = [a[active] for a in args]
+    x = 0.5*(lo+hi)
+    instrument.count("root_solves", len(active))
+    for iteration in range(maxiter):
+        if len(active) == 0:
+            break
+        instrument.count("root_iterations")
+        instrument.count("root_evaluations", len(active))
+        fx = func(x, *args)
+        # Shrink the Bracket Around the Root
+        left = np.sign(fx) == np.sign(f_lo)
+        lo = np.where(left, x, lo)
+        f_lo = np.where(left, fx, f_lo)
+        hi = np.where(left, hi, x)
+        # Take the Newton Step, Falling Back to Bisection Outside the Bracket
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_new = x - fx/fprime(x, *args)
+        outside = ~((x_new > lo) & (x_new < hi))
+        x_new[outside] = 0.5*(lo[outside]+hi[outside])
+        tol = xtol + rtol*np.abs(x_new)
+        # Certify Converged Roots by a Sign Change Within the Tolerance
+        done = (fx == 0) | (hi-lo <= 2*tol)
+        small_step = ~done & (np.abs(x_new-x) <= tol)
+        if small_step.any():
+            check = np.flatnonzero(small_step)
+            check_args = [a[check] for a in args]
+            x_c, tol_c = x_new[check], tol[check]
+            f_left = func(np.maximum(x_c-tol_c, lo[check]), *check_args)
+            f_right = func(np.minimum(x_c+tol_c, hi[check]), *check_args)
+            done[check] = (np.sign(f_left)*np.sign(f_right)) <= 0
+        x_new[fx == 0] = x[fx == 0]
+        roots[active[done]] = x_new[done]
+        keep = ~done
+        active, lo, hi, f_lo, x = active[keep], lo[keep], hi[keep], f_lo[keep], x_new[keep]
+        args = [a[keep] for a in args]
+    # Anything Left Unconverged Gets its Best Estimate
+    roots[active] = x
+    return roots.reshape(shape)
+
+def solve_equation_99(r, epsilon, **kwargs):
+    ''' Returns alpha_R, the root of equation_99 in [0, 1], for an array of epsilon.'''
+    epsilon = np.asarray(epsilon, dtype=float)
+    return bracketed_newton(equation_99, equation_99_prime, 0.0, 1.0, args=(r, epsilon), **kwargs)
+
+def solve_equation_35(gamma, alpha, **kwargs):
+    ''' Returns the inner eccentricity, the root of equation_35 in [0, 1], for
+        arrays of (gamma, alpha).
+    '''
+    return bracketed_newton(equation_35, equation_35_prime, 0.0, 1.0, args=(gamma, alpha), **kwargs)
@@ -0,0 +1,251 @@
+# Python Classes/Functions containing the Cached Stellar-Property Grid for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import tempfile
+import numpy as np
+
+# Import the Amuse Base Packages
+from amuse.units import units
+from amuse.units import quantities
+from amuse.datamodel import Particles
+
+# Note: The Cache Module Pulls in Astropy, so it is Imported when a Grid is First Built.
+from stableplanets import workers
+from stableplanets import instrument
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# The SSE Outputs Kept on the Grid, their Units & which are Interpolated in Log-Space
+PROPERTIES = {'radius': units.RSun, 'luminosity': units.LSun, 'temperature': units.K,
+              'mass': units.MSun, 'stellar_type': units.stellar_type}
+LOG_PROPERTIES = ('radius', 'luminosity', 'temperature')
+
+# The Default Grid: Zero-Age Masses (in MSun) over SSE's Range & Ages (in Myr) up to a Hubble Time
+MASS_GRID = np.geomspace(0.1, 100.0, 121)
+AGE_GRID = np.append(0.0, np.geomspace(1.0, 13800.0, 161))
+
+def get_PropertyArrays(stars):
+    ''' Returns the PROPERTIES of an AMUSE particle set as unitless arrays.'''
+    return {name: getattr(stars, name).value_in(unit) for name, unit in PROPERTIES.items()}
+
+@instrument.timed("stellar_grid.evolve_SSE")
+def evolve_SSE(masses, ages, metallicity=0.02, sse_worker=None):
+    ''' Evolves many stars on one SSE worker, each by its own age, in a single call.
+        masses: Array of zero-age masses (in MSun).
+        ages: Array of ages to evolve each star to (in Myr).
+        metallicity: The metallicity used (Ignored if an sse_worker is provided).
+        sse_worker: Optional SSE worker to use (Defaults to a pooled worker).
+
+        Returns a dictionary of unitless arrays of the PROPERTIES of every star.
+    '''
+    masses, ages = np.broadcast_arrays(np.asarray(masses, dtype=float), np.asarray(ages, dtype=float))
+    shape = masses.shape
+    if masses.size == 0:
+        return {name: np.zeros(shape) for name in PROPERTIES}
+    with workers.borrow_sse(sse_worker) as sse:
+        if sse_worker is None:
+            sse.parameters.metallicity = metallicity
+        stars = Particles(masses.size)
+        stars.mass = masses.ravel() | units.MSun
+        stars = sse.particles.add_particles(stars)
+        stars.evolve_for(ages.ravel() | units.Myr)
+        values = get_PropertyArrays(stars)
+        if sse_worker is not None:
+            sse.particles.remove_particles(stars)
+    return {name: value.reshape(shape) for name, value in values.items()}
+
+@instrument.timed("stellar_grid.new_GridValues")
+def new_GridValues(masses, ages, metallicity=0.02, sse_worker=None):
+    ''' Evolves a row of stars through every age of a (mass, age) grid on one SSE worker.
+        masses: Sorted array of zero-age masses (in MSun).
+        ages: Sorted array of ages (in Myr).
+        Returns a dictionary of the PROPERTIES, each shaped (len(masses), len(ages)).
+    '''
+    values = {name: np.empty((len(masses), len(ages))) for name in PROPERTIES}
+    with workers.borrow_sse(sse_worker) as sse:
+        if sse_worker is None:
+            sse.parameters.metallicity = metallicity
+        stars = Particles(len(masses))
+        stars.mass = masses | units.MSun
+        stars = sse.particles.add_particles(stars)
+        # Each Age Only Costs the Step from the Previous One
+        current_age = 0.0
+        for j, age in enumerate(ages):
+            if age > current_age:
+                stars.evolve_for((age - current_age) | units.Myr)
+                current_age = age
+            for name, value in get_PropertyArrays(stars).items():
+                values[name][:, j] = value
+        if sse_worker is not None:
+            sse.particles.remove_particles(stars)
+    return values
+
+def get_LogValues(values):
+    # Massless Remnants have Zero Radius & Luminosity, so Floor Before Taking Logs
+    return np.log10(np.maximum(values, 1e-30))
+
+def get_CellErrors(values):
+    ''' Estimates the error (in dex) of bilinear interpolation within each grid cell.
+        values: Dictionary of grid PROPERTIES, each shaped (num_masses, num_ages).
+
+        Bilinear interpolation errs by at most an eighth of the sum of the second
+        differences along mass & along age, so the largest such sum of any
+        LOG_PROPERTIES at the cell's corners is used (extrapolated at the grid's
+        edges). Cells whose corners differ in stellar type straddle a phase
+        change, and are given an infinite error.
+        Returns an array shaped (num_masses-1, num_ages-1).
+    '''
+    def pad_Edges(d2, widths):
+        # Edge Nodes have No Second Difference of their Own, so Extrapolate the
+        # Neighbouring Ones (Copying the Nearest where that is Larger)
+        return np.maximum(np.pad(d2, widths, mode='edge'), np.pad(d2, widths, mode='reflect', reflect_type='odd'))
+    node_errors = np.zeros(values['radius'].shape)
+    for name in LOG_PROPERTIES:
+        Q = get_LogValues(values[name])
+        d2_mass = pad_Edges(np.abs(Q[2:, :] - 2*Q[1:-1, :] + Q[:-2, :]), ((1, 1), (0, 0)))
+        d2_age = pad_Edges(np.abs(Q[:, 2:] - 2*Q[:, 1:-1] + Q[:, :-2]), ((0, 0), (1, 1)))
+        node_errors = np.maximum(node_errors, (d2_mass + d2_age)/8.)
+    cell_errors = np.maximum.reduce([node_errors[:-1, :-1], node_errors[1:, :-1],
+                                     node_errors[:-1, 1:], node_errors[1:, 1:]])
+    types = values['stellar_type']
+    same_type = (types[:-1, :-1] == types[1:, :-1]) & (types[:-1, :-1] == types[:-1, 1:]) \
+                & (types[:-1, :-1] == types[1:, 1:])
+    return np.where(same_type, cell_errors, np.inf)
+
+def write_GridValues(path, masses, ages, metallicity, values):
+    ''' Saves a grid as an .npz file, written to a temporary file & moved into place.'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npz")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, masses=masses, ages=ages, metallicity=metallicity, **values)
+        os.replace(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def read_GridValues(path):
+    ''' Loads a grid saved by write_GridValues, or returns None if it is unreadable.'''
+    try:
+        with np.load(path) as grid:
+            return {name: grid[name] for name in PROPERTIES}
+    except:
+        return None
+
+class StellarGrid():
+    ''' Answers queries for the SSE properties of whole arrays of stars by
+        interpolating a (mass, age) grid, which is built once with SSE and then
+        cached on disk. Queries outside the grid, or in cells whose estimated
+        interpolation error exceeds the tolerance, fall back to one batched
+        SSE evolution on a pooled worker.
+        masses: Zero-age masses of the grid (in MSun, Defaults to MASS_GRID).
+        ages: Ages of the grid (in Myr, Defaults to AGE_GRID).
+        metallicity: The metallicity used by SSE.
+        rtol: The default relative tolerance of interpolated radii, luminosities
+              & temperatures (Defaults to 5%).
+        cache_dir: Where the grid is cached (Defaults to cache.CACHE_DIR).
+        refresh: Rebuild the grid even if a cached copy exists.
+        sse_worker: Optional SSE worker to build the grid & answer fallbacks with.
+    '''
+    def __init__(self, masses=None, ages=None, metallicity=0.02, **kwargs):
+        self.masses = np.sort(np.asarray(MASS_GRID if masses is None else masses, dtype=float))
+        self.ages = np.sort(np.asarray(AGE_GRID if ages is None else ages, dtype=float))
+        self.log_masses = np.log10(self.masses)
+        self.metallicity = metallicity
+        self.rtol = kwargs.get("rtol", 0.05)
+        self.sse_worker = kwargs.get("sse_worker", None)
+        cache_dir = kwargs.get("cache_dir", None)
+        refresh = kwargs.get("refresh", False)
+        # The Grid's Key Covers Everything it was Built From
+        from stableplanets import cache
+        self.key = cache.get_CacheKey("sse-grid", metallicity, self.masses.tolist(), self.ages.tolist())
+        self.path = os.path.join(cache_dir or cache.CACHE_DIR, "stellar_grid-"+self.key+".npz")
+        self.values = None if refresh else read_GridValues(self.path)
+        if self.values is None:
+            self.values = new_GridValues(self.masses, self.ages, metallicity, self.sse_worker)
+            write_GridValues(self.path, self.masses, self.ages, metallicity, self.values)
+        self.log_values = {name: get_LogValues(self.values[name]) for name in LOG_PROPERTIES}
+        self.cell_errors = get_CellErrors(self.values)
+
+    def interpolate(self, masses, ages):
+        ''' Bilinearly interpolates the grid in (log mass, age).
+            masses, ages: Unitless arrays (in MSun & Myr).
+            Returns a dictionary of unitless PROPERTIES (NaN outside the grid, except
+            the stellar type, which is that of the nearest grid point) and the
+            estimated error (in dex) of each point.
+        '''
+        x, y = np.log10(masses), ages
+        inside = (x >= self.log_masses[0]) & (x <= self.log_masses[-1]) & (y >= self.ages[0]) & (y <= self.ages[-1])
+        i = np.clip(np.searchsorted(self.log_masses, x, side='right') - 1, 0, len(self.masses) - 2)
+        j = np.clip(np.searchsorted(self.ages, y, side='right') - 1, 0, len(self.ages) - 2)
+        tx = np.clip((x - self.log_masses[i])/(self.log_masses[i+1] - self.log_masses[i]), 0.0, 1.0)
+        ty = np.clip((y - self.ages[j])/(self.ages[j+1] - self.ages[j]), 0.0, 1.0)
+        results = {}
+        for name in PROPERTIES:
+            if name == 'stellar_type':
+                # Types are Only Trusted where all Corners Agree, so Take the Nearest
+                Q = self.values[name]
+                results[name] = Q[i + np.rint(tx).astype(int), j + np.rint(ty).astype(int)]
+                continue
+            else:
+                Q = self.log_values[name] if name in LOG_PROPERTIES else self.values[name]
+                value = (1-tx)*(1-ty)*Q[i, j] + tx*(1-ty)*Q[i+1, j] + (1-tx)*ty*Q[i, j+1] + tx*ty*Q[i+1, j+1]
+                if name in LOG_PROPERTIES:
+                    value = 10**value
+            results[name] = np.where(inside, value, np.nan)
+        return results, np.where(inside, self.cell_errors[i, j], np.inf)
+
+    def get_Properties(self, masses, ages, rtol=None, fallback=True):
+        ''' Returns the SSE properties of many stars at once.
+            masses: Zero-age masses (a quantity, or an array in MSun).
+            ages: Ages (a quantity, or an array in Myr), broadcast against masses.
+            rtol: The relative tolerance of interpolated radii, luminosities &
+                  temperatures (Defaults to the grid's rtol).
+            fallback: Evolve any point not meeting the tolerance with SSE. Otherwise
+                      those points keep their interpolated value (NaN off the grid).
+
+            Returns a dictionary of quantities, plus the boolean 'interpolated'
+            array marking the stars that were answered from the grid.
+        '''
+        if quantities.is_quantity(masses):
+            masses = masses.value_in(units.MSun)
+        if quantities.is_quantity(ages):
+            ages = ages.value_in(units.Myr)
+        masses, ages = np.broadcast_arrays(np.asarray(masses, dtype=float), np.asarray(ages, dtype=float))
+        rtol = self.rtol if rtol is None else rtol
+        results, errors = self.interpolate(masses, ages)
+        interpolated = errors <= np.log10(1 + rtol)
+        if fallback and not interpolated.all():
+            # Evolve Every Remaining Star Together
+            evolved = evolve_SSE(masses[~interpolated], ages[~interpolated], self.metallicity, self.sse_worker)
+            for name in PROPERTIES:
+                results[name][~interpolated] = evolved[name]
+        # Single Stars get Scalar Quantities Back
+        results = {name: value[()] | PROPERTIES[name] for name, value in results.items()}
+        results['interpolated'] = interpolated[()]
+        return results
+
+    def get_Radius(self, masses, ages, **kwargs):
+        ''' Returns the radii of many stars at once (see get_Properties).'''
+        return self.get_Properties(masses, ages, **kwargs)['radius']
+
+# Each Process Keeps One Grid per Metallicity & Cache Directory
+GRIDS = {}
+
+def get_StellarGrid(metallicity=0.02, **kwargs):
+    ''' Returns the process-wide StellarGrid with the default (mass, age) grid,
+        loading it from the disk cache (or building it) on first use.
+    '''
+    key = (metallicity, kwargs.get("cache_dir", None))
+    if key not in GRIDS:
+        GRIDS[key] = StellarGrid(metallicity=metallicity, **kwargs)
+    return GRIDS[key]
@@ -8,32 +8,25 @@
 # Importing Necessary System Packages
 import sys, os, math
 import numpy as np
-import matplotlib.pyplot as plt
-import time as tp
-import random as rp
-import hashlib
-import scipy as sp
-from scipy import optimize
-from scipy import special
-
-# Importing cPickle/Pickle
-try:
-   import pickle as pickle
-except:
-   import pickle
 
 # Import the Amuse Base Packages
+# Note: Community Codes (Kepler, SSE, ...) are Started via the Worker Pool,
+#       and Matplotlib is Only Imported when Plotting, to Keep Imports Fast.
 from amuse import datamodel
+from amuse.datamodel import Particles, Particle
 from amuse.units import nbody_system
 from amuse.units import units
 from amuse.units import constants
 from amuse.datamodel import particle_attributes
-from amuse.io import *
-from amuse.lab import *
 from stableplanets import util
+from stableplanets import amd
+from stableplanets import orbits
+from stableplanets import workers
+from stableplanets import solvers
+from stableplanets import instrument
+from stableplanets.solvers import equation_35, equation_99
 
-from amuse.community.kepler.interface import Kepler
-from amuse.community.sse.interface import SSE
+logger = instrument.get_Logger(__name__)
 
 # ------------------------------------- #
 #           Defining Functions          #
@@ -51,18 +44,22 @@ def get_periods(host_star, planets):
     for planet in planets:
         mu = constants.G*(planet.mass+host_star.mass)
         a = planet.semimajor_axis
-        print(mu, a, 2.0*np.pi/np.sqrt(mu)*a**(3./2.))
         planet.period = 2.0*np.pi/np.sqrt(mu)*a**(3./2.)
+        logger.debug("mu=%s a=%s period=%s", mu, a, planet.period)
 
 def update_orb_elem(host_star, planets, converter=None, kepler_worker=None):
-    if kepler_worker == None:
-        if converter == None:
-            tot_sys = Particles(particles=(host_star, planets))
-            converter = nbody_system.nbody_to_si(tot_sys.mass.sum(), 2 * host_star.radius)
-        kep_p = Kepler(unit_converter = converter, redirection = 'none')
-        kep_p.initialize_code()
-    else:
-        kep_p = kepler_worker
+    # Convert In-Process Unless a Kepler Worker (or workers.POOLED) was Provided
+    if kepler_worker is None or isinstance(kepler_worker, str):
+        with workers.use_kepler(kepler_worker, converter=converter) as kep_p:
+            return update_orb_elem(host_star, planets, converter=converter, kepler_worker=kep_p)
+    kep_p = kepler_worker
+    if isinstance(kep_p, orbits.NumpyKepler) and isinstance(planets, datamodel.AbstractParticleSet):
+        # Convert Every Star-Planet Pair at Once, In-Process
+        planets.semimajor_axis, planets.eccentricity, planets.period, planets.true_anomaly, planets.mean_anomaly = \
+            orbits.get_OrbitalElements(host_star.mass + planets.mass, host_star.position - planets.position,
+                                       host_star.velocity - planets.velocity, G=kep_p.G)
+        planets = []
+    instrument.count("kepler_calls", len(planets))
     for planet in planets:
         total_mass = host_star.mass + planet.mass
         kep_pos = host_star.position - planet.position
@@ -71,35 +68,31 @@ def update_orb_elem(host_star, planets, converter=None, kepler_worker=None):
         planet.semimajor_axis, planet.eccentricity = kep_p.get_elements()
         planet.period = kep_p.get_period()
         planet.true_anomaly, planet.mean_anomaly = kep_p.get_angles()
-    if kepler_worker == None:
-        kep_p.stop()
 
-def update_host_star(system, converter=None, kepler_worker=None):
-    if kepler_worker == None:
-        if converter == None:
-            converter = nbody_system.nbody_to_si(system.mass.sum(), 2 * np.max(system.radius.number) | system.radius.unit)
-        kep_p = Kepler(unit_converter = converter, redirection = 'none')
-        kep_p.initialize_code()
-    else:
-        kep_p = kepler_worker
-    stars = util.get_stars(system)
-    planets = util.get_planets(system)
-    p_NearestStar = planets.nearest_neighbour(stars)
-    for i, planet in enumerate(planets):
-        likely_host = p_NearestStar[i]
-        update_orb_elem(likely_host, [planet], converter=converter, kepler_worker=kep_p)
-        if planet.eccentricity >= 1.0:
-            for s in stars - likely_host:
-                update_orb_elem(s, [planet], converter=converter, kepler_worker=kep_p)
-                if planet.eccentricity < 1.0:
-                    planet.host_star = s.id
-                    break
-                elif planet.eccentricity >= 1.0:
-                    planet.host_star = -1
-        else:
-            planet.host_star = likely_host.id
-    if kepler_worker == None:
-        kep_p.stop()
+def update_host_star(system, converter=None, kepler_worker=None, search_radius=None):
+    # Convert Every Candidate Pair In-Process Unless a Kepler Worker (or
+    # workers.POOLED) was Provided
+    with workers.use_kepler(kepler_worker, converter=converter) as kepler_worker:
+        stars = util.get_stars(system)
+        planets = util.get_planets(system)
+        if len(stars) == 0 or len(planets) == 0:
+            return
+        # Only Test the Nearest Star & the Stars Close Enough for the Planet to be Bound
+        s_index, p_index, distance = util.get_HostCandidates(stars, planets, search_radius)
+        a, e, period, true_anomaly, mean_anomaly = orbits.get_PairElements(stars, planets, s_index, p_index,
+                                                                           kepler_worker=kepler_worker)
+        # Candidates are Sorted by Distance, so the First Bound Star is the Host.
+        # If the Planet is Unbound to all of them, Keep the Nearest Star's Orbit.
+        choice = np.unique(p_index, return_index=True)[1]
+        bound = np.flatnonzero(e < 1.0)
+        bound_planets, first_bound = np.unique(p_index[bound], return_index=True)
+        choice[bound_planets] = bound[first_bound]
+        host_ids = np.full(len(planets), -1, dtype=int)
+        host_ids[bound_planets] = stars.id[s_index[bound[first_bound]]]
+        planets.semimajor_axis, planets.eccentricity = a[choice], e[choice]
+        planets.period = period[choice]
+        planets.true_anomaly, planets.mean_anomaly = true_anomaly[choice], mean_anomaly[choice]
+        planets.host_star = host_ids
 
 def get_zaxis_inclination(host_star, planets):
     for planet in planets:
@@ -119,22 +112,21 @@ def get_rel_inclination(planets, method='Jovian'):
         for planet in planets:
             planet.rel_inc = planet.z_inc - largest_p.z_inc
 
-def equation_35(inner_e, gamma, alpha):
-    return alpha*inner_e + gamma*inner_e/np.sqrt(alpha*(1.-inner_e**2) + gamma**2*inner_e**2) - 1. + alpha
-
-def equation_99(one_minus_alpha, r, epsilon):
-    return 729*one_minus_alpha**7. - 4608.*r*epsilon*one_minus_alpha**3 - 16384.*(r*epsilon)**2
-
 class PlanetarySystem():
     def __init__(self, host_star, planets, system_name='', uncertainties=None):
         try:
             self.planets = (planets.copy()).sorted_by_attribute('semimajor_axis')
         except:
-            print('Error: Planets do Not have Semimajor Axis Attribute.')
+            logger.error('Planets do Not have Semimajor Axis Attribute.')
         self.host_star = host_star.copy()
         self.number_of_planets = len(planets)
         self.system_name = system_name
-        self.r = (sp.special.kv(1, 2.0/3.0) + 2*sp.special.kv(0, 2.0/3.0))/np.pi
+        # Uncertainties are [min, max] Ranges Keyed as in ExoplanetCatalog.Parameter_Dict
+        # (pl_orbper [day], pl_bmassj [MJupiter], pl_orbeccen & st_mass [MSun]), with
+        # the Planet Ranges Given in the Order of the Provided Planets.
+        self.uncertainties = uncertainties
+        self.input_keys = planets.key
+        self.r = amd.LASKAR_R
         try:
             self.planets.period.sorted_by_attribute('period')
         except:
@@ -157,22 +149,60 @@ class PlanetarySystem():
 
     def get_SystemBetaValues(self):
         """Calculate the AMD Stability Coefficient, Beta, values for the system."""
-        res = [self.get_AMDBeta(i) for i in range(self.number_of_planets)]
-        return np.array(res)
+        # Use the Batch Engine, Treating this System as a Catalog of One
+        beta, stability_type = amd.get_BatchBetaValues(self.planets.period.value_in(units.day),
+                                                       self.planets.mass.value_in(units.MSun),
+                                                       self.planets.eccentricity,
+                                                       [self.host_star.mass.value_in(units.MSun)], [0],
+                                                       sort_keys=np.arange(self.number_of_planets))
+        self.planets.AMDBeta = beta
+        self.planets.stability_type = stability_type
+        return beta
+
+    def get_SystemBetaDistribution(self, num_draws=1000, **kwargs):
+        """Sample the Beta values of the system from its uncertainties. Returns the
+           per-planet beta quantiles and P(beta<1) (see amd.sample_BatchBetaValues)."""
+        if self.uncertainties is None:
+            raise ValueError('Error: '+self.system_name+' was not Provided any Uncertainties.')
+        # Match the Provided Ranges to the Sorted Planets
+        key_index = {key: i for i, key in enumerate(self.input_keys)}
+        order = [key_index[key] for key in self.planets.key]
+        def get_errors(name, values, planet_param=True):
+            if name not in self.uncertainties:
+                return (0.0, 0.0)
+            min_param, max_param = [np.asarray(limit, dtype=float) for limit in self.uncertainties[name]]
+            if planet_param:
+                min_param, max_param = min_param[order], max_param[order]
+            return (max_param - values, min_param - values)
+        periods = self.planets.period.value_in(units.day)
+        masses = self.planets.mass.value_in(units.MJupiter)
+        eccentricities = self.planets.eccentricity
+        stellar_mass = self.host_star.mass.value_in(units.MSun)
+        mass_errs = get_errors('pl_bmassj', masses)
+        stellar_mass_errs = get_errors('st_mass', stellar_mass, planet_param=False)
+        return amd.sample_BatchBetaValues(periods, masses*amd.MJUPITER_IN_MSUN, eccentricities,
+                                          [stellar_mass], [0], num_draws=num_draws,
+                                          period_errs=get_errors('pl_orbper', periods),
+                                          mass_errs=tuple(np.multiply(err, amd.MJUPITER_IN_MSUN) for err in mass_errs),
+                                          ecc_errs=get_errors('pl_orbeccen', eccentricities),
+                                          stellar_mass_errs=tuple(np.atleast_1d(err) for err in stellar_mass_errs),
+                                          **kwargs)
 
     def get_AMDBeta(self, p_index):
         """Get the beta value for the pair i-1 and i"""
         eta = self.get_RelAMD(p_index)
         HCc = self.get_Hill_CritC(p_index)
-        betaH = eta/HCc
-        if betaH < 1.0:
-            self.planets[p_index].AMDBeta = betaH
-            return betaH
-        elif betaH >= 1.0:
-            LCc = self.get_Laskar_CritC(p_index)
-            betaL = eta/LCc
-            self.planets[p_index].AMDBeta = betaL
-            return betaL
+        # A Non-Positive Hill C_crit Means the Pair can't be Hill Stable
+        if HCc > 0.0:
+            betaH = eta/HCc
+            if betaH < 1.0:
+                self.planets[p_index].AMDBeta = betaH
+                return betaH
+        LCc = self.get_Laskar_CritC(p_index)
+        # A Zero Laskar C_crit Leaves No Room for Any AMD
+        betaL = eta/LCc if LCc != 0.0 else np.inf
+        self.planets[p_index].AMDBeta = betaL
+        return betaL
 
     def get_alpha(self, p_index):
         if p_index == 0:
@@ -200,11 +230,15 @@ class PlanetarySystem():
         alpha = (inner_p.period/outer_p.period)**(2./3)
         gamma = inner_p.mass/outer_p.mass
         epsilon = (inner_p.mass+outer_p.mass)/(self.host_star).mass
-        alpha_R = sp.optimize.brentq(equation_99, 0.0, 1.0, args = (self.r, epsilon))
+        alpha_R = float(solvers.solve_equation_99(self.r, epsilon))
+        # Pairs Where equation_99 has No Root in [0, 1] Can't be Classified
+        if np.isnan(alpha_R):
+            outer_p.stability_type = "Unclassified"
+            return np.nan
         # Preform Collision Restricted Critical AMD Calc
         if alpha < alpha_R:
             outer_p.stability_type = "Collision"
-            inner_ec = sp.optimize.brentq(equation_35, 0.0, 1.0, args = (gamma, alpha))
+            inner_ec = float(solvers.solve_equation_35(gamma, alpha))
             outer_ec = 1 - alpha - alpha*inner_ec
             return gamma*np.sqrt(alpha)*(1-np.sqrt(1-inner_ec**2.0)) + (1-np.sqrt(1-outer_ec**2.0))
         # Preform MMR-Overlap Restricted Critical AMD Calc
@@ -245,6 +279,7 @@ class PlanetarySystem():
             cb.ax.xaxis.set_ticks_position('top')
             cb.ax.xaxis.set_label_position('top')
 
+        import matplotlib.pyplot as plt
         import matplotlib.colors as colors
         norm = colors.LogNorm(vmin=1e-2,vmax=1e2)
         if ax is None:
@@ -259,14 +294,14 @@ class PlanetarySystem():
         if clrbar:
             _clrbar(ax,norm,'coolwarm')
         ax.axhline(zeropoint,c='k',ls=':',zorder=0)
-        print('For ', self.system_name, ':')
+        logger.info('For %s:', self.system_name)
         for i, planet in enumerate(self.planets):
             beta = self.get_AMDBeta(i)
             stest = planet.stability_type
             mass = planet.mass
             period = planet.period
             size = 200*np.log10(mass.value_in(units.MJupiter) * 1e-2/(3e-6) / (.1))
-            print('Planet #', i, 'has a AMDBeta of', beta, 'from the', stest, 'stability test.')
+            logger.info('Planet #%d has a AMDBeta of %s from the %s stability test.', i, beta, stest)
             ax.scatter(period.value_in(units.day),zeropoint,s=size,c=beta,cmap='coolwarm',norm=norm)
         return fig,ax
 
@@ -274,229 +309,125 @@ class PlanetarySystem():
 #-The following function returns a list to match planets with their host stars-#
 #------------------------------------------------------------------------------#
 
-def get_planetary_systems_from_set(bodies, converter=None, RelativePosition=False):
-    # Initialize Kepler
-    if converter == None:
-        converter = nbody_system.nbody_to_si(bodies.mass.sum(), 2 * np.max(bodies.radius.number) | bodies.radius.unit)
-    kep_p = Kepler(unit_converter = converter, redirection = 'none')
-    kep_p.initialize_code()
-    kep_s = Kepler(unit_converter = converter, redirection = 'none')
-    kep_s.initialize_code()
-    # Seperate Out Planets and Stars from Bodies
-    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
-    num_stars, num_planets = len(stars), len(planets)
-    # Initialize the Dictionary that Contains all Planetary Systems
-    systems = {}
-    # Start Looping Through Stars to Find Bound Planets
-    for star in stars:
-        system_id = star.id
-        #star.semimajor_axis, star.eccentricity, star.period, star.true_anomaly, star.mean_anomaly, star.kep_energy, star.angular_momentum = \
-        #    None, None, None, None, None, None, None
-        current_system = systems.setdefault(system_id, Particles())
-        current_system.add_particle(star)
-        for planet in planets:
-            total_mass = star.mass + planet.mass
-            kep_pos = star.position - planet.position
-            kep_vel = star.velocity - planet.velocity
-            kep_p.initialize_from_dyn(total_mass, kep_pos[0], kep_pos[1], kep_pos[2], kep_vel[0], kep_vel[1], kep_vel[2])
-            a_p, e_p = kep_p.get_elements()
-            if e_p < 1.0:
-                # Check to See if The Stellar System is a Binary
-                # Note: Things get complicated if it is ...
-                noStellarHeirarchy = False
-                for other_star in (stars-star):
-                    kep_s.initialize_from_dyn(star.mass + other_star.mass, star.x - other_star.x, star.y - other_star.y, star.z - other_star.z,
-                                              star.vx - other_star.vx, star.vy - other_star.vy, star.vz - other_star.vz)
-                    a_s, e_s = kep_s.get_elements()
-                    r_apo = kep_s.get_apastron()
-                    HillR = util.calc_HillRadius(a_s, e_s, other_star.mass, star.mass)
-                    if e_s >= 1.0 or HillR < r_apo:
-                        noStellarHeirarchy = True
-                    else:
-                        noStellarHeirarchy = False
-                if noStellarHeirarchy:
-                    # Get Additional Information on Orbit
-                    planet.semimajor_axis = a_p
-                    planet.eccentricity = e_p
-                    planet.period = kep_p.get_period()
-                    planet.true_anomaly, planet.mean_anomaly = kep_p.get_angles()
-                    #planet.kep_energy, planet.angular_momentum = kep_p.get_integrals()
-                    # Add the Planet to the System Set
-                    current_system.add_particle(planet)
-                else:
-                    # Handling for Planetary Systems in Stellar Heirarchical Structures
-                    # Note: This is empty for now, maybe consider doing it by the heaviest bound stellar object as the primary.
-                    pass
-            else:
-                continue
-    kep_p.stop()
-    kep_s.stop()
-    return systems
+@instrument.timed("stellar_systems.get_planetary_systems_from_set")
+def get_planetary_systems_from_set(bodies, converter=None, RelativePosition=False, kepler_workers=None, search_radius=None):
+    # Convert all Pairs In-Process Unless Kepler Workers (or workers.POOLED) were
+    # Provided. Planets & Stars Share One Backend if Only the First is Given.
+    kep_p, kep_s = (None, None) if kepler_workers == None else kepler_workers
+    with workers.use_kepler(kep_p, converter=converter) as kep_p, \
+         workers.use_kepler(kep_p if kep_s is None else kep_s, converter=converter) as kep_s:
+        # Seperate Out Planets and Stars from Bodies
+        stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+        num_stars, num_planets = len(stars), len(planets)
+        # Initialize the Dictionary that Contains all Planetary Systems
+        systems = {}
+        if num_stars == 0:
+            return systems
+        # Check to See Which Stellar Systems are Part of a Binary, Testing Only the
+        # Stars Close Enough to be Bound (Found via a KD-Tree, see util.get_BoundRadius).
+        # Note: Things get complicated if it is ...
+        s_index, o_index, distance = util.get_HostCandidates(stars, stars, search_radius,
+                                                             include_nearest=False, exclude_self=True)
+        a_s, e_s, P_s, Ta_s, Ma_s = orbits.get_PairElements(stars, stars, s_index, o_index, kepler_worker=kep_s)
+        r_apo = a_s*(1.0+e_s)
+        HillR = util.calc_HillRadius(a_s, e_s, stars.mass[o_index], stars.mass[s_index])
+        isHeirarchical = (e_s < 1.0) & (HillR >= r_apo)
+        noStellarHeirarchy = np.bincount(s_index[isHeirarchical], minlength=num_stars) == 0
+        # Find the Bound Planets Among Those Close Enough to Each Star to be Bound
+        h_index, p_index, distance = util.get_HostCandidates(stars, planets, search_radius)
+        a_p, e_p, P_p, Ta_p, Ma_p = orbits.get_PairElements(stars, planets, h_index, p_index, kepler_worker=kep_p)
+        # Keep the Host Each Planet is Most Bound to (Lowest Eccentricity)
+        bound = np.flatnonzero(e_p < 1.0)
+        bound = bound[np.lexsort((e_p[bound], p_index[bound]))]
+        best = bound[np.unique(p_index[bound], return_index=True)[1]]
+        # Handling for Planetary Systems in Stellar Heirarchical Structures
+        # Note: This is empty for now, maybe consider doing it by the heaviest bound stellar object as the primary.
+        best = best[noStellarHeirarchy[h_index[best]]]
+        best = best[np.argsort(h_index[best], kind='stable')]
+        if len(best) > 0:
+            # Get Additional Information on Orbit
+            hosted_planets = planets[p_index[best]]
+            hosted_planets.semimajor_axis = a_p[best]
+            hosted_planets.eccentricity = e_p[best]
+            hosted_planets.period = P_p[best]
+            hosted_planets.true_anomaly = Ta_p[best]
+            hosted_planets.mean_anomaly = Ma_p[best]
+        host_bounds = np.searchsorted(h_index[best], np.arange(num_stars+1))
+        for index, star in enumerate(stars):
+            system_id = star.id
+            current_system = systems.setdefault(system_id, Particles())
+            current_system.add_particle(star)
+            # Add the Planets to the System Set
+            system_planets = p_index[best[host_bounds[index]:host_bounds[index+1]]]
+            if len(system_planets) > 0:
+                current_system.add_particles(planets[system_planets])
+        return systems
 
 # Note: The below function is nearly identical to the above function. However,
 #       it is to be used for determining "clumps" of systems for the CutOrAdvance
 #       function primarily. ~ Joe G. 4/1/20
 # Note: This was updated to deal with stars who are bound but not mutually their
 #       respected closest neighbours. ~ Joe G. 8/21/20
-def get_heirarchical_systems_from_set(bodies, kepler_workers=None, converter=None, RelativePosition=False):
-    # Initialize Kepler
-    if kepler_workers == None:
-        if converter == None:
-            converter = nbody_system.nbody_to_si(bodies.mass.sum(), 2 * np.max(bodies.radius.number) | bodies.radius.unit)
-        kep_p = Kepler(unit_converter = converter, redirection = 'none')
-        kep_p.initialize_code()
-        kep_s = Kepler(unit_converter = converter, redirection = 'none')
-        kep_s.initialize_code()
-    else:
-        kep_p = kepler_workers[0]
-        kep_s = kepler_workers[1]
-    # Seperate Out Planets and Stars from Bodies
-    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
-    num_stars, num_planets = len(stars), len(planets)
-    # Initialize the Dictionary that Contains all Planetary Systems
-    systems = {}
-    # Initialize the List Used to Check Star IDs Against Already Classified Binaries
-    binary_ids = []
-    # Find Nearest Neighbors of the Set
-    closest_neighbours = stars.nearest_neighbour()
-    # Start Looping Through Stars to Find Bound Planets
-    for index, star in enumerate(stars):
-        # If the star is already in Binary_IDs, just go to the next star.
-        if star.id in binary_ids:
-            continue
-        # If not, Set the System ID and Set-up Data Structure.
-        system_id = star.id
-        current_system = systems.setdefault(system_id, Particles())
-        current_system.add_particle(star)
-        noStellarHierarchy = False
-        # If there is only one stars, there is obviously no stellar heirarchy in
-        # the encounter that is occuring.
-        if len(stars) == 1:
-            noStellarHierarchy = True
-        if not noStellarHierarchy:
-            # Check to see if the Nearest Neighbor is Mutual
-            star_neighbour_id = closest_neighbours[index].id
-            neighbour_neighbour_id = closest_neighbours[stars.id == star_neighbour_id].id[0]
-            for other_star in (stars-star):
-                # Check to see if the two stars are bound.
-                kep_s.initialize_from_dyn(star.mass + other_star.mass, star.x - other_star.x, star.y - other_star.y, star.z - other_star.z,
-                                      star.vx - other_star.vx, star.vy - other_star.vy, star.vz - other_star.vz)
-                a_s, e_s = kep_s.get_elements()
-                print(star.id, other_star.id, e_s)
-                # If they ARE NOT bound ...
-                if e_s >= 1.0:
-                    noStellarHierarchy = True
-                # If they ARE bound ...
-                else:
-                    # If the star is the star's neighbour's neighbour and visa-versa, then proceed.
-                    print(star.id, other_star.id, star_neighbour_id, neighbour_neighbour_id)
-                    if star.id == neighbour_neighbour_id and other_star.id == star_neighbour_id:
-                        noStellarHierarchy = False
-                        print("Binary composed of Star", star.id, "and Star", other_star.id, "has been detected!")
-                        current_system.add_particle(other_star)
-                        binary_ids.append(star.id)
-                        binary_ids.append(other_star.id)
-                    else:
-                        print("!!! Alert: Bound Stars are not closest neighbours ...")
-                        print("!!! Current Star:", star.id,"| Other Star:", other_star.id)
-                        print("!!! CS's Neighbour:", star_neighbour_id, \
-                              "| CS's Neighbour's Neighbour:", neighbour_neighbour_id)
-    checked_planet_ids = []
-    for KeyID in systems.keys():
-        current_system = systems[KeyID]
-        sys_stars = util.get_stars(current_system)
-        noStellarHierarchy = False
-        # If there is only one stars, there is obviously no stellar heirarchy in
-        # the encounter that is occuring.
-        if len(sys_stars) == 1:
-            noStellarHierarchy = True
-        for planet in planets:
-            if planet.id in checked_planet_ids:
-                continue
-            star = sys_stars[sys_stars.id == KeyID][0]
-            total_mass = star.mass + planet.mass
-            kep_pos = star.position - planet.position
-            kep_vel = star.velocity - planet.velocity
-            kep_p.initialize_from_dyn(total_mass, kep_pos[0], kep_pos[1], kep_pos[2], kep_vel[0], kep_vel[1], kep_vel[2])
-            a_p, e_p = kep_p.get_elements()
-            P_p =  kep_p.get_period()
-            Ta_p, Ma_p = kep_p.get_angles()
-            host_star_id = star.id
-            if e_p < 1.0:
-                # Check to See if The Planetary System is tied to a Stellar Binary
-                # Note: Things get complicated if it is ...
-                if noStellarHierarchy:
-                    # Get Additional Information on Orbit
-                    planet.semimajor_axis = a_p
-                    planet.eccentricity = e_p
-                    planet.period = P_p
-                    planet.true_anomaly = Ta_p
-                    planet.mean_anomaly = Ma_p
-                    planet.host_star = star.id
-                    # Add the Planet to the System Set
-                    current_system.add_particle(planet)
-                else:
-                    # Handling for Planetary Systems in Stellar Heirarchical Structures
-                    # Note: We check to see which other star in the current systems
-                    #       have a better boundness with the planet and choose that
-                    #       as the new host star.
-                    for other_star in sys_stars-star:
-                        total_mass = other_star.mass + planet.mass
-                        kep_pos = other_star.position - planet.position
-                        kep_vel = other_star.velocity - planet.velocity
-                        kep_p.initialize_from_dyn(total_mass, kep_pos[0], kep_pos[1], kep_pos[2], kep_vel[0], kep_vel[1], kep_vel[2])
-                        a_p2, e_p2 = kep_p.get_elements()
-                        # Check to see if the planet is more bound to 'star' or
-                        # 'other_star'. If its more bound to 'other_star',
-                        # set the attributes to the more bound object. This will
-                        # replace *_p with the better values with each loop.
-                        if e_p2 < e_p:
-                            a_p = a_p2
-                            e_p = e_p2
-                            P_p =  kep_p.get_period()
-                            Ta_p, Ma_p = kep_p.get_angles()
-                            host_star_id = other_star.id
-                    planet.semimajor_axis = a_p
-                    planet.eccentricity = e_p
-                    planet.period = P_p
-                    planet.true_anomaly = Ta_p
-                    planet.mean_anomaly = Ma_p
-                    planet.host_star = host_star_id
-                    # Add the Planet to the System Set
-                    current_system.add_particle(planet)
-                checked_planet_ids.append(planet.id)
-            elif not noStellarHierarchy:
-                # Handling for Planetary Systems in Stellar Heirarchical Structures
-                # Note: We check to see which other star in the current systems
-                #       have a better boundness with the planet and choose that
-                #       as the new host star.
-                for other_star in sys_stars-star:
-                    total_mass = other_star.mass + planet.mass
-                    kep_pos = other_star.position - planet.position
-                    kep_vel = other_star.velocity - planet.velocity
-                    kep_p.initialize_from_dyn(total_mass, kep_pos[0], kep_pos[1], kep_pos[2], kep_vel[0], kep_vel[1], kep_vel[2])
-                    a_p2, e_p2 = kep_p.get_elements()
-                    # Check to see if the planet is more bound to 'star' or
-                    # 'other_star'. If its more bound to 'other_star',
-                    # set the attributes to the more bound object. This will
-                    # replace *_p with the better values with each loop.
-                    if e_p2 < e_p:
-                        a_p = a_p2
-                        e_p = e_p2
-                        P_p =  kep_p.get_period()
-                        Ta_p, Ma_p = kep_p.get_angles()
-                        host_star_id = other_star.id
-                planet.semimajor_axis = a_p
-                planet.eccentricity = e_p
-                planet.period = P_p
-                planet.true_anomaly = Ta_p
-                planet.mean_anomaly = Ma_p
-                planet.host_star = host_star_id
-                # Add the Planet to the System Set
-                current_system.add_particle(planet)
-            else:
-                print("!!! Alert: Planet is not bound nor is it bound to any other star.")
-    if kepler_workers == None:
-        kep_p.stop()
-        kep_s.stop()
-    return systems
+@instrument.timed("stellar_systems.get_heirarchical_systems_from_set")
+def get_heirarchical_systems_from_set(bodies, kepler_workers=None, converter=None, RelativePosition=False, search_radius=None):
+    # Convert all Pairs In-Process Unless Kepler Workers (or workers.POOLED) were
+    # Provided. Planets & Stars Share One Backend if Only the First is Given.
+    kep_p, kep_s = (None, None) if kepler_workers == None else kepler_workers
+    with workers.use_kepler(kep_p, converter=converter) as kep_p, \
+         workers.use_kepler(kep_p if kep_s is None else kep_s, converter=converter) as kep_s:
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        # Seperate Out Planets and Stars from Bodies
+        stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+        num_stars, num_planets = len(stars), len(planets)
+        # Initialize the Dictionary that Contains all Planetary Systems
+        systems = {}
+        if num_stars == 0:
+            return systems
+        # Find Every Bound Pair of Stars, Testing Only the Stars Close Enough to be
+        # Bound (plus its Nearest Neighbour, Found via a KD-Tree)
+        s_index, o_index, distance = util.get_HostCandidates(stars, stars, search_radius,
+                                                             include_nearest=True, exclude_self=True)
+        a_s, e_s, P_s, Ta_s, Ma_s = orbits.get_PairElements(stars, stars, s_index, o_index, kepler_worker=kep_s)
+        isBound = e_s < 1.0
+        # Chains of Bound Pairs Form the Stellar Heirarchies (Binaries, Triples, ...)
+        # Note: Bound stars don't need to be mutually their closest neighbours.
+        bound_pairs = coo_matrix((np.ones(np.count_nonzero(isBound)), (s_index[isBound], o_index[isBound])),
+                                 shape=(num_stars, num_stars))
+        num_systems, system_index = connected_components(bound_pairs, directed=False)
+        # Number the Systems by their First Star, Whose ID Keys the System
+        first_star = np.full(num_systems, num_stars)
+        np.minimum.at(first_star, system_index, np.arange(num_stars))
+        system_rank = np.empty(num_systems, dtype=int)
+        system_rank[np.argsort(first_star)] = np.arange(num_systems)
+        system_index = system_rank[system_index]
+        system_ids = stars.id[np.sort(first_star)]
+        # Find the Bound Planets Among Those Close Enough to Each Star to be Bound
+        h_index, p_index, distance = util.get_HostCandidates(stars, planets, search_radius)
+        a_p, e_p, P_p, Ta_p, Ma_p = orbits.get_PairElements(stars, planets, h_index, p_index, kepler_worker=kep_p)
+        # Keep the Host Each Planet is Most Bound to (Lowest Eccentricity)
+        bound = np.flatnonzero(e_p < 1.0)
+        bound = bound[np.lexsort((e_p[bound], p_index[bound]))]
+        best = bound[np.unique(p_index[bound], return_index=True)[1]]
+        if len(best) < num_planets:
+            logger.warning("%d Planets are not bound to any star.", num_planets-len(best))
+        if len(best) > 0:
+            # Get Additional Information on Orbit
+            hosted_planets = planets[p_index[best]]
+            hosted_planets.semimajor_axis = a_p[best]
+            hosted_planets.eccentricity = e_p[best]
+            hosted_planets.period = P_p[best]
+            hosted_planets.true_anomaly = Ta_p[best]
+            hosted_planets.mean_anomaly = Ma_p[best]
+            hosted_planets.host_star = stars.id[h_index[best]]
+        # Order the Stars, then the Planets, of every System Together
+        members = Particles()
+        members.add_particles(stars)
+        members.add_particles(planets[p_index[best]])
+        member_system = np.concatenate([system_index, system_index[h_index[best]]])
+        member_order = np.argsort(member_system, kind='stable')
+        member_bounds = np.searchsorted(member_system[member_order], np.arange(num_systems+1))
+        for index in range(num_systems):
+            current_system = systems.setdefault(system_ids[index], Particles())
+            current_system.add_particles(members[member_order[member_bounds[index]:member_bounds[index+1]]])
+        return systems
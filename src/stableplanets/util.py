@@ -8,12 +8,13 @@
 # Importing Necessary System Packages
 import sys, os, math
 import numpy as np
-import matplotlib as plt
 import time as tp
 import hashlib
 
 import time
 import datetime
+import threading
+import warnings
 
 # Importing cPickle/Pickle
 try:
@@ -22,16 +23,21 @@ except:
    import pickle
 
 # Import the Amuse Base Packages
+# Note: SciPy's KD-Tree & the IMF Generators are Imported where they are Used,
+#       and SSE is Started via the Worker Pool, so Importing StablePlanets Stays Fast.
 from amuse import datamodel
+from amuse.datamodel import Particles, Particle
 from amuse.units import nbody_system
 from amuse.units import units
 from amuse.units import constants
 from amuse.datamodel import particle_attributes
-from amuse.io import *
-from amuse.lab import *
 
-from amuse.ic.brokenimf import MultiplePartIMF
-from amuse.community.sse.interface import SSE
+from stableplanets import workers
+from stableplanets import orbits
+from stableplanets import stellar_grid
+from stableplanets import instrument
+
+logger = instrument.get_Logger(__name__)
 
 # ------------------------------------- #
 #           Defining Functions          #
@@ -71,43 +77,86 @@ def store_ic(converter, options):
     #ic_array[0].IBF = options.IBF
     return ic_array[0]
 
-def preform_EulerRotation(particle_set):
-    ''' Preforms a randomly oriented Euler Transformation to a set of AMUSE Particles.
-        particle_set: AMUSE particle set which it will preform the transform on.
+def get_ArvoRotationMatrices(num_rotations, random_state=None):
+    ''' Generates uniformly distributed random rotation matrices in one batch.
+        num_rotations: The number of independent rotations, K.
+        random_state: The numpy RandomState drawn from (Defaults to np.random).
+
+        Returns an array of rotation matrices, shaped (K, 3, 3).
 
         !! Based on James Arvo's 1996 "Fast Random Rotation Matrices"
         !! https://pdfs.semanticscholar.org/04f3/beeee1ce89b9adf17a6fabde1221a328dbad.pdf
     '''
+    if random_state is None:
+        random_state = np.random
 # First: Generate the three Uniformly Distributed Numbers (Two Angles, One Decimal)
-    n_1 = np.random.uniform(0.0, math.pi*2.0)
-    n_2 = np.random.uniform(0.0, math.pi*2.0)
-    n_3 = np.random.uniform(0.0, 1.0)
+    n_1 = random_state.uniform(0.0, math.pi*2.0, num_rotations)
+    n_2 = random_state.uniform(0.0, math.pi*2.0, num_rotations)
+    n_3 = random_state.uniform(0.0, 1.0, num_rotations)
 # Second: Calculate Matrix & Vector Values
-    c1 = np.cos(n_1)
-    c2 = np.cos(n_2)
-    s1 = np.sin(n_1)
-    s2 = np.sin(n_2)
+    c1, s1 = np.cos(n_1), np.sin(n_1)
+    c2, s2 = np.cos(n_2), np.sin(n_2)
     r3 = np.sqrt(n_3)
-    R = [[  c1,  s1, 0.0],
-         [ -s1,  c1, 0.0],
-         [ 0.0, 0.0, 1.0]]
-    V = [[c2*r3],
-         [s2*r3],
-         [np.sqrt(1-n_3)]]
-# Third: Create the Rotation Matrix
-
-    # This was the old rotation matrix calculation...
-    #rotate = (np.outer(V, V) - np.dot(np.eye(3),(R)))
+    R = np.zeros((num_rotations, 3, 3))
+    R[:, 0, 0], R[:, 0, 1] = c1, s1
+    R[:, 1, 0], R[:, 1, 1] = -s1, c1
+    R[:, 2, 2] = 1.0
+    V = np.stack([c2*r3, s2*r3, np.sqrt(1-n_3)], axis=-1)
+# Third: Create the Rotation Matrices, M = (2VV^T - I)R
+    return 2*np.matmul(V[:, :, None]*V[:, None, :], R) - R
+
+def apply_Rotation(particle_set, rotation, system_index=None, center=None):
+    ''' Rotates the positions & velocities of a whole AMUSE particle set at once.
+        particle_set: AMUSE particle set which it will preform the rotation on.
+        rotation: A single (3, 3) rotation matrix, or K matrices shaped (K, 3, 3).
+        system_index: With K matrices, the matrix used for each particle.
+        center: AMUSE particle set of the points (one per matrix) to rotate
+                about, keeping their velocities (Defaults to the origin).
+    '''
+    rotation = np.asarray(rotation, dtype=float)
+    if rotation.ndim == 3:
+        rotation = rotation[system_index]
+    for attribute in ["position", "velocity"]:
+        vectors = getattr(particle_set, attribute)
+        unit = vectors.unit
+        vectors = vectors.value_in(unit)
+        if center is not None:
+            offset = getattr(center, attribute).value_in(unit)
+            offset = offset if system_index is None else offset[system_index]
+            vectors = vectors - offset
+        vectors = np.matmul(rotation, vectors[..., None])[..., 0]
+        if center is not None:
+            vectors = vectors + offset
+        setattr(particle_set, attribute, vectors | unit)
 
-    # But here is the new one which more correctly implements the equations from the paper referenced above...
-    rotate = (2 * np.dot(np.outer(V, V), R) - np.dot(np.eye(3), R))
+def preform_EulerRotation(particle_set):
+    ''' Preforms a randomly oriented Euler Transformation to a set of AMUSE Particles.
+        particle_set: AMUSE particle set which it will preform the transform on.
 
-# Forth: Preform the Rotation & Update the Particle
-    for particle in particle_set:
-        pos = np.matrix(([[particle.x.number], [particle.y.number], [particle.z.number]]))
-        vel = np.matrix(([[particle.vx.number], [particle.vy.number], [particle.vz.number]]))
-        particle.position = np.dot(rotate,pos) | particle.position.unit  # nbody_system.length
-        particle.velocity = np.dot(rotate,vel)  | particle.velocity.unit
+        !! See get_ArvoRotationMatrices for the construction of the matrix.
+    '''
+    rotate = get_ArvoRotationMatrices(1)[0]
+    apply_Rotation(particle_set, rotate)
+    return rotate
+
+def preform_BatchEulerRotation(particle_set, system_index, num_systems=None, hosts=None, random_state=None):
+    ''' Preforms independent, randomly oriented Euler Transformations to many
+        systems held in one set of AMUSE Particles, in a single batched call.
+        particle_set: AMUSE particle set holding every system's particles.
+        system_index: The system (0 to K-1) each particle belongs to.
+        num_systems: The number of systems, K (Defaults to max(system_index)+1).
+        hosts: AMUSE particle set of each system's host to rotate about.
+        random_state: The numpy RandomState drawn from (Defaults to np.random).
+
+        Returns the (K, 3, 3) rotation matrices applied.
+    '''
+    system_index = np.asarray(system_index, dtype=int)
+    if num_systems is None:
+        num_systems = system_index.max()+1 if len(system_index) else 0
+    rotations = get_ArvoRotationMatrices(num_systems, random_state)
+    if len(system_index) > 0:
+        apply_Rotation(particle_set, rotations, system_index, center=hosts)
+    return rotations
 
 
 def calc_HillRadius(a, e, m_planet, m_star):
@@ -166,6 +215,7 @@ def new_truncated_kroupa(number_of_stars, **kwargs):
     """
     min_mass = kwargs.get("min_mass", 0.1)
     max_mass = kwargs.get("max_mass", 10)
+    from amuse.ic.brokenimf import MultiplePartIMF
     return MultiplePartIMF(
         mass_boundaries = [min_mass, 0.08, 0.5, max_mass] | units.MSun,
         alphas = [-0.3, -1.3, -2.3], random=True
@@ -184,31 +234,145 @@ def get_planets(bodies):
     planets = bodies[bodies.mass <= limiting_mass_for_planets]
     return planets
 
-SMALLN = None
+# The Most Candidate Pairs Gathered at Once by get_HostCandidates
+MAX_CANDIDATES = 2**22
+
+def get_BoundRadius(stars, bodies, exclude_self=False):
+    ''' Returns, for each star, the largest separation (in AU) at which any of the
+        bodies could still be bound to it. A bound pair needs r < 2G(M+m)/|dv|^2,
+        which is largest for the heaviest body at the smallest relative speed,
+        so no bound pair lies beyond it. Stars co-moving with a body get inf.
+        exclude_self: Skip each star itself when the bodies include the stars.
+    '''
+    from scipy.spatial import cKDTree
+    star_vel = stars.velocity.value_in(units.kms)
+    body_vel = bodies.velocity.value_in(units.kms)
+    # Query Two Neighbours so Bodies that are also Stars can Skip Themselves
+    num_neighbours = min(2, len(bodies)) if exclude_self else 1
+    speed, nearest = cKDTree(body_vel).query(star_vel, k=num_neighbours)
+    speed, nearest = speed.reshape(len(stars), -1), nearest.reshape(len(stars), -1)
+    min_speed = speed[:, 0]
+    if exclude_self:
+        # A Star Whose Only Body is Itself has No Candidates
+        is_self = bodies.key[nearest[:, 0]] == stars.key
+        min_speed = np.where(is_self, speed[:, -1] if nearest.shape[1] > 1 else np.inf, min_speed)
+    G = constants.G.value_in(units.AU*units.kms**2/units.MSun)
+    max_mass = stars.mass.value_in(units.MSun) + bodies.mass.max().value_in(units.MSun)
+    with np.errstate(divide='ignore'):
+        # Pad the Limit so Round-Off can't Drop a Marginally Bound Pair
+        return (1.0 + 1e-9)*2.0*G*max_mass/min_speed**2
+
+def get_HostCandidates(stars, bodies, search_radius=None, include_nearest=True, exclude_self=False):
+    ''' Uses a KD-Tree of the bodies to find the plausible hosts of each body.
+        stars: The AMUSE particle set of potential hosts.
+        bodies: The AMUSE particle set of bodies needing a host.
+        search_radius: Radius around each star to search. By default, every pair
+                       passing the two-body energy test is a candidate, as when
+                       checking every star, found via a KD-tree in position &
+                       one in velocity. Pass e.g. stars.radius for a tighter search.
+        include_nearest: Always include each body's nearest star as a candidate.
+        exclude_self: Drop pairs where the star and body are the same particle.
+
+        Returns the star indices, body indices and distances (in AU) of every
+        candidate pair, sorted by body and then by distance.
+    '''
+    if len(stars) == 0 or len(bodies) == 0:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+    from scipy.spatial import cKDTree
+    star_pos = stars.position.value_in(units.AU)
+    body_pos = bodies.position.value_in(units.AU)
+    body_tree = cKDTree(body_pos)
+    bound_only = search_radius is None
+    if bound_only:
+        star_vel, body_vel = stars.velocity.value_in(units.kms), bodies.velocity.value_in(units.kms)
+        star_mass, body_mass = stars.mass.value_in(units.MSun), bodies.mass.value_in(units.MSun)
+        G = constants.G.value_in(units.AU*units.kms**2/units.MSun)
+        capacity = (1.0 + 1e-9)*2.0*G*(star_mass + body_mass.max())
+        # A Bound Pair is Either Within R of the Star, or Beyond R & Slower than
+        # sqrt(2G(M+m)/R) Relative to it. R is Chosen to Balance the Two Searches.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread = body_pos.var(axis=0).sum()/body_vel.var(axis=0).sum()
+        spread = spread if np.isfinite(spread) else np.inf
+        search_radius = np.minimum((capacity*spread)**(1./3.), get_BoundRadius(stars, bodies, exclude_self))
+        with np.errstate(divide='ignore'):
+            speed_radius = np.sqrt(capacity/search_radius)
+        velocity_tree = cKDTree(body_vel)
+    else:
+        search_radius = np.broadcast_to(search_radius.value_in(units.AU), len(stars))
+    # Gather the Pairs a Block of Stars at a Time, so Loose Radii can't Exhaust Memory
+    counts = body_tree.query_ball_point(star_pos, search_radius, return_length=True)
+    if bound_only:
+        counts = counts + velocity_tree.query_ball_point(star_vel, speed_radius, return_length=True)
+    offsets = np.append(0, np.cumsum(counts))
+    blocks, start = [], 0
+    while start < len(stars):
+        stop = max(start+1, np.searchsorted(offsets, offsets[start]+MAX_CANDIDATES, side='right')-1)
+        neighbours = body_tree.query_ball_point(star_pos[start:stop], search_radius[start:stop])
+        if bound_only:
+            slow = velocity_tree.query_ball_point(star_vel[start:stop], speed_radius[start:stop])
+            neighbours = [near + fast for near, fast in zip(neighbours, slow)]
+        star_index = np.repeat(np.arange(start, stop), [len(found) for found in neighbours])
+        body_index = np.fromiter((j for found in neighbours for j in found), dtype=int, count=len(star_index))
+        if bound_only:
+            # Keep the Pairs Passing the Two-Body Energy Test (Padded for Round-Off)
+            r = np.sqrt(((star_pos[star_index] - body_pos[body_index])**2).sum(axis=1))
+            v2 = ((star_vel[star_index] - body_vel[body_index])**2).sum(axis=1)
+            bound = r*v2 < (1.0 + 1e-9)*2.0*G*(star_mass[star_index] + body_mass[body_index])
+            unique = np.unique(star_index[bound]*len(bodies) + body_index[bound])
+            star_index, body_index = unique//len(bodies), unique % len(bodies)
+        blocks.append((star_index, body_index))
+        start = stop
+    star_index = np.concatenate([block[0] for block in blocks]).astype(int)
+    body_index = np.concatenate([block[1] for block in blocks]).astype(int)
+    distance = np.sqrt(((star_pos[star_index] - body_pos[body_index])**2).sum(axis=1))
+    if include_nearest:
+        # Query Two Neighbours so Bodies that are also Stars can Skip Themselves
+        num_neighbours = min(2, len(stars)) if exclude_self else 1
+        nearest_dist, nearest_star = cKDTree(star_pos).query(body_pos, k=num_neighbours)
+        nearest_dist, nearest_star = nearest_dist.reshape(len(bodies), -1), nearest_star.reshape(len(bodies), -1)
+        body_ids = np.repeat(np.arange(len(bodies)), nearest_star.shape[1])
+        star_index = np.concatenate([star_index, nearest_star.ravel()])
+        body_index = np.concatenate([body_index, body_ids])
+        distance = np.concatenate([distance, nearest_dist.ravel()])
+        unique = np.unique(body_index*len(stars) + star_index, return_index=True)[1]
+        star_index, body_index, distance = star_index[unique], body_index[unique], distance[unique]
+    if exclude_self:
+        not_self = stars.key[star_index] != bodies.key[body_index]
+        star_index, body_index, distance = star_index[not_self], body_index[not_self], distance[not_self]
+    order = np.lexsort((distance, body_index))
+    return star_index[order], body_index[order], distance[order]
+
+# Each Thread Holds its Own SmallN Instance, Borrowed from the Worker Pool
+SMALLN_THREADS = threading.local()
+
+def __getattr__(name):
+    # util.SMALLN is Still the (Calling Thread's) SmallN Instance, or None
+    if name == 'SMALLN':
+        return getattr(SMALLN_THREADS, 'worker', None)
+    raise AttributeError("module "+repr(__name__)+" has no attribute "+repr(name))
+
 # Creates a New SmallN Instance by Resetting the Previous
 def new_smalln():
-    SMALLN.reset()
-    return SMALLN
+    workers.reset_smalln(SMALLN_THREADS.worker)
+    return SMALLN_THREADS.worker
 
 # Initalizes a SmallN Instance
 def init_smalln(unit_converter = None):
-    global SMALLN
-    if unit_converter is None:
-        SMALLN = SmallN(redirection="none")
-    else:
-        SMALLN = SmallN(redirection="none", convert_nbody=unit_converter)
-    SMALLN.parameters.timestep_parameter = 0.05
+    SMALLN_THREADS.pool = workers.get_pool('smalln', unit_converter)
+    SMALLN_THREADS.worker = SMALLN_THREADS.pool.acquire()
 
+# Returns the SmallN Instance to the Pool, Where it Stays Warm for the Next User
 def stop_smalln():
-    SMALLN.stop()
+    SMALLN_THREADS.pool.release(SMALLN_THREADS.worker)
+    del SMALLN_THREADS.worker
 
-def check_isOver(bodies, smallN_worker=None):
+def check_isOver(bodies, smallN_worker=None, converter=None):
     if smallN_worker == None:
-        smallN_worker = SmallN(redirection = 'none', convert_nbody = converter)
-        smallN_worker.initialize_code()
-        smallN_worker.parameters.set_defaults()
-        smallN_worker.parameters.allow_full_unperturbed = 0
+        with workers.borrow_smalln(converter=converter) as smallN_worker:
+            smallN_worker.parameters.allow_full_unperturbed = 0
+            return check_isOver(bodies, smallN_worker=smallN_worker)
     stars = get_stars(bodies.copy())
+    instrument.count("smalln_calls")
     smallN_worker.reset()
     smallN_worker.particles.add_particles(stars)
     smallN_worker.commit_particles()
@@ -222,75 +386,55 @@ def fix_kepler_vector(x, y, z):
     return [x.number, y.number, z.number] | x.unit
 
 def ensure_approaching_binary(primary, secondary, kepler_worker=None):
-    # Create Binary System for Kepler to Initialize
-    system = Particles()
-    system.add_particle(primary)
-    system.add_particle(secondary)
-    if kepler_worker == None:
-        SmallScaleConverter = nbody_system.nbody_to_si(2*np.mean(system.mass),
-                                                       2*np.mean(system.radius))
-        kep = Kepler(unit_converter = SmallScaleConverter, redirection = 'none')
-    else:
-        kep = kepler_worker
+    ''' Moves bound pairs to where they are approaching each other at a separation
+        of one semimajor axis, keeping each pair's CoM position & velocity.
+        primary, secondary: AMUSE Particles (or matching Particle Sets) of each pair.
+        kepler_worker: Deprecated & ignored, as the new state is found in closed form.
+    '''
+    if kepler_worker is not None:
+        warnings.warn("ensure_approaching_binary no longer uses a Kepler worker; "
+                      "the kepler_worker argument is ignored.", DeprecationWarning, stacklevel=2)
     # Set the Binary System to Center of Mass
-    rCM = system.center_of_mass()
-    vCM = system.center_of_mass_velocity()
-    mT = system.total_mass()
-    # Initialize Kepler with Binary System
-    kep.initialize_from_particles(system)
-    #print(kep.get_angles())
-    # Move System to Periastron, Then to Apastron
-    kep.advance_to_periastron()
-    #print(kep.get_angles())
-    kep.advance_to_apastron()
-    #print(kep.get_angles())
-    # Move System to Approaching Position
-    a, e = kep.get_elements()
-    kep.advance_to_radius(a)
-    #print(kep.get_angles())
+    m1, m2 = primary.mass, secondary.mass
+    mT = m1 + m2
+    rCM = (m1*primary.position.T + m2*secondary.position.T)/mT
+    vCM = (m1*primary.velocity.T + m2*secondary.velocity.T)/mT
     # Get the Seperation Vectors at Approaching Position
-    rx_sep, ry_sep, rz_sep = kep.get_separation_vector()
-    vx_sep, vy_sep, vz_sep = kep.get_velocity_vector()
-    r_sep = fix_kepler_vector(rx_sep, ry_sep, rz_sep)
-    v_sep = fix_kepler_vector(vx_sep, vy_sep, vz_sep)
+    mu = (constants.G*mT).value_in(units.m**3/units.s**2)
+    r_sep, v_sep = orbits.calc_ApproachingState(mu, (secondary.position - primary.position).value_in(units.m),
+                                                (secondary.velocity - primary.velocity).value_in(units.m/units.s))
+    r_sep = r_sep.T.reshape(rCM.shape) | units.m
+    v_sep = v_sep.T.reshape(vCM.shape) | units.m/units.s
     # Set the Primary & Secondary to be in the Correct Positions
-    primary.position = rCM + secondary.mass/mT*r_sep
-    primary.velocity = vCM + secondary.mass/mT*v_sep
-    secondary.position = rCM - primary.mass/mT*r_sep
-    secondary.velocity = vCM - primary.mass/mT*v_sep
-    if kepler_worker == None:
-        kep.stop()
+    primary.position = (rCM - m2/mT*r_sep).T
+    primary.velocity = (vCM - m2/mT*v_sep).T
+    secondary.position = (rCM + m1/mT*r_sep).T
+    secondary.velocity = (vCM + m1/mT*v_sep).T
     return primary, secondary
 
 
-def get_stellar_radius(star, SEVCode = None):
-    if SEVCode == None:
-        sev_code = SSE()
-    else:
-        sev_code = SEVCode
-    temp_star = Particle()
-    temp_star.mass = star.mass
-    temp_star.age = star.time
-    sev_code.particles.add_particle(temp_star)
-    sev_code.model_time = star.time
-    sev_code.evolve_model(star.time)
-    radius = sev_code.particles[0].radius
-    print(radius, sev_code.particles[0].age)
+def get_stellar_radius(star, SEVCode = None, **kwargs):
+    ''' Returns the radius of a star (or of every star in a set) at its age, star.time.
+        SEVCode: Optional SSE worker to evolve the stars with directly. Otherwise the
+                 cached stellar-property grid is interpolated, falling back to a
+                 pooled SSE worker (see stellar_grid.StellarGrid.get_Properties).
+        Any other keyword arguments are passed on to get_Properties.
+    '''
     if SEVCode == None:
-        sev_code.stop()
-    else:
-        sev_code.particles.remove_particle(temp_star)
-    return radius
+        return stellar_grid.get_StellarGrid().get_Radius(star.mass, star.time, **kwargs)
+    radius = stellar_grid.evolve_SSE(star.mass.value_in(units.MSun), star.time.value_in(units.Myr),
+                                     sse_worker=SEVCode)['radius']
+    return radius | units.RSun
 
 def resolve_supernova(supernova_detection, bodies, time):
     # Drawn from gravity_stellar_eventdriven.py in AMUSE Textbook
     if supernova_detection.is_set():
-        print("At time=", time.in_(units.Myr), \
-              len(supernova_detection.particles(0)), 'supernova(e) detected')
+        logger.info("At time=%s %d supernova(e) detected", time.in_(units.Myr),
+                    len(supernova_detection.particles(0)))
 
         Nsn = 0
         for ci in range(len(supernova_detection.particles(0))):
-            print(supernova_detection.particles(0))
+            logger.debug("%s", supernova_detection.particles(0))
             particles_in_supernova \
                 = Particles(particles=supernova_detection.particles(0))
             natal_kick_x = particles_in_supernova.natal_kick_x
@@ -304,4 +448,4 @@ def resolve_supernova(supernova_detection, bodies, time):
             particles_in_supernova.vz += natal_kick_z
             Nsn += 1
 
-        print('Resolved', Nsn, 'supernova(e)')
+        logger.info("Resolved %d supernova(e)", Nsn)
@@ -0,0 +1,232 @@
+# Python Classes/Functions containing the Community-Code Worker Pool for StablePlanets
+# Keep This Class Unitless!
+
+# ------------------------------------- #
+#        Python Package Importing       #
+# ------------------------------------- #
+
+# Importing Necessary System Packages
+import os
+import atexit
+import threading
+from contextlib import contextmanager
+
+# Import the Amuse Base Packages
+from amuse.units import nbody_system
+from amuse.units import units
+
+from stableplanets import orbits
+from stableplanets import instrument
+
+# ------------------------------------- #
+#           Defining Functions          #
+# ------------------------------------- #
+
+# The Default Number of Warm Workers Kept per Pool
+POOL_SIZE = int(os.environ.get("STABLEPLANETS_POOL_SIZE", 4))
+
+def new_kepler(converter=None):
+    ''' Starts a Kepler worker. Kepler works in double precision on a single
+        pair, so without a converter a generic (1 MSun, 1 AU) scaling is used.
+    '''
+    from amuse.community.kepler.interface import Kepler
+    if converter is None:
+        converter = nbody_system.nbody_to_si(1 | units.MSun, 1 | units.AU)
+    kep = Kepler(unit_converter = converter, redirection = 'none')
+    kep.initialize_code()
+    return kep
+
+def new_smalln(converter=None):
+    ''' Starts a SmallN worker with StablePlanets' default parameters.'''
+    from amuse.community.smalln.interface import SmallN
+    if converter is None:
+        smalln = SmallN(redirection="none")
+    else:
+        smalln = SmallN(redirection="none", convert_nbody=converter)
+    smalln.parameters.timestep_parameter = 0.05
+    return smalln
+
+def reset_smalln(smalln):
+    smalln.reset()
+    smalln.parameters.set_defaults()
+    smalln.parameters.timestep_parameter = 0.05
+
+def new_sse(converter=None):
+    ''' Starts an SSE worker. SSE is unit-aware, so the converter is unused.'''
+    from amuse.community.sse.interface import SSE
+    return SSE()
+
+def reset_sse(sse):
+    sse.particles.remove_particles(sse.particles)
+    sse.parameters.set_defaults()
+
+# Kepler's State is Fully Replaced by each initialize_from_* Call, so it Needs no Reset.
+CODES = {'kepler': (new_kepler, None),
+         'smalln': (new_smalln, reset_smalln),
+         'sse': (new_sse, reset_sse)}
+
+class WorkerPool():
+    ''' Keeps up to max_workers warm community-code workers alive and hands them
+        out one caller at a time. Safe to share between threads; each process
+        (including forked children) gets its own workers.
+        factory: Function starting a new worker.
+        reset: Function clearing a worker's state before it is reused.
+        max_workers: The number of workers allowed to be alive at once.
+        name: The code's name, used to label its metrics (see instrument).
+    '''
+    def __init__(self, factory, reset=None, max_workers=POOL_SIZE, name="worker"):
+        self.factory = factory
+        self.name = name
+        self.reset = reset
+        self.max_workers = max_workers
+        self.idle = []
+        self.num_alive = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        ''' Returns an idle worker, starting one if allowed, otherwise waits.'''
+        with self.condition:
+            while not self.idle and self.num_alive >= self.max_workers:
+                self.condition.wait()
+            instrument.count(self.name+"_borrows")
+            if self.idle:
+                return self.idle.pop()
+            self.num_alive += 1
+        try:
+            instrument.count(self.name+"_starts")
+            with instrument.stage("workers.start_"+self.name):
+                return self.factory()
+        except:
+            with self.condition:
+                self.num_alive -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, worker, broken=False):
+        ''' Resets a worker and returns it to the pool. Broken workers are stopped.'''
+        if not broken and self.reset is not None:
+            try:
+                self.reset(worker)
+            except:
+                broken = True
+        if broken:
+            try:
+                worker.stop()
+            except:
+                pass
+        with self.condition:
+            if broken:
+                self.num_alive -= 1
+            else:
+                self.idle.append(worker)
+            self.condition.notify()
+
+    @contextmanager
+    def worker(self):
+        ''' Context manager lending out a worker. If the caller raises, the worker
+            is assumed to be in an unknown state and is replaced.
+        '''
+        worker = self.acquire()
+        try:
+            yield worker
+        except:
+            self.release(worker, broken=True)
+            raise
+        self.release(worker)
+
+    def stop(self):
+        ''' Stops all idle workers.'''
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.num_alive -= len(idle)
+        for worker in idle:
+            try:
+                worker.stop()
+            except:
+                pass
+
+POOLS = {}
+POOLS_LOCK = threading.Lock()
+
+def get_converter_key(converter):
+    if converter is None:
+        return None
+    return tuple(str(value) for value in converter.values)
+
+def get_pool(code, converter=None, max_workers=None):
+    ''' Returns the process-wide pool of the given code ('kepler', 'smalln' or 'sse')
+        for the given unit converter, creating it on first use.
+    '''
+    key = (code, get_converter_key(converter))
+    with POOLS_LOCK:
+        if key not in POOLS:
+            factory, reset = CODES[code]
+            POOLS[key] = WorkerPool(lambda: factory(converter), reset,
+                                    max_workers=max_workers or POOL_SIZE, name=code)
+        return POOLS[key]
+
+@contextmanager
+def borrow_kepler(kepler_worker=None, converter=None):
+    ''' Yields kepler_worker if one is provided, otherwise borrows a warm Kepler
+        worker from the pool for the duration of the with-block.
+    '''
+    if kepler_worker is not None:
+        yield kepler_worker
+        return
+    with get_pool('kepler', converter).worker() as kep:
+        yield kep
+
+# Pass as a kepler_worker to Ask for a Warm Kepler Worker from the Pool
+POOLED = 'pool'
+
+@contextmanager
+def use_kepler(kepler_worker=None, converter=None):
+    ''' Yields the Kepler backend for the duration of the with-block: kepler_worker
+        if one is provided, a warm Kepler worker borrowed from the pool if it is
+        POOLED, and otherwise an in-process orbits.NumpyKepler, which converts
+        whole particle sets at once without starting a worker.
+    '''
+    if isinstance(kepler_worker, str) and kepler_worker == POOLED:
+        with borrow_kepler(converter=converter) as kep:
+            yield kep
+        return
+    yield orbits.NumpyKepler(converter) if kepler_worker is None else kepler_worker
+
+@contextmanager
+def borrow_smalln(smalln_worker=None, converter=None):
+    ''' Yields smalln_worker if one is provided, otherwise borrows a freshly
+        reset SmallN worker from the pool for the duration of the with-block.
+    '''
+    if smalln_worker is not None:
+        yield smalln_worker
+        return
+    with get_pool('smalln', converter).worker() as smalln:
+        yield smalln
+
+@contextmanager
+def borrow_sse(sse_worker=None):
+    ''' Yields sse_worker if one is provided, otherwise borrows a freshly
+        reset SSE worker from the pool for the duration of the with-block.
+    '''
+    if sse_worker is not None:
+        yield sse_worker
+        return
+    with get_pool('sse').worker() as sse:
+        yield sse
+
+def stop_all():
+    ''' Stops every idle worker of every pool in this process.'''
+    with POOLS_LOCK:
+        pools = list(POOLS.values())
+    for pool in pools:
+        pool.stop()
+
+def reset_after_fork():
+    # A Forked Child Can't Talk to its Parent's Workers, so Start Afresh
+    global POOLS, POOLS_LOCK
+    POOLS = {}
+    POOLS_LOCK = threading.Lock()
+
+atexit.register(stop_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
@@ -0,0 +1,5 @@
+# Lets the Tests Import StablePlanets from a Source Checkout Without Installing It
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
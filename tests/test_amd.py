@@ -0,0 +1,120 @@
+# Tests of the Batch AMD-Stability Engine Against PlanetarySystem's Per-Pair Calculation
+
+import numpy as np
+import pytest
+
+from amuse.datamodel import Particles
+from amuse.units import units
+
+from stableplanets import amd
+from stableplanets import stellar_systems
+
+def new_System(stellar_mass, semimajor_axes, masses, eccentricities):
+    host_star = Particles(1)[0]
+    host_star.mass = stellar_mass | units.MSun
+    planets = Particles(len(semimajor_axes))
+    planets.semimajor_axis = semimajor_axes | units.AU
+    planets.mass = masses | units.MJupiter
+    planets.eccentricity = eccentricities
+    return stellar_systems.PlanetarySystem(host_star, planets)
+
+def get_PairBetas(system):
+    beta = np.array([system.get_AMDBeta(i) for i in range(system.number_of_planets)], dtype=float)
+    return beta, np.asarray(system.planets.stability_type)
+
+def get_BatchBetas(system, permutation):
+    # Feed the Batch Engine the Planets Out of Order, then Undo the Shuffle
+    planets = system.planets
+    beta, stability_type = amd.get_BatchBetaValues(planets.period.value_in(units.day)[permutation],
+                                                   planets.mass.value_in(units.MSun)[permutation],
+                                                   planets.eccentricity[permutation],
+                                                   [system.host_star.mass.value_in(units.MSun)], [0])
+    order = np.argsort(permutation)
+    return beta[order], stability_type[order]
+
+@pytest.mark.parametrize("seed", range(5))
+def test_BatchBetaValues_matches_PlanetarySystem(seed):
+    rs = np.random.RandomState(seed)
+    num_planets = rs.randint(2, 7)
+    system = new_System(rs.uniform(0.5, 1.5), np.sort(10**rs.uniform(-1, 1.5, num_planets)),
+                        10**rs.uniform(-2, 1, num_planets), rs.uniform(0, 0.3, num_planets))
+    beta, stability_type = get_PairBetas(system)
+    batch_beta, batch_type = get_BatchBetas(system, rs.permutation(num_planets))
+    np.testing.assert_allclose(batch_beta, beta, rtol=1e-10)
+    np.testing.assert_array_equal(batch_type, stability_type)
+
+def test_NearlyCoincidentOrbits_pair_by_semimajor_axis():
+    # The Outer (Heavier) Planet has the Shorter Period, so Period Order Disagrees with a
+    system = new_System(1.79, np.array([3.14527, 3.14569]), np.array([0.0108, 1.21]), np.array([0.05, 0.02]))
+    periods = system.planets.period.value_in(units.day)
+    assert periods[1] < periods[0]
+    beta, stability_type = get_PairBetas(system)
+    for permutation in ([0, 1], [1, 0]):
+        batch_beta, batch_type = get_BatchBetas(system, np.array(permutation))
+        np.testing.assert_allclose(batch_beta, beta, rtol=1e-10)
+        np.testing.assert_array_equal(batch_type, stability_type)
+    system.get_SystemBetaValues()
+    np.testing.assert_allclose(system.planets.AMDBeta, beta, rtol=1e-10)
+
+def test_NonPositiveHillCritC_falls_back_to_Laskar():
+    alpha, gamma, epsilon = 0.9999, 0.01, 1e-3
+    assert amd.get_BatchHillCritC(alpha, gamma, epsilon) <= 0.0
+    periods = np.array([1.0, alpha**-1.5])
+    beta, stability_type = amd.get_BatchBetaValues(periods, [gamma*epsilon/(1+gamma), epsilon/(1+gamma)],
+                                                   [0.01, 0.01], [1.0], [0])
+    assert beta[1] >= 0.0
+    assert stability_type[1] in ('Collision', 'MMR')
+
+def test_MassivePair_without_equation_99_root_is_Unclassified():
+    # A Pair Heavier than ~0.14 of its Star Leaves equation_99 Without a Root
+    system = new_System(1.0, np.array([1.0, 1.05]), np.array([100.0, 100.0]), np.array([0.1, 0.1]))
+    beta, stability_type = get_PairBetas(system)
+    assert np.isnan(beta[1]) and stability_type[1] == 'Unclassified'
+    batch_beta, batch_type = get_BatchBetas(system, np.array([1, 0]))
+    np.testing.assert_allclose(batch_beta, beta, rtol=1e-10)
+    np.testing.assert_array_equal(batch_type, stability_type)
+
+@pytest.mark.filterwarnings("error::RuntimeWarning")
+def test_ZeroLaskarCritC_gives_infinite_beta_without_warnings():
+    # Nearly Coincident Orbits Fail the Hill Test & Sit Inside the MMR-Overlap Zone
+    system = new_System(1.0, np.array([1.0, 1.0001]), np.array([0.01, 1.0]), np.array([0.01, 0.01]))
+    assert system.get_Hill_CritC(1) <= 0.0 and system.get_Laskar_CritC(1) == 0.0
+    beta, stability_type = get_PairBetas(system)
+    assert np.isinf(beta[1]) and stability_type[1] == 'MMR'
+    batch_beta, batch_type = get_BatchBetas(system, np.array([1, 0]))
+    np.testing.assert_allclose(batch_beta, beta, rtol=1e-10)
+    np.testing.assert_array_equal(batch_type, stability_type)
+
+def new_Sample(seed, errors=0.1, **kwargs):
+    rs = np.random.RandomState(7)
+    num_planets = 12
+    periods = np.sort(10**rs.uniform(0, 3, num_planets))
+    masses = 10**rs.uniform(-6, -3, num_planets)
+    eccentricities = rs.uniform(0, 0.3, num_planets)
+    stellar_masses, offsets = rs.uniform(0.5, 1.5, 3), [0, 4, 7]
+    point_beta, _ = amd.get_BatchBetaValues(periods, masses, eccentricities, stellar_masses, offsets)
+    beta_quantiles, prob_stable = amd.sample_BatchBetaValues(periods, masses, eccentricities, stellar_masses, offsets,
+                                                             num_draws=200, seed=seed,
+                                                             period_errs=(errors*periods, errors*periods),
+                                                             mass_errs=(errors*masses, errors*masses),
+                                                             ecc_errs=(0.5*errors, 0.5*errors), **kwargs)
+    return point_beta, beta_quantiles, prob_stable
+
+def test_sample_BatchBetaValues_is_reproducible_from_its_seed():
+    _, beta_quantiles, prob_stable = new_Sample(seed=42)
+    _, same_quantiles, same_prob = new_Sample(seed=42)
+    _, other_quantiles, _ = new_Sample(seed=43)
+    np.testing.assert_array_equal(same_quantiles, beta_quantiles)
+    np.testing.assert_array_equal(same_prob, prob_stable)
+    assert not np.array_equal(other_quantiles, beta_quantiles)
+
+def test_sample_BatchBetaValues_collapses_to_point_beta_without_errors():
+    point_beta, beta_quantiles, prob_stable = new_Sample(seed=0, errors=0.0)
+    np.testing.assert_allclose(beta_quantiles, np.repeat(point_beta[:, None], 3, axis=1), rtol=1e-12)
+    np.testing.assert_array_equal(prob_stable, (point_beta < 1.0).astype(float))
+
+@pytest.mark.filterwarnings("error::RuntimeWarning")
+def test_CoincidentPeriods_classify_without_warnings():
+    periods, masses = np.array([100.0, 100.0]), np.array([1e-3, 1e-3])
+    beta, stability_type = amd.get_BatchBetaValues(periods, masses, [0.01, 0.01], [1.0], [0])
+    assert np.isinf(beta[1]) and stability_type[1] == 'MMR'
@@ -0,0 +1,50 @@
+# Tests of the On-Disk Catalog Cache: Round-Trips, Expiry & Publication
+
+import os
+import numpy as np
+from astropy.table import Table, MaskedColumn
+
+from stableplanets import cache
+
+def new_Table(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    mass = MaskedColumn(rng.uniform(0.1, 10.0, num_rows), mask=rng.random(num_rows) < 0.3, unit='jupiterMass')
+    names = np.array(["pl-%d" % i for i in range(num_rows)], dtype=object)
+    return Table([names, mass, rng.integers(1, 5, num_rows)], names=['pl_name', 'pl_bmassj', 'sy_pnum'])
+
+def test_CachedTable_round_trip(tmp_path):
+    table = new_Table(50)
+    cache.write_CachedTable(table, "key", str(tmp_path), query="select")
+    cached = cache.read_CachedTable("key", cache_dir=str(tmp_path))
+    assert cached.colnames == table.colnames
+    assert list(cached['pl_name']) == list(table['pl_name'])
+    assert np.array_equal(cached['pl_bmassj'].mask, table['pl_bmassj'].mask)
+    assert np.array_equal(cached['pl_bmassj'].filled(0.0), table['pl_bmassj'].filled(0.0))
+    assert np.array_equal(cached['sy_pnum'], table['sy_pnum'])
+    assert cached['pl_bmassj'].unit == table['pl_bmassj'].unit
+    assert cache.get_CacheMeta("key", str(tmp_path))['query'] == "select"
+
+def test_CachedTable_expires_after_ttl(tmp_path, monkeypatch):
+    cache.write_CachedTable(new_Table(5), "key", str(tmp_path))
+    created = cache.get_CacheMeta("key", str(tmp_path))['created']
+    monkeypatch.setattr(cache.time, 'time', lambda: created + 100.0)
+    assert cache.read_CachedTable("key", ttl=200.0, cache_dir=str(tmp_path)) is not None
+    assert cache.read_CachedTable("key", ttl=50.0, cache_dir=str(tmp_path)) is None
+    assert cache.read_CachedTable("key", cache_dir=str(tmp_path)) is not None
+    assert cache.read_CachedTable("missing", cache_dir=str(tmp_path)) is None
+
+def test_CachedTable_rewrite_replaces_every_file(tmp_path):
+    cache.write_CachedTable(new_Table(50), "key", str(tmp_path))
+    old_meta = cache.get_CacheMeta("key", str(tmp_path))
+    cache.write_CachedTable(new_Table(7, seed=1), "key", str(tmp_path))
+    assert len(cache.read_CachedTable("key", cache_dir=str(tmp_path))) == 7
+    for path in cache.get_CachePaths("key", str(tmp_path), old_meta['version'])[:2]:
+        assert not os.path.exists(path)
+    assert sorted(os.listdir(str(tmp_path))) == sorted(os.path.basename(path) for path in
+        cache.get_CachePaths("key", str(tmp_path), cache.get_CacheMeta("key", str(tmp_path))['version']))
+
+def test_CachedTable_rejects_mismatched_files(tmp_path):
+    cache.write_CachedTable(new_Table(50), "key", str(tmp_path))
+    _, mask_path, _ = cache.get_CachePaths("key", str(tmp_path), cache.get_CacheMeta("key", str(tmp_path))['version'])
+    np.save(mask_path, np.ma.getmaskarray(Table(new_Table(7), masked=True).as_array()))
+    assert cache.read_CachedTable("key", cache_dir=str(tmp_path)) is None
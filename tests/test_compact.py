@@ -0,0 +1,120 @@
+# Tests of the Compact Systems' Parity with PlanetarySystem & the Stability Pipeline
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from amuse.datamodel import Particles
+from amuse.units import units
+
+from stableplanets import amd
+from stableplanets import compact
+from stableplanets import pipeline
+from stableplanets import stellar_systems
+
+def new_System(stellar_mass, semimajor_axes, masses, eccentricities, uncertainties=None):
+    host_star = Particles(1)[0]
+    host_star.mass = stellar_mass | units.MSun
+    planets = Particles(len(semimajor_axes))
+    planets.semimajor_axis = semimajor_axes | units.AU
+    planets.mass = masses | units.MJupiter
+    planets.eccentricity = eccentricities
+    return stellar_systems.PlanetarySystem(host_star, planets, uncertainties=uncertainties)
+
+def new_RandomSystem(seed):
+    # Planets are Provided Out of Order, with Ranges in the Order Provided
+    rs = np.random.RandomState(seed)
+    num_planets = rs.randint(2, 7)
+    semimajor_axes = 10**rs.uniform(-1, 1.5, num_planets)
+    masses = 10**rs.uniform(-2, 1, num_planets)
+    eccentricities = rs.uniform(0, 0.3, num_planets)
+    stellar_mass = rs.uniform(0.5, 1.5)
+    periods = 365.25*np.sqrt(semimajor_axes**3/(stellar_mass + masses*amd.MJUPITER_IN_MSUN))
+    uncertainties = {'pl_orbper': (0.99*periods, 1.01*periods), 'pl_bmassj': (0.8*masses, 1.3*masses),
+                     'pl_orbeccen': (np.maximum(eccentricities - 0.05, 0), eccentricities + 0.05),
+                     'st_mass': (0.9*stellar_mass, 1.1*stellar_mass)}
+    return new_System(stellar_mass, semimajor_axes, masses, eccentricities, uncertainties)
+
+def get_PairBetas(system):
+    beta = np.array([system.get_AMDBeta(i) for i in range(system.number_of_planets)], dtype=float)
+    return beta, np.asarray(system.stability_type if isinstance(system, compact.CompactPlanetarySystem)
+                            else system.planets.stability_type)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_CompactPlanetarySystem_matches_PlanetarySystem(seed):
+    system = new_RandomSystem(seed)
+    compact_system = compact.CompactPlanetarySystem.from_PlanetarySystem(system)
+    np.testing.assert_allclose(compact_system.period, system.planets.period.value_in(units.day), rtol=1e-12)
+    beta, stability_type = get_PairBetas(system)
+    pair_beta, pair_type = get_PairBetas(compact_system)
+    np.testing.assert_allclose(pair_beta, beta, rtol=1e-10)
+    np.testing.assert_array_equal(pair_type, stability_type)
+    np.testing.assert_allclose(compact_system.get_SystemBetaValues(), beta, rtol=1e-10)
+    np.testing.assert_array_equal(compact_system.stability_type, stability_type)
+    for expected, result in zip(system.get_SystemBetaDistribution(200, seed=seed),
+                                compact_system.get_SystemBetaDistribution(200, seed=seed)):
+        np.testing.assert_allclose(result, expected, rtol=1e-10)
+    round_trip = compact_system.to_PlanetarySystem()
+    np.testing.assert_allclose(round_trip.planets.semimajor_axis.value_in(units.AU),
+                               system.planets.semimajor_axis.value_in(units.AU), rtol=1e-10)
+
+def test_NearlyCoincidentOrbits_sort_by_semimajor_axis():
+    # The Outer (Heavier) Planet has the Shorter Period, so Period Order Disagrees with a
+    system = new_System(1.79, np.array([3.14527, 3.14569]), np.array([0.0108, 1.21]), np.array([0.05, 0.02]))
+    beta, stability_type = get_PairBetas(system)
+    planets = system.planets
+    arrays = [planets.period.value_in(units.day)[::-1], planets.mass.value_in(units.MSun)[::-1],
+              planets.eccentricity[::-1]]
+    compact_systems = [compact.CompactPlanetarySystem.from_PlanetarySystem(system),
+                       compact.CompactPlanetarySystem(1.79, *arrays)]
+    compact_systems.append(compact.CompactSystemSet([1.79], [0], *arrays)[0])
+    for compact_system in compact_systems:
+        np.testing.assert_allclose(compact_system.mass, planets.mass.value_in(units.MSun), rtol=1e-12)
+        np.testing.assert_allclose(get_PairBetas(compact_system)[0], beta, rtol=1e-10)
+        np.testing.assert_allclose(compact_system.get_SystemBetaValues(), beta, rtol=1e-10)
+        np.testing.assert_array_equal(compact_system.stability_type, stability_type)
+
+def test_NonPositiveHillCritC_falls_back_to_Laskar():
+    alpha, gamma, epsilon = 0.9999, 0.01, 1e-3
+    system = compact.CompactPlanetarySystem(1.0, [1.0, alpha**-1.5], [gamma*epsilon/(1+gamma), epsilon/(1+gamma)],
+                                            [0.01, 0.01])
+    beta, stability_type = get_PairBetas(system)
+    assert beta[1] >= 0.0 and stability_type[1] in ('Collision', 'MMR')
+    np.testing.assert_allclose(system.get_SystemBetaValues(), beta, rtol=1e-10)
+    np.testing.assert_array_equal(system.stability_type, stability_type)
+
+def new_Catalog(num_systems, seed=0):
+    rs = np.random.RandomState(seed)
+    counts = rs.randint(1, 7, num_systems)
+    system = np.repeat(np.arange(num_systems), counts)
+    num_rows = len(system)
+    catalog = Table({'hostname': np.char.add("Star-", system.astype(str)),
+                     'pl_name': np.char.add("Planet-", np.arange(num_rows).astype(str)),
+                     'st_mass': rs.uniform(0.5, 1.5, num_systems)[system], 'pl_orbper': 10**rs.uniform(0, 3, num_rows),
+                     'pl_bmassj': 10**rs.uniform(-2, 1, num_rows), 'pl_orbeccen': rs.uniform(0, 0.3, num_rows)})
+    return catalog.group_by('hostname')
+
+def test_CompactSystemSet_matches_the_pipeline():
+    catalog = new_Catalog(300)
+    systems = compact.CompactSystemSet.from_Catalog(catalog)
+    beta = systems.get_SystemBetaValues()
+    results = pipeline.run_StabilityPipeline(catalog, num_workers=1, chunk_size=50)
+    np.testing.assert_allclose(beta, np.asarray(results['beta'])[systems.rows], rtol=1e-10)
+    np.testing.assert_array_equal(systems.stability_type, np.asarray(results['stability_type'])[systems.rows])
+    # Each System, as a View or Built on its Own, Gives the Same Results
+    for index in range(0, len(systems), 37):
+        system = systems[index]
+        p0, p1 = systems.offsets[index], systems.offsets[index+1]
+        assert np.shares_memory(system.period, systems.period)
+        np.testing.assert_allclose(system.AMDBeta, beta[p0:p1], rtol=1e-12)
+        alone = compact.CompactPlanetarySystem(system.stellar_mass, system.period[::-1], system.mass[::-1],
+                                               system.eccentricity[::-1])
+        np.testing.assert_allclose(alone.get_SystemBetaValues(), beta[p0:p1], rtol=1e-10)
+        np.testing.assert_allclose(get_PairBetas(alone)[0], beta[p0:p1], rtol=1e-10)
+
+def test_CompactSystemSet_from_Systems_matches_each_system():
+    systems = [new_RandomSystem(seed) for seed in range(6)]
+    compact_set = compact.CompactSystemSet.from_Systems(systems)
+    beta = compact_set.get_SystemBetaValues()
+    for system, p0, p1 in zip(systems, compact_set.offsets[:-1], compact_set.offsets[1:]):
+        np.testing.assert_allclose(beta[p0:p1], get_PairBetas(system)[0], rtol=1e-10)
@@ -0,0 +1,129 @@
+# Tests of the Batched Binary Parameters & Planetary-System Initial Conditions
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from amuse.datamodel import Particles
+from amuse.units import units
+from amuse.units import constants
+
+from stableplanets import orbits
+from stableplanets.legacy import create
+
+def test_Sana_periods_stay_in_the_fitted_range():
+    # Pmin Defaults to 0.1 Days, Below the Range Fit by Sana et al. (2012)
+    random_state = np.random.RandomState(0)
+    _, _, _, period, _ = create.draw_BinaryParameters(np.full(5000, 40.) | units.MSun, SanaP=True, RagP=False,
+                                                      random_state=random_state)
+    logP = np.log10(period.value_in(units.day))
+    assert np.all(np.isfinite(logP))
+    assert logP.min() >= 0.15 and logP.max() <= 5.5
+    # f(logP) ~ logP^-0.55, so logP^0.45 is Uniform Between the Range's Ends
+    uniform = (logP**0.45 - 0.15**0.45)/(5.5**0.45 - 0.15**0.45)
+    assert stats.kstest(uniform, 'uniform').pvalue > 1e-3
+
+def test_Sana_periods_need_an_overlapping_range():
+    with pytest.raises(ValueError):
+        create.draw_BinaryParameters(np.full(5, 40.) | units.MSun, SanaP=True, RagP=False,
+                                     Pmax_perturber=np.ones(5), random_state=np.random.RandomState(0))
+
+def new_Hosts(num_hosts, seed=0):
+    rs = np.random.RandomState(seed)
+    hosts = Particles(num_hosts)
+    hosts.id = np.arange(1, num_hosts+1)
+    hosts.mass = rs.uniform(0.5, 2.0, num_hosts) | units.MSun
+    hosts.position = rs.normal(0.0, 1e4, (num_hosts, 3)) | units.AU
+    hosts.velocity = rs.normal(0.0, 1.0, (num_hosts, 3)) | units.kms
+    return hosts
+
+def get_RelativeElements(hosts, planets):
+    host_index = np.searchsorted(np.asarray(hosts.id), np.asarray(planets.host_star))
+    rel_pos = planets.position - hosts.position[host_index]
+    rel_vel = planets.velocity - hosts.velocity[host_index]
+    a, e, _, _, _ = orbits.get_OrbitalElements(hosts.mass[host_index] + planets.mass, rel_pos, rel_vel)
+    radial = (rel_pos.value_in(units.AU)*rel_vel.value_in(units.kms)).sum(axis=1)
+    return a, e, rel_pos.lengths(), radial
+
+def test_approaching_planets_keep_their_orbits():
+    num_planets = 200
+    true_anomalies = np.linspace(-np.pi, np.pi, num_planets, endpoint=False) + 0.01
+    masses = np.full(num_planets, 1.0) | units.MJupiter
+    semimajor_axes = np.linspace(1.0, 30.0, num_planets) | units.AU
+    eccentricities = np.linspace(0.01, 0.9, num_planets)
+    states = []
+    for approaching in (False, True):
+        hosts = new_Hosts(num_planets)
+        planets = create.new_planets_from_elements(hosts, np.arange(num_planets), masses, semimajor_axes,
+                                                   eccentricities, true_anomalies=true_anomalies,
+                                                   approaching=approaching, random_state=np.random.RandomState(1))
+        states.append(get_RelativeElements(hosts, planets))
+    (_, _, separation, radial), (a, e, approaching_separation, approaching_radial) = states
+    assert np.all(approaching_radial < 0)
+    assert np.any(radial > 0)
+    np.testing.assert_allclose(a.value_in(units.AU), semimajor_axes.value_in(units.AU), rtol=1e-8)
+    np.testing.assert_allclose(e, eccentricities, rtol=1e-8)
+    np.testing.assert_allclose(approaching_separation.value_in(units.AU), separation.value_in(units.AU), rtol=1e-10)
+
+def test_planetary_systems_warn_about_ignored_kepler_worker():
+    hosts = new_Hosts(4)
+    with pytest.warns(DeprecationWarning, match="kepler_worker"):
+        create.planetary_systems_v2(hosts, 2, kepler_worker=object())
+    with pytest.warns(DeprecationWarning, match="kepler_worker"):
+        planets = create.new_planetary_systems(hosts, ["Jupiter"], kepler_worker=object())
+    assert len(planets) == len(hosts)
+
+def new_Cluster(num_stars, seed=0):
+    rs = np.random.RandomState(seed)
+    stars = Particles(num_stars)
+    # A Few Massive Stars Among Many Light Ones, so Both Search Branches Find Perturbers
+    stars.mass = np.where(rs.uniform(0, 1, num_stars) < 0.08, rs.uniform(20, 80, num_stars),
+                          rs.uniform(0.1, 2.0, num_stars)) | units.MSun
+    stars.position = rs.normal(0.0, 1e5, (num_stars, 3)) | units.AU
+    return stars
+
+def get_BruteForcePerturbers(centers, stars, perturbation_limit=0.02, eccentricity=0.0):
+    distances = np.linalg.norm(centers.position.value_in(units.AU)[:, None] - stars.position.value_in(units.AU)[None],
+                               axis=2)
+    with np.errstate(divide='ignore'):
+        pert = stars.mass.value_in(units.MSun)[None]/distances**3
+    pert[np.asarray(centers.key)[:, None] == np.asarray(stars.key)[None]] = 0.0
+    perturber = np.argmax(pert, axis=1)
+    G = constants.G.value_in(units.AU**3/(units.MSun*units.day**2))
+    best = pert[np.arange(len(centers)), perturber]
+    return 2*np.pi*np.sqrt(perturbation_limit/(G*(1+eccentricity)**3*best)), perturber
+
+@pytest.mark.parametrize("num_heavy, num_neighbours", [(32, 16), (0, 1), (5, 2)])
+def test_MaxPeriodsFromPerturbers_match_brute_force(num_heavy, num_neighbours):
+    stars = new_Cluster(600)
+    outsiders = Particles(40)
+    outsiders.position = np.random.RandomState(1).normal(0.0, 1e5, (40, 3)) | units.AU
+    eccentricity = np.linspace(0.0, 0.9, 40)
+    heavy = np.argsort(stars.mass.value_in(units.MSun))[::-1][:32]
+    found_heavy, found_light = False, False
+    for centers, e in [(stars[::10], 0.3), (outsiders, eccentricity)]:
+        P_max, perturber = create.get_MaxPeriodsFromPerturbers(centers, stars, eccentricity=e, num_heavy=num_heavy,
+                                                               num_neighbours=num_neighbours)
+        expected_P, expected_perturber = get_BruteForcePerturbers(centers, stars, eccentricity=e)
+        np.testing.assert_array_equal(perturber, expected_perturber)
+        np.testing.assert_allclose(P_max.value_in(units.day), expected_P, rtol=1e-12)
+        found_heavy |= np.isin(perturber, heavy).any()
+        found_light |= (~np.isin(perturber, heavy)).any()
+    assert found_heavy and found_light
+
+def get_BaselineMaxPeriod(center_of_mass, particle_set, perturbation_limit=0.02, eccentricity=0.0):
+    # The Original Per-Binary Formula, Measuring the Distance to Every Other Star
+    other_stars = particle_set - center_of_mass
+    distances = (other_stars.position - center_of_mass.position).lengths()
+    pert = other_stars.mass/distances**3
+    index = np.where(pert == max(pert))[0]
+    P_max_Squared = (4*np.pi**2*distances[index]**3*perturbation_limit)/(constants.G*(1+eccentricity)**3*other_stars[index].mass)
+    return np.sqrt(P_max_Squared)[0]
+
+def test_max_period_from_perturber_matches_the_baseline_formula():
+    stars = new_Cluster(300, seed=2)
+    for i, e in zip(range(0, 300, 17), np.linspace(0.0, 0.8, 18)):
+        P_max = create.set_max_period_from_perturber(stars[i], stars, eccentricity=e, perturbation_limit=0.05,
+                                                     verbose=(i == 0))
+        expected = get_BaselineMaxPeriod(stars[i], stars, perturbation_limit=0.05, eccentricity=e)
+        np.testing.assert_allclose(P_max.value_in(units.day), expected.value_in(units.day), rtol=1e-10)
@@ -0,0 +1,118 @@
+# Tests of the Logging & Run Metrics Against Uninstrumented Runs
+
+import logging
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from amuse.datamodel import Particles
+from amuse.units import units
+from amuse.units import constants
+
+from stableplanets import amd
+from stableplanets import io
+from stableplanets import orbits
+from stableplanets import util
+from stableplanets import instrument
+from stableplanets import stellar_systems
+from stableplanets.legacy import create
+
+class LoopKepler():
+    ''' A Kepler worker stand-in (not a NumpyKepler), converting one pair per call.'''
+    def __init__(self):
+        self.kepler = orbits.NumpyKepler()
+    def __getattr__(self, name):
+        return getattr(self.kepler, name)
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(instrument, 'ENABLED', True)
+    instrument.reset_Metrics()
+    yield instrument.COUNTERS
+    instrument.reset_Metrics()
+
+def new_Bodies():
+    # Two Stars, a Planet Bound to the First & a Planet Bound to Neither
+    bodies = Particles(4)
+    bodies.mass = [1, 0.5, 0.001, 0.001] | units.MSun
+    bodies.radius = 1 | units.AU
+    bodies.position = [[0, 0, 0], [1000, 0, 0], [5, 0, 0], [500, 0, 0]] | units.AU
+    speed = (constants.G*(1.001 | units.MSun)/(5 | units.AU)).sqrt().value_in(units.kms)
+    bodies.velocity = [[0, 0, 0], [0, 0.5, 0], [0, speed, 0], [0, 0, 50]] | units.kms
+    bodies.type = ["star", "star", "planet", "planet"]
+    bodies.id = [1, 2, 3, 4]
+    return bodies
+
+def write_Catalog(path, num_systems=20, seed=0):
+    rs = np.random.RandomState(seed)
+    system = np.repeat(np.arange(num_systems), rs.randint(1, 5, num_systems))
+    table = Table({'hostname': np.char.add("Star-", system.astype(str)),
+                   'pl_name': np.char.add("Planet-", np.arange(len(system)).astype(str))})
+    for name in io.CLEAN_COLUMNS:
+        table[name] = rs.uniform(0.01, 0.2, len(system)) if name.endswith(('err1', 'err2')) else \
+                      rs.uniform(0.5, 1.5, num_systems)[system] if name.startswith('st_') else \
+                      rs.uniform(0.01, 0.3, len(system))
+    table['pl_orbper'] = 10**rs.uniform(0, 3, len(system))
+    table.write(path, format='csv')
+
+def test_hot_paths_print_nothing_while_logging_is_disabled(capsys, tmp_path):
+    bodies = new_Bodies()
+    stellar_systems.update_host_star(bodies)
+    stellar_systems.get_planetary_systems_from_set(bodies.copy())
+    systems = stellar_systems.get_heirarchical_systems_from_set(bodies.copy())
+    stellar_systems.get_periods(systems[1][0], util.get_planets(systems[1]))
+    create.set_max_period_from_perturber(bodies[0], util.get_stars(bodies), verbose=True)
+    path = str(tmp_path/"catalog.csv")
+    write_Catalog(path)
+    catalog = io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path, cache_dir=str(tmp_path/"cache"))
+    catalog.clean()
+    catalog.get_StabilityResults(num_workers=1)
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == ""
+
+def test_enable_Logging_sends_records_to_stderr_once(capsys):
+    logger = logging.getLogger(instrument.LOGGER_NAME)
+    handlers, level = list(logger.handlers), logger.level
+    try:
+        instrument.enable_Logging(logging.INFO)
+        instrument.enable_Logging(logging.INFO)
+        stellar_systems.get_heirarchical_systems_from_set(new_Bodies())
+        instrument.get_Logger("stableplanets.test").debug("Hidden below INFO.")
+    finally:
+        logger.handlers, logger.level = handlers, level
+    lines = capsys.readouterr().err.splitlines()
+    assert [line for line in lines if "not bound to any star" in line] == [lines[0]]
+    assert len(lines) == 1
+
+def test_metrics_are_left_untouched_while_disabled(monkeypatch):
+    monkeypatch.setattr(instrument, 'ENABLED', False)
+    instrument.reset_Metrics()
+    stellar_systems.get_heirarchical_systems_from_set(new_Bodies(), kepler_workers=(LoopKepler(), LoopKepler()))
+    amd.get_BatchBetaValues([10.0, 40.0], [1e-3, 1e-3], [0.1, 0.1], [1.0], [0])
+    assert instrument.get_Metrics() == {'counters': {}, 'stages': {}}
+
+def test_metrics_count_the_hot_paths(metrics):
+    bodies = new_Bodies()
+    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+    num_star_pairs = len(util.get_HostCandidates(stars, stars, include_nearest=True, exclude_self=True)[0])
+    num_planet_pairs = len(util.get_HostCandidates(stars, planets)[0])
+    stellar_systems.get_heirarchical_systems_from_set(bodies.copy(), kepler_workers=(LoopKepler(), LoopKepler()))
+    assert metrics['kepler_calls'] == num_star_pairs + num_planet_pairs
+    assert metrics['pairs_in_process'] == 0
+    stellar_systems.get_heirarchical_systems_from_set(bodies.copy())
+    assert metrics['kepler_calls'] == num_star_pairs + num_planet_pairs
+    assert metrics['pairs_in_process'] == num_star_pairs + num_planet_pairs
+    # Nearly Touching Orbits Fall Back to the Laskar Test, which Solves for its Roots
+    amd.get_BatchBetaValues([10.0, 10.5], [1e-3, 1e-3], [0.1, 0.1], [1.0], [0])
+    assert metrics['root_solves'] > 0 and metrics['root_iterations'] > 0
+    assert metrics['root_evaluations'] >= metrics['root_iterations']
+    report = instrument.get_Metrics()
+    assert report['stages']['amd.get_BatchBetaValues']['calls'] == 1
+    assert report['stages']['amd.get_BatchBetaValues']['total_time'] >= 0.0
+    text = instrument.get_ProfileReport(report)
+    assert all(name in text for name in list(report['stages']) + list(report['counters']))
+    # Merging a Worker's Metrics Adds them to this Process'
+    instrument.merge_Metrics(report)
+    assert metrics['kepler_calls'] == 2*report['counters']['kepler_calls']
+    assert instrument.get_Metrics()['stages']['amd.get_BatchBetaValues']['calls'] == 2
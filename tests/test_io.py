@@ -0,0 +1,145 @@
+# Tests of Streaming, Grouping & Filtering Catalogs Against Reading them Whole
+
+import numpy as np
+import pytest
+from astropy.io import ascii
+from astropy.table import Table, MaskedColumn, vstack
+
+from stableplanets import io
+
+def write_Catalog(path, num_systems, seed=0):
+    # Every Column of the Catalog, with Blank Masses & Radii in the First Rows,
+    # Whole-Numbered Periods Later On & One System Spanning Many Chunks
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(1, 7, num_systems)
+    counts[num_systems//2] = 300
+    system = np.repeat(np.arange(num_systems), counts)
+    num_rows = len(system)
+    table = Table(masked=True)
+    for name, dtype in io.CATALOG_DTYPES.items():
+        values = rng.uniform(0.5, 2.0, num_rows) if dtype is float else rng.integers(0, 2, num_rows)
+        table[name] = MaskedColumn(values, mask=rng.uniform(0, 1, num_rows) < 0.02)
+    table['hostname'] = MaskedColumn(np.char.add("Star-", system.astype(str)))
+    table['pl_name'] = MaskedColumn(np.char.add(table['hostname'].data.astype(str), np.arange(num_rows).astype(str)))
+    table['pl_bmassprov'] = MaskedColumn(np.full(num_rows, "Mass"), mask=np.arange(num_rows) < 200)
+    table['st_spectype'] = MaskedColumn(np.full(num_rows, "G2 V"))
+    table['pl_radj'].mask[:200] = True
+    table['pl_orbper'][num_rows//4:num_rows//2] = np.round(table['pl_orbper'][num_rows//4:num_rows//2]*10)
+    table.write(path, format='csv', overwrite=True)
+    return num_rows
+
+@pytest.mark.parametrize("impute", [False, True])
+def test_iter_CSVCatalog_matches_a_full_read(tmp_path, impute):
+    path = str(tmp_path/"catalog.csv")
+    write_Catalog(path, 200)
+    chunks = list(io.iter_CSVCatalog(path, chunk_bytes=4096, impute=impute))
+    assert len(chunks) > 10
+    streamed = vstack(chunks)
+    full = io.set_CatalogDtypes(ascii.read(path, format='csv', comment='#'))
+    if impute:
+        full = io.impute_MassRadius(full)
+    full = full[io.get_CleanMask(full)]
+    assert len(streamed) == len(full)
+    order = np.argsort(np.asarray(full['pl_name'], dtype=str), kind='stable')
+    streamed = streamed[np.argsort(np.asarray(streamed['pl_name'], dtype=str), kind='stable')]
+    for name, dtype in io.CATALOG_DTYPES.items():
+        assert streamed[name].dtype.kind == np.dtype(dtype).kind
+        expected = full[name][order]
+        assert np.array_equal(np.ma.getmaskarray(streamed[name]), np.ma.getmaskarray(expected))
+        unmasked = ~np.ma.getmaskarray(expected)
+        assert np.array_equal(np.ma.getdata(streamed[name])[unmasked], np.ma.getdata(expected)[unmasked])
+    # Every System is Yielded Whole, in a Single Chunk
+    hostnames = np.concatenate([np.unique(np.asarray(chunk['hostname'], dtype=str)) for chunk in chunks])
+    assert len(hostnames) == len(np.unique(hostnames))
+
+def test_iter_CSVCatalog_caps_the_carried_system(tmp_path):
+    path = str(tmp_path/"catalog.csv")
+    write_Catalog(path, 20)
+    with pytest.raises(ValueError):
+        list(io.iter_CSVCatalog(path, chunk_bytes=4096, max_system_rows=100))
+    assert len(vstack(list(io.iter_CSVCatalog(path, chunk_bytes=4096, max_system_rows=1000)))) > 0
+
+def test_filter_regroups_like_a_fresh_group_by(tmp_path):
+    path = str(tmp_path/"catalog.csv")
+    write_Catalog(path, 100)
+    catalog = io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path, cache_dir=str(tmp_path/"cache"))
+    rng = np.random.default_rng(1)
+    filtered = catalog.Catalog
+    for _ in range(3):
+        keep = rng.uniform(0, 1, len(filtered)) < 0.7
+        expected = filtered[keep].group_by('hostname')
+        filtered = catalog.filter(keep) if filtered is catalog.Catalog else io.filter_GroupedTable(filtered, keep)
+        assert np.array_equal(filtered.groups.indices, expected.groups.indices)
+        assert np.array_equal(filtered['pl_name'], expected['pl_name'])
+        first_rows = filtered.groups.indices[:-1]
+        assert np.array_equal(filtered['hostname'][first_rows], expected.groups.keys['hostname'])
+    assert len(io.filter_GroupedTable(filtered, np.zeros(len(filtered), dtype=bool)).groups.keys) == 0
+
+def test_catalog_without_hostnames_is_rejected(tmp_path):
+    path = str(tmp_path/"catalog.csv")
+    Table({'pl_name': ['a', 'b'], 'pl_orbper': [1.0, 2.0]}).write(path, format='csv')
+    with pytest.raises(ValueError, match="hostname"):
+        io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path, cache_dir=str(tmp_path/"cache"))
+
+def test_refresh_recomputes_only_modified_systems(tmp_path):
+    path, cache_dir = str(tmp_path/"catalog.csv"), str(tmp_path/"cache")
+    write_Catalog(path, 100)
+    # Keep Every Orbit Bound, so Each Beta is Defined
+    table = Table.read(path, format='csv')
+    table['pl_orbeccen'] *= 0.4
+    table.write(path, format='csv', overwrite=True)
+    refresh = lambda: io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path, cache_dir=cache_dir)
+    catalog = refresh()
+    first = catalog.refresh_StabilityResults(num_workers=1)
+    assert first.meta['num_recomputed'] == len(catalog.Catalog.groups.keys)
+    # An Unchanged Catalog Recomputes Nothing
+    catalog = refresh()
+    unchanged = catalog.refresh_StabilityResults(num_workers=1)
+    assert unchanged.meta['num_recomputed'] == 0
+    for name in ['pl_name', 'beta', 'stability_type']:
+        np.testing.assert_array_equal(unchanged[name], first[name])
+    # Changing One Planet's Mass Recomputes Just its System
+    table = Table.read(path, format='csv')
+    row = int(np.flatnonzero(np.asarray(table['pl_name']) == catalog.Catalog['pl_name'][10])[0])
+    table['pl_bmassj'][row] *= 3.0
+    table.write(path, format='csv', overwrite=True)
+    catalog = refresh()
+    modified = catalog.refresh_StabilityResults(num_workers=1)
+    assert modified.meta['num_recomputed'] == 1
+    assert list(catalog.Catalog_Changes['modified']) == [table['hostname'][row]]
+    assert len(catalog.Catalog_Changes['added']) == len(catalog.Catalog_Changes['removed']) == 0
+    recomputed = catalog.get_StabilityResults(num_workers=1)
+    for name in ['pl_name', 'beta', 'stability_type']:
+        np.testing.assert_array_equal(modified[name], recomputed[name])
+    assert not np.array_equal(modified['beta'], first['beta'])
+
+def test_ParameterTable_matches_ParameterRanges(tmp_path):
+    path = str(tmp_path/"catalog.csv")
+    write_Catalog(path, 60)
+    catalog = io.ExoplanetCatalog(OfflineMode=True, path_to_csv=path, cache_dir=str(tmp_path/"cache"))
+    catalog.clean()
+    # Real Catalogs Repeat the Star's Parameters on Each of its Planets
+    offsets = np.asarray(catalog.Catalog.groups.indices)
+    first_rows = np.repeat(offsets[:-1], np.diff(offsets))
+    for name in catalog.Catalog.colnames:
+        if name.startswith('st_'):
+            catalog.Catalog[name] = catalog.Catalog[name][first_rows]
+    table = catalog.get_ParameterTable()
+    catalog.get_ParameterRanges()
+    as_float = lambda value: float(np.ma.filled(np.ma.asarray(value, dtype=float), np.nan))
+    for i, (hostname, pl_name) in enumerate(zip(table['hostname'], table['pl_name'])):
+        planet_params = catalog.Parameter_Dict[hostname][pl_name]
+        for name in ['hostname', 'pl_bmassprov', 'tran_flag', 'rv_flag']:
+            assert str(planet_params[name]) == str(table[name][i])
+        for name in ['pl_orbper', 'pl_bmassj', 'pl_orbeccen', 'pl_radj', 'pl_orbincl']:
+            np.testing.assert_allclose([as_float(x) for x in planet_params[name]],
+                                       [table[name+'_min'][i], table[name+'_max'][i]], rtol=1e-12)
+        system = table['system_index'][i]
+        star_params = catalog.Parameter_Dict[hostname][hostname]
+        assert star_params['st_spectype'] == table['st_spectype'][offsets[system]]
+        for name in ['st_mass', 'st_rad', 'st_age', 'st_teff']:
+            np.testing.assert_allclose([as_float(x) for x in star_params[name]],
+                                       [table[name+'_min'][offsets[system]], table[name+'_max'][offsets[system]]],
+                                       rtol=1e-12)
+    assert np.array_equal(table.meta['offsets'], offsets)
+    assert len(catalog.Parameter_Dict) == len(offsets) - 1
@@ -0,0 +1,56 @@
+# Tests of the Mass-Radius Relation Against Chen & Kipping (2017) & of its Inversion
+
+import numpy as np
+from astropy.table import Table, MaskedColumn
+
+from stableplanets import io
+from stableplanets import massradius
+
+# The Published log10 Normalizations (REarth) of the Terran, Neptunian, Jovian & Stellar Segments
+PUBLISHED_LOG_CONSTANTS = [0.00346, -0.0925, 1.25, -2.85]
+
+def get_Radius(mass):
+    # Direct Evaluation of the Published Broken Power Law, One Planet at a Time
+    for (bound, index, _), log_constant in zip(massradius.CHEN_KIPPING['segments'], PUBLISHED_LOG_CONSTANTS):
+        if mass <= bound:
+            return 10**log_constant*mass**index
+
+def test_segment_constants_match_the_published_fit():
+    model = massradius.get_MassRadiusModel()
+    assert np.allclose(model['log_constants'], PUBLISHED_LOG_CONSTANTS, atol=0.01)
+
+def test_RadiusFromMass_matches_the_published_relation():
+    masses = np.geomspace(0.01, 1e6, 500)
+    radii, log_errs = massradius.calc_RadiusFromMass(masses)
+    assert np.allclose(radii, [get_Radius(mass) for mass in masses], rtol=0.03)
+    _, log_errs = massradius.calc_RadiusFromMass(masses, 0.1*masses)
+    assert np.all(log_errs > 0.0352)
+
+def test_MassFromRadius_inverts_the_Terran_and_Neptunian_segments():
+    masses = np.geomspace(0.01, 0.999*massradius.get_MassRadiusModel()['log_mass_bounds'][1:2].item(), 500)
+    masses = masses[massradius.calc_RadiusFromMass(masses)[0] < 11.0]
+    mass_fit, lower, upper = massradius.calc_MassFromRadius(massradius.calc_RadiusFromMass(masses)[0])
+    assert np.allclose(mass_fit, masses, rtol=1e-10)
+    assert np.all((lower < mass_fit) & (mass_fit < upper))
+
+def test_MassFromRadius_leaves_the_Jovian_regime_undetermined():
+    # Radii Above ~11.3 REarth Fit Anything from ~0.4 MJ to a Brown Dwarf, or Nothing at All
+    radii = np.array([9.45, 11.5, 13.0, 16.0, 25.0])
+    mass_fit, lower, upper = massradius.calc_MassFromRadius(radii, 0.05*radii)
+    assert np.all(np.isfinite(mass_fit[:1])) and np.all(np.isnan(mass_fit[1:]))
+    assert np.all(np.isnan(lower[1:])) and np.all(np.isnan(upper[1:]))
+    # Error Bars Reaching the Jovian Segment Allow Masses up to the Stellar Boundary
+    assert np.isclose(np.log10(upper[0]), massradius.get_MassRadiusModel()['log_mass_bounds'][2])
+
+def test_impute_MassRadius_skips_Jovian_radii():
+    masked = [True, True, True, False]
+    table = Table({'pl_bmassj': MaskedColumn([0., 0., 0., 1.], mask=masked),
+                   'pl_radj': MaskedColumn([0.2, 1.1, 0., 0.], mask=[False, False, True, True])})
+    for column in ['pl_bmassjerr1', 'pl_bmassjerr2', 'pl_radjerr1', 'pl_radjerr2']:
+        table[column] = MaskedColumn(np.zeros(4), mask=True)
+    table = io.impute_MassRadius(table)
+    assert list(table['pl_bmassj_imputed']) == [True, False, False, False]
+    assert list(table['pl_radj_imputed']) == [False, False, False, True]
+    assert list(np.ma.getmaskarray(table['pl_bmassj'])) == [False, True, True, False]
+    assert np.isclose(table['pl_bmassj'][0]*massradius.MJUPITER_IN_MEARTH,
+                      massradius.calc_MassFromRadius(0.2*massradius.RJUPITER_IN_REARTH)[0])
@@ -0,0 +1,29 @@
+# Tests of the Chunked Stability Pipeline Against Classifying in One Process
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from stableplanets import pipeline
+
+def new_Catalog(num_systems, seed=0):
+    rs = np.random.RandomState(seed)
+    counts = rs.randint(1, 7, num_systems)
+    system = np.repeat(np.arange(num_systems), counts)
+    num_rows = len(system)
+    catalog = Table({'hostname': np.char.add("Star-", system.astype(str)),
+                     'pl_name': np.char.add("Planet-", np.arange(num_rows).astype(str)),
+                     'st_mass': rs.uniform(0.5, 1.5, num_systems)[system], 'pl_orbper': 10**rs.uniform(0, 3, num_rows),
+                     'pl_bmassj': 10**rs.uniform(-2, 1, num_rows), 'pl_orbeccen': rs.uniform(0, 0.3, num_rows)})
+    return catalog.group_by('hostname')
+
+@pytest.mark.parametrize("time_systems", [False, True])
+def test_worker_pool_matches_a_single_process(time_systems):
+    catalog = new_Catalog(300)
+    serial = pipeline.run_StabilityPipeline(catalog, num_workers=1, time_systems=time_systems)
+    pooled = pipeline.run_StabilityPipeline(catalog, num_workers=2, chunk_size=20, time_systems=time_systems)
+    assert len(pooled) == len(serial) == len(catalog)
+    assert pooled.meta['num_workers'] == 2
+    for name in ['hostname', 'pl_name', 'beta', 'stability_type']:
+        np.testing.assert_array_equal(pooled[name], serial[name])
+    np.testing.assert_array_equal(pooled['pl_name'], catalog['pl_name'])
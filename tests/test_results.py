@@ -0,0 +1,65 @@
+# Tests of the Results Store's Indexing Against the Table it was Written From
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from stableplanets import results
+
+def new_Results(num_systems, seed=0):
+    # Planets of each System are Interleaved with Other Systems' Planets
+    rng = np.random.default_rng(seed)
+    num_planets = rng.integers(1, 6, num_systems)
+    hostnames = np.repeat(["star %d" % i for i in range(num_systems)], num_planets)
+    pl_names = np.array(["%s %s" % (host, "bcdefg"[j]) for host, j in
+                         zip(hostnames, np.concatenate([np.arange(n) for n in num_planets]))])
+    order = rng.permutation(len(hostnames))
+    table = Table([hostnames[order], pl_names[order], rng.uniform(0, 3, len(order)),
+                   rng.choice(['AMD', 'Hill', 'Laskar'], len(order)), rng.uniform(0, 1, len(order))],
+                  names=['hostname', 'pl_name', 'beta', 'stability_type', 'system_time'],
+                  meta={'source': 'test', 'unserializable': object()})
+    table['system_time'].unit = 's'
+    return table
+
+def test_ResultsStore_matches_its_table(tmp_path):
+    table = new_Results(40)
+    path = str(tmp_path/"store")
+    results.write_ResultsStore(path, table)
+    store = results.ResultsStore(path)
+    assert len(store) == len(table)
+    assert store.columns == table.colnames
+    assert store.to_table().meta == {'source': 'test'}
+    assert store.to_table()['system_time'].unit == 's'
+    for hostname in np.unique(table['hostname']):
+        assert hostname in store
+        expected = table[table['hostname'] == hostname]
+        system = store.get_System(hostname)
+        for name in table.colnames:
+            assert np.array_equal(system[name], expected[name])
+        for row in expected:
+            planet = store.get_Planet(hostname, row['pl_name'])
+            assert planet['beta'] == row['beta']
+            assert planet['stability_type'] == row['stability_type']
+    assert "no such star" not in store
+    with pytest.raises(KeyError):
+        store.get_System("no such star")
+
+def test_ResultsStore_keeps_grouped_tables_in_order(tmp_path):
+    table = new_Results(20)
+    table = table[np.argsort(table['hostname'], kind='stable')][::-1]
+    path = str(tmp_path/"store")
+    results.write_ResultsStore(path, table)
+    store = results.ResultsStore(path)
+    for name in table.colnames:
+        assert np.array_equal(store[name], table[name])
+    assert list(store.systems) == list(dict.fromkeys(table['hostname']))
+
+def test_ResultsStore_rewrite_replaces_the_store(tmp_path):
+    path = str(tmp_path/"store")
+    results.write_ResultsStore(path, new_Results(20))
+    table = new_Results(5, seed=1)
+    results.write_ResultsStore(path, table)
+    store = results.ResultsStore(path)
+    assert len(store) == len(table)
+    assert sorted(store.systems) == sorted(np.unique(table['hostname']))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
@@ -0,0 +1,39 @@
+# Tests of the Vectorized Root Solvers Against scipy.optimize.brentq
+
+import numpy as np
+import pytest
+
+from scipy.optimize import brentq
+
+from stableplanets import amd
+from stableplanets import solvers
+
+GAMMAS = np.logspace(-3, 3, 25)
+ALPHAS = np.linspace(0.01, 0.999, 25)
+EPSILONS = np.logspace(-9, -1, 40)
+
+def test_solve_equation_35_matches_brentq():
+    gamma, alpha = [x.ravel() for x in np.meshgrid(GAMMAS, ALPHAS)]
+    roots = solvers.solve_equation_35(gamma, alpha)
+    expected = [brentq(solvers.equation_35, 0.0, 1.0, args=(g, a), xtol=2e-12) for g, a in zip(gamma, alpha)]
+    np.testing.assert_allclose(roots, expected, rtol=0, atol=4e-12)
+
+@pytest.mark.parametrize("r", [0.5, amd.LASKAR_R, 1.1])
+def test_solve_equation_99_matches_brentq(r):
+    roots = solvers.solve_equation_99(r, EPSILONS)
+    expected = [brentq(solvers.equation_99, 0.0, 1.0, args=(r, eps), xtol=2e-12) for eps in EPSILONS]
+    np.testing.assert_allclose(roots, expected, rtol=0, atol=4e-12)
+
+def test_bracketed_newton_matches_brentq():
+    func = lambda x, c: np.cos(x) - c*x
+    fprime = lambda x, c: -np.sin(x) - c
+    c = np.linspace(0.5, 5.0, 30)
+    roots = solvers.bracketed_newton(func, fprime, 0.0, 2.0, args=(c,))
+    expected = [brentq(func, 0.0, 2.0, args=(ci,), xtol=2e-12) for ci in c]
+    np.testing.assert_allclose(roots, expected, rtol=0, atol=4e-12)
+
+def test_bracketed_newton_returns_nan_without_a_sign_change():
+    # equation_99 has No Root in [0, 1] Once r*epsilon Grows Past ~0.14
+    roots = solvers.solve_equation_99(amd.LASKAR_R, [1e-3, 0.5])
+    assert np.isfinite(roots[0])
+    assert np.isnan(roots[1])
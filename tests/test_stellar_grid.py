@@ -0,0 +1,79 @@
+# Tests of the Stellar Grid's Interpolation Error Bounds, Against an Analytic Stand-In for SSE
+
+import numpy as np
+import pytest
+
+from amuse.units import units
+
+from stableplanets import stellar_grid
+
+MASSES = np.geomspace(0.5, 5.0, 25)
+AGES = np.linspace(0.0, 2000.0, 41)
+
+def get_FakeSSE(masses, ages):
+    # Smooth in log Mass & Age (Curved Along Both), Leaving the Main Sequence at t = 10^4 Myr M^-2.5
+    masses, ages = np.broadcast_arrays(np.asarray(masses, dtype=float), np.asarray(ages, dtype=float))
+    x, f = np.log10(masses), ages*masses**2.5/1e4
+    return {'radius': 10**(0.8*x + 0.3*f + 0.5*(ages/2000.)**2), 'luminosity': 10**(3.5*x + 0.2*f),
+            'temperature': 10**(3.76 + 0.5*x - 0.1*f), 'mass': masses*(1 - 0.01*np.minimum(f, 1)),
+            'stellar_type': np.where(f >= 1, 3., 1.)}
+
+@pytest.fixture
+def grid(tmp_path, monkeypatch):
+    monkeypatch.setattr(stellar_grid, 'new_GridValues', lambda masses, ages, metallicity=0.02, sse_worker=None:
+                        get_FakeSSE(masses[:, None], ages[None, :]))
+    monkeypatch.setattr(stellar_grid, 'evolve_SSE', lambda masses, ages, metallicity=0.02, sse_worker=None:
+                        get_FakeSSE(masses, ages))
+    return stellar_grid.StellarGrid(MASSES, AGES, cache_dir=str(tmp_path))
+
+def get_RandomStars(num_stars, seed=0):
+    random_state = np.random.RandomState(seed)
+    masses = 10**random_state.uniform(np.log10(MASSES[0]), np.log10(MASSES[-1]), num_stars)
+    return masses, random_state.uniform(AGES[0], AGES[-1], num_stars)
+
+def test_interpolate_errors_bound_the_true_errors(grid):
+    masses, ages = get_RandomStars(100000)
+    results, errors = grid.interpolate(masses, ages)
+    truth = get_FakeSSE(masses, ages)
+    finite = np.isfinite(errors)
+    assert finite.mean() > 0.8
+    for name in stellar_grid.LOG_PROPERTIES:
+        error = np.abs(np.log10(results[name]/truth[name]))
+        assert np.all(error[finite] <= errors[finite])
+
+def test_interpolate_is_exact_on_the_nodes_and_flags_phase_changes(grid):
+    masses, ages = np.meshgrid(MASSES, AGES, indexing='ij')
+    results, errors = grid.interpolate(masses.ravel(), ages.ravel())
+    truth = get_FakeSSE(masses.ravel(), ages.ravel())
+    for name in stellar_grid.PROPERTIES:
+        assert np.allclose(results[name], truth[name], rtol=1e-12)
+    # Cells Straddling the End of the Main Sequence can't be Trusted
+    types = truth['stellar_type'].reshape(masses.shape)
+    straddling = (types[:-1, :-1] != types[1:, 1:])
+    assert straddling.any() and np.all(np.isinf(grid.cell_errors[straddling]))
+    results, errors = grid.interpolate(np.array([0.1, 1.0]), np.array([100., 3000.]))
+    assert np.all(np.isnan(results['radius'])) and np.all(np.isinf(errors))
+
+@pytest.mark.parametrize("rtol", [0.001, 0.01, 0.05])
+def test_get_Properties_meets_the_tolerance(grid, rtol):
+    masses, ages = get_RandomStars(20000, seed=1)
+    masses = np.append(masses, 50.0)
+    ages = np.append(ages, 1.0)
+    properties = grid.get_Properties(masses | units.MSun, ages | units.Myr, rtol=rtol)
+    truth = get_FakeSSE(masses, ages)
+    interpolated = properties['interpolated']
+    assert not interpolated[-1] and 0 < interpolated.sum() < len(masses)
+    for name in stellar_grid.LOG_PROPERTIES:
+        values = properties[name].value_in(stellar_grid.PROPERTIES[name])
+        assert np.all(np.abs(values/truth[name] - 1) <= rtol)
+        assert np.array_equal(values[~interpolated], truth[name][~interpolated])
+    unevolved = grid.get_Properties(masses, ages, rtol=rtol, fallback=False)
+    assert np.isnan(unevolved['radius'][-1].value_in(units.RSun))
+
+def test_grid_is_read_back_from_the_cache(grid, tmp_path, monkeypatch):
+    def new_GridValues(*args, **kwargs):
+        raise AssertionError("The cached grid should be reused.")
+    monkeypatch.setattr(stellar_grid, 'new_GridValues', new_GridValues)
+    cached = stellar_grid.StellarGrid(MASSES, AGES, cache_dir=str(tmp_path))
+    for name in stellar_grid.PROPERTIES:
+        assert np.array_equal(cached.values[name], grid.values[name])
@@ -0,0 +1,164 @@
+# Tests of the KD-Tree Host Search Against Checking Every Star
+
+import sys
+
+import numpy as np
+import pytest
+
+from amuse.datamodel import Particles
+from amuse.units import units
+from amuse.units import constants
+
+from stableplanets import orbits
+from stableplanets import util
+from stableplanets import workers
+from stableplanets import instrument
+from stableplanets import stellar_systems
+
+# Convert Every Pair In-Process, so No Kepler Worker is Needed
+KEPLER = orbits.NumpyKepler()
+
+def new_Cluster(num_stars, num_planets, seed=0):
+    ''' Stars in a 0.05 pc sphere with a 1 km/s dispersion & planets on 1-300 AU
+        orbits around random stars, all tagged with types & ids.
+    '''
+    rs = np.random.RandomState(seed)
+    stars = Particles(num_stars)
+    stars.mass = 10**rs.uniform(-0.7, 0.5, num_stars) | units.MSun
+    stars.position = rs.uniform(-1e4, 1e4, (num_stars, 3)) | units.AU
+    stars.velocity = rs.normal(0, 1, (num_stars, 3)) | units.kms
+    stars.radius = 1 | units.AU
+    stars.type = "star"
+    hosts = stars[rs.randint(0, num_stars, num_planets)]
+    planets = Particles(num_planets)
+    planets.mass = 10**rs.uniform(-2, 0.5, num_planets) | units.MJupiter
+    a = 10**rs.uniform(0, np.log10(300), num_planets)
+    direction = rs.normal(size=(num_planets, 3))
+    direction /= np.sqrt((direction**2).sum(axis=1))[:, None]
+    normal = np.cross(direction, rs.normal(size=(num_planets, 3)))
+    normal /= np.sqrt((normal**2).sum(axis=1))[:, None]
+    speed = (constants.G*(hosts.mass + planets.mass)/(a | units.AU)).sqrt().value_in(units.kms)
+    planets.position = hosts.position + (direction*a[:, None] | units.AU)
+    planets.velocity = hosts.velocity + (normal*speed[:, None] | units.kms)
+    planets.radius = 0.001 | units.AU
+    planets.type = "planet"
+    bodies = Particles()
+    bodies.add_particles(stars)
+    bodies.add_particles(planets)
+    bodies.id = np.arange(len(bodies)) + 1
+    return bodies
+
+def get_BoundPairs(stars, bodies, exclude_self=False):
+    # Every Bound (Star, Body) Pair, Found by Checking Every Star
+    star_index, body_index = [index.ravel() for index in np.meshgrid(np.arange(len(stars)), np.arange(len(bodies)))]
+    if exclude_self:
+        keep = stars.key[star_index] != bodies.key[body_index]
+        star_index, body_index = star_index[keep], body_index[keep]
+    e = orbits.get_PairElements(stars, bodies, star_index, body_index)[1]
+    return set(zip(star_index[e < 1.0], body_index[e < 1.0]))
+
+@pytest.mark.parametrize("seed", range(3))
+def test_HostCandidates_include_every_bound_pair(seed):
+    bodies = new_Cluster(60, 40, seed)
+    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+    for others, exclude_self in ((planets, False), (stars, True)):
+        star_index, body_index, distance = util.get_HostCandidates(stars, others, exclude_self=exclude_self)
+        assert get_BoundPairs(stars, others, exclude_self) <= set(zip(star_index, body_index))
+
+def test_HostCandidates_find_bound_host_beyond_stellar_radius():
+    # The Planet is Bound to a Star 100 AU Away, but a Passing Star is Nearer
+    bodies = Particles(3)
+    bodies.mass = [1, 1, 0.001] | units.MSun
+    bodies.radius = 10 | units.AU
+    bodies.position = [[0, 0, 0], [160, 0, 0], [100, 0, 0]] | units.AU
+    speed = (constants.G*(1.001 | units.MSun)/(100 | units.AU)).sqrt().value_in(units.kms)
+    bodies.velocity = [[0, 0, 0], [0, 0, 30], [0, speed, 0]] | units.kms
+    bodies.type = ["star", "star", "planet"]
+    bodies.id = [1, 2, 3]
+    stellar_systems.update_host_star(bodies, kepler_worker=KEPLER)
+    assert util.get_planets(bodies).host_star[0] == 1
+    systems = stellar_systems.get_heirarchical_systems_from_set(bodies, kepler_workers=(KEPLER, KEPLER))
+    assert sorted(systems[1].id) == [1, 3]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_systems_match_checking_every_star(seed):
+    bodies = new_Cluster(60, 40, seed)
+    everywhere = np.inf | units.AU
+    for find_systems in (stellar_systems.get_planetary_systems_from_set,
+                         stellar_systems.get_heirarchical_systems_from_set):
+        pruned = find_systems(bodies.copy(), kepler_workers=(KEPLER, KEPLER))
+        brute_force = find_systems(bodies.copy(), kepler_workers=(KEPLER, KEPLER), search_radius=everywhere)
+        assert sorted(pruned) == sorted(brute_force)
+        for key in pruned:
+            assert sorted(pruned[key].id) == sorted(brute_force[key].id)
+    pruned, brute_force = bodies.copy(), bodies.copy()
+    stellar_systems.update_host_star(pruned, kepler_worker=KEPLER)
+    stellar_systems.update_host_star(brute_force, kepler_worker=KEPLER, search_radius=everywhere)
+    np.testing.assert_array_equal(util.get_planets(pruned).host_star, util.get_planets(brute_force).host_star)
+
+def test_HostCandidates_blocks_give_the_same_pairs(monkeypatch):
+    bodies = new_Cluster(60, 40)
+    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+    expected = util.get_HostCandidates(stars, planets)
+    monkeypatch.setattr(util, 'MAX_CANDIDATES', 7)
+    for result, reference in zip(util.get_HostCandidates(stars, planets), expected):
+        np.testing.assert_array_equal(result, reference)
+
+@pytest.fixture
+def metrics(monkeypatch):
+    monkeypatch.setattr(instrument, 'ENABLED', True)
+    instrument.reset_Metrics()
+    yield instrument.COUNTERS
+    instrument.reset_Metrics()
+
+def test_default_call_starts_no_kepler_worker(monkeypatch, metrics):
+    def new_kepler(converter=None):
+        raise AssertionError("A Kepler worker was started.")
+    monkeypatch.setitem(workers.CODES, 'kepler', (new_kepler, None))
+    monkeypatch.setattr(workers, 'POOLS', {})
+    monkeypatch.setitem(sys.modules, 'amuse.community.kepler.interface', None)
+    bodies = new_Cluster(60, 40)
+    systems = stellar_systems.get_heirarchical_systems_from_set(bodies.copy())
+    assert workers.POOLS == {}
+    assert metrics['kepler_calls'] == 0 and metrics['pairs_in_process'] > 0
+    expected = stellar_systems.get_heirarchical_systems_from_set(bodies.copy(), kepler_workers=(KEPLER, KEPLER))
+    assert sorted(systems) == sorted(expected)
+    for key in systems:
+        assert sorted(systems[key].id) == sorted(expected[key].id)
+
+def test_default_call_converts_every_candidate_in_one_batch(monkeypatch, metrics):
+    bodies = new_Cluster(60, 40)
+    stars, planets = util.get_stars(bodies), util.get_planets(bodies)
+    star_pairs = util.get_HostCandidates(stars, stars, include_nearest=True, exclude_self=True)[0]
+    planet_pairs = util.get_HostCandidates(stars, planets)[0]
+    calls = []
+    get_PairElements = orbits.get_PairElements
+    def record(primaries, secondaries, primary_index, secondary_index, kepler_worker=None):
+        calls.append((len(primary_index), type(kepler_worker)))
+        return get_PairElements(primaries, secondaries, primary_index, secondary_index, kepler_worker)
+    monkeypatch.setattr(orbits, 'get_PairElements', record)
+    stellar_systems.get_heirarchical_systems_from_set(bodies)
+    assert calls == [(len(star_pairs), orbits.NumpyKepler), (len(planet_pairs), orbits.NumpyKepler)]
+    calls.clear()
+    stellar_systems.update_host_star(bodies)
+    assert calls == [(len(planet_pairs), orbits.NumpyKepler)]
+    assert metrics['kepler_calls'] == 0
+    assert metrics['pairs_in_process'] == len(star_pairs) + 2*len(planet_pairs)
+
+def test_bound_triple_and_separate_host_form_two_systems():
+    # Stars 1 & 2 are a 10 AU Binary, Circled by Star 3 at 200 AU. Star 4 is Alone,
+    # 10^4 AU Away. Planet 5 Orbits Star 1 & Planet 6 Orbits Star 4.
+    circular_speed = lambda mass, a: (constants.G*(mass | units.MSun)/(a | units.AU)).sqrt().value_in(units.kms)
+    inner, outer = circular_speed(2.0, 10.0)/2, circular_speed(3.0, 200.0)
+    bodies = Particles(6)
+    bodies.mass = [1, 1, 1, 1, 0.001, 0.001] | units.MSun
+    bodies.radius = [0.01, 0.01, 0.01, 0.01, 0.0001, 0.0001] | units.AU
+    bodies.position = [[-5, 0, 0], [5, 0, 0], [200, 0, 0], [1e4, 0, 0], [-4, 0, 0], [1e4, 5, 0]] | units.AU
+    bodies.velocity = [[0, -inner, 0], [0, inner, 0], [0, outer, 0], [0, 0, 5],
+                       [0, circular_speed(1.001, 1.0) - inner, 0],
+                       [-circular_speed(1.001, 5.0), 0, 5]] | units.kms
+    bodies.type = ["star", "star", "star", "star", "planet", "planet"]
+    bodies.id = [1, 2, 3, 4, 5, 6]
+    for kepler_workers in (None, (KEPLER, KEPLER)):
+        systems = stellar_systems.get_heirarchical_systems_from_set(bodies.copy(), kepler_workers=kepler_workers)
+        assert {key: sorted(system.id) for key, system in systems.items()} == {1: [1, 2, 3, 5], 4: [4, 6]}
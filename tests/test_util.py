@@ -0,0 +1,162 @@
+# Tests of the Worker-Pool Defaults, the util Module's Worker API, Closed-Form Binaries & Rotations
+
+import threading
+
+import numpy as np
+import pytest
+
+from amuse.datamodel import Particles
+from amuse.units import units
+from amuse.units import constants
+
+from stableplanets import orbits
+from stableplanets import util
+from stableplanets import workers
+from stableplanets import stellar_systems
+
+@pytest.fixture
+def numpy_kepler_pool(monkeypatch):
+    # Serve In-Process Workers from Fresh Pools, so No Kepler Process is Needed
+    monkeypatch.setitem(workers.CODES, 'kepler', (lambda converter=None: orbits.NumpyKepler(), None))
+    monkeypatch.setattr(workers, 'POOLS', {})
+    return workers.POOLS
+
+def new_Binary():
+    bodies = Particles(3)
+    bodies.mass = [1, 0.5, 0.001] | units.MSun
+    bodies.radius = 1 | units.AU
+    bodies.position = [[0, 0, 0], [1000, 0, 0], [5, 0, 0]] | units.AU
+    speed = (constants.G*(1.001 | units.MSun)/(5 | units.AU)).sqrt().value_in(units.kms)
+    bodies.velocity = [[0, 0, 0], [0, 0.5, 0], [0, speed, 0]] | units.kms
+    bodies.type = ["star", "star", "planet"]
+    bodies.id = [1, 2, 3]
+    return bodies
+
+def test_SMALLN_is_the_calling_threads_worker():
+    assert util.SMALLN is None
+    util.SMALLN_THREADS.worker = worker = object()
+    try:
+        assert util.SMALLN is worker
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(util.SMALLN))
+        thread.start()
+        thread.join()
+        assert seen == [None]
+    finally:
+        del util.SMALLN_THREADS.worker
+
+FINDERS = ["update_host_star", "get_planetary_systems_from_set", "get_heirarchical_systems_from_set"]
+
+@pytest.mark.parametrize("find", FINDERS)
+def test_default_kepler_backend_is_in_process(numpy_kepler_pool, find):
+    bodies = new_Binary()
+    getattr(stellar_systems, find)(bodies)
+    assert numpy_kepler_pool == {}
+
+@pytest.mark.parametrize("find", FINDERS)
+def test_pooled_kepler_worker_on_request(numpy_kepler_pool, find):
+    bodies = new_Binary()
+    if find == "update_host_star":
+        stellar_systems.update_host_star(bodies, kepler_worker=workers.POOLED)
+    else:
+        getattr(stellar_systems, find)(bodies, kepler_workers=(workers.POOLED, None))
+    pool = numpy_kepler_pool[('kepler', None)]
+    # One Worker was Started, Shared by Planets & Stars, and Returned Warm
+    assert pool.num_alive == 1 and len(pool.idle) == 1
+
+def test_update_orb_elem_backends_agree(numpy_kepler_pool):
+    bodies = new_Binary()
+    stellar_systems.update_orb_elem(bodies[0], bodies[2:])
+    assert numpy_kepler_pool == {}
+    expected = bodies[2:].semimajor_axis.copy(), bodies[2:].eccentricity.copy()
+    stellar_systems.update_orb_elem(bodies[0], bodies[2:], kepler_worker=workers.POOLED)
+    assert numpy_kepler_pool[('kepler', None)].num_alive == 1
+    assert np.allclose(bodies[2:].semimajor_axis.value_in(units.AU), expected[0].value_in(units.AU), rtol=1e-12)
+    assert np.allclose(bodies[2:].eccentricity, expected[1], rtol=1e-12)
+
+def test_ensure_approaching_binary_deprecates_kepler_worker():
+    bodies = new_Binary()
+    with pytest.warns(DeprecationWarning):
+        util.ensure_approaching_binary(bodies[0], bodies[1], kepler_worker=orbits.NumpyKepler())
+
+def test_ensure_approaching_binary_keeps_orbits_and_centers_of_mass():
+    rs = np.random.RandomState(0)
+    num_pairs = 50
+    primaries, secondaries = Particles(num_pairs), Particles(num_pairs)
+    primaries.mass = rs.uniform(0.5, 5.0, num_pairs) | units.MSun
+    secondaries.mass = rs.uniform(0.1, 1.0, num_pairs) | units.MSun
+    mT = primaries.mass + secondaries.mass
+    rel_pos, rel_vel = orbits.get_CartesianFromElements(mT, rs.uniform(1, 100, num_pairs) | units.AU,
+                                                        rs.uniform(0, 0.95, num_pairs),
+                                                        rs.uniform(0, 2*np.pi, num_pairs))
+    primaries.position = rs.normal(0, 1e4, (num_pairs, 3)) | units.AU
+    primaries.velocity = rs.normal(0, 1, (num_pairs, 3)) | units.kms
+    secondaries.position = primaries.position + rel_pos
+    secondaries.velocity = primaries.velocity + rel_vel
+    get_CoM = lambda: ((primaries.mass*primaries.position.T + secondaries.mass*secondaries.position.T)/mT,
+                       (primaries.mass*primaries.velocity.T + secondaries.mass*secondaries.velocity.T)/mT)
+    get_Relative = lambda: (secondaries.position - primaries.position, secondaries.velocity - primaries.velocity)
+    rCM, vCM = get_CoM()
+    a, e, _, _, _ = orbits.get_OrbitalElements(mT, *get_Relative())
+    util.ensure_approaching_binary(primaries, secondaries)
+    new_rCM, new_vCM = get_CoM()
+    assert np.allclose(new_rCM.value_in(units.AU), rCM.value_in(units.AU), rtol=1e-12)
+    assert np.allclose(new_vCM.value_in(units.kms), vCM.value_in(units.kms), rtol=1e-10, atol=1e-12)
+    rel_pos, rel_vel = get_Relative()
+    new_a, new_e, _, _, _ = orbits.get_OrbitalElements(mT, rel_pos, rel_vel)
+    assert np.allclose(new_a.value_in(units.AU), a.value_in(units.AU), rtol=1e-9)
+    assert np.allclose(new_e, e, rtol=1e-8, atol=1e-10)
+    # Each Pair Sits at r = a, Approaching its Partner
+    assert np.allclose(rel_pos.lengths().value_in(units.AU), a.value_in(units.AU), rtol=1e-9)
+    assert np.all((rel_pos.value_in(units.AU)*rel_vel.value_in(units.kms)).sum(axis=1) < 0)
+
+def get_LoopEulerRotation(particle_set):
+    # The Original Per-Particle Rotation, Drawing its Angles from np.random
+    n_1, n_2, n_3 = np.random.uniform(0.0, 2*np.pi), np.random.uniform(0.0, 2*np.pi), np.random.uniform(0.0, 1.0)
+    R = [[np.cos(n_1), np.sin(n_1), 0.0], [-np.sin(n_1), np.cos(n_1), 0.0], [0.0, 0.0, 1.0]]
+    V = [[np.cos(n_2)*np.sqrt(n_3)], [np.sin(n_2)*np.sqrt(n_3)], [np.sqrt(1-n_3)]]
+    rotate = 2*np.dot(np.outer(V, V), R) - np.dot(np.eye(3), R)
+    for particle in particle_set:
+        pos = np.matrix([[particle.x.number], [particle.y.number], [particle.z.number]])
+        vel = np.matrix([[particle.vx.number], [particle.vy.number], [particle.vz.number]])
+        particle.position = np.dot(rotate, pos) | particle.position.unit
+        particle.velocity = np.dot(rotate, vel) | particle.velocity.unit
+
+def new_Particles(num_particles, seed=0):
+    rs = np.random.RandomState(seed)
+    particles = Particles(num_particles)
+    particles.mass = 1 | units.MSun
+    particles.position = rs.normal(0, 100, (num_particles, 3)) | units.AU
+    particles.velocity = rs.normal(0, 10, (num_particles, 3)) | units.kms
+    return particles
+
+@pytest.mark.filterwarnings("ignore::PendingDeprecationWarning")
+def test_EulerRotation_matches_the_per_particle_loop():
+    batched, looped = new_Particles(20), new_Particles(20)
+    np.random.seed(3)
+    rotate = util.preform_EulerRotation(batched)
+    np.random.seed(3)
+    get_LoopEulerRotation(looped)
+    np.testing.assert_allclose(rotate @ rotate.T, np.eye(3), atol=1e-12)
+    assert np.isclose(np.linalg.det(rotate), 1.0)
+    for attribute, unit in [("position", units.AU), ("velocity", units.kms)]:
+        np.testing.assert_allclose(getattr(batched, attribute).value_in(unit), getattr(looped, attribute).value_in(unit),
+                                   rtol=1e-12, atol=1e-12)
+
+def test_BatchEulerRotation_rotates_each_system_about_its_host():
+    num_systems = 6
+    particles, hosts = new_Particles(30), new_Particles(num_systems, seed=1)
+    system_index = np.random.RandomState(2).randint(0, num_systems, len(particles))
+    before = particles.copy()
+    rotations = util.preform_BatchEulerRotation(particles, system_index, num_systems, hosts=hosts,
+                                                random_state=np.random.RandomState(4))
+    assert rotations.shape == (num_systems, 3, 3)
+    for particle, old, system in zip(particles, before, system_index):
+        host = hosts[system]
+        for attribute, unit in [("position", units.AU), ("velocity", units.kms)]:
+            center = getattr(host, attribute).value_in(unit)
+            expected = np.dot(rotations[system], getattr(old, attribute).value_in(unit) - center) + center
+            np.testing.assert_allclose(getattr(particle, attribute).value_in(unit), expected, rtol=1e-12, atol=1e-9)
+    # Hosts Stay Put & Separations from them are Kept
+    separation = lambda p: (p.position - hosts.position[system_index]).lengths().value_in(units.AU)
+    np.testing.assert_allclose(separation(particles), separation(before), rtol=1e-12)